@@ -0,0 +1,231 @@
+import os
+import json
+import mmap
+import threading
+import pygame
+from utils import BASE_IMG_PATH, load_image, load_images, load_frames, display_format
+
+# Every image asset of the game and the editor: name -> (path, colorkey, size to scale to, whether the path is a folder of frames)
+ASSET_MANIFEST = {
+    'decor': ('tiles/decor', (0, 0, 0), None, True),
+    'grass': ('tiles/grass', (0, 0, 0), None, True),
+    'large_decor': ('tiles/large_decor', (0, 0, 0), None, True),
+    'stone': ('tiles/stone', (0, 0, 0), None, True),
+    'spawners': ('tiles/spawners', (0, 0, 0), None, True),
+    'player': ('Player/idle/00_Idle.png', (255, 255, 255), None, False),
+    'background': ('Background/mountain.png', (255, 255, 255), None, False),
+    'clouds': ('clouds', (0, 0, 0), (50, 25), True), # Scale the clouds so it will fit the screen
+    'enemy/idle': ('Enemy/idle', (0, 0, 0), (16, 19), True), # Scale the sprites so the physics will align correctly as the image and the player
+    'enemy/walk': ('Enemy/walk', (0, 0, 0), (16, 19), True),
+    'enemy/attack': ('Enemy/attack', (0, 0, 0), (16, 19), True),
+    'player/idle': ('Player/idle', (0, 0, 0), (16, 19), True),
+    'player/run': ('Player/run', (0, 0, 0), (16, 19), True),
+    'player/jump': ('Player/jump', (0, 0, 0), (16, 19), True),
+    'particle/leaf': ('particles/leaf', (0, 0, 0), None, True),
+    'particle/particle': ('particles/particle', (0, 0, 0), None, True),
+    'projectiles': ('tiles/projectile/blue.png', (255, 255, 255), None, False),
+}
+
+CACHE_DIR = '.asset_cache/'
+ATLAS_WIDTH = 1024
+ATLAS_VERSION = 2 # Bump this when the atlas layout changes so old caches get rebuilt
+
+# Load every asset from its PNG files (The slow path, used to build the atlas)
+def load_source_assets():
+    assets = {}
+    for name, (path, colorkey, size, folder) in ASSET_MANIFEST.items():
+        if size:
+            # The game has always drawn the scaled sprites with their dark outline: the colorkey pixels are kept in the atlas
+            # (Copying a surface that has a colorkey would turn those pixels transparent, so it's cleared on the scaled frames)
+            assets[name] = [pygame.transform.scale(img, size) for img in load_images(path, colorkey)]
+            for img in assets[name]:
+                img.set_colorkey(None)
+        elif folder:
+            assets[name] = load_frames(path, colorkey)
+        else:
+            assets[name] = load_image(path, colorkey)
+    return assets
+
+# Modification time and size of every source image, used to tell when the cached atlas is out of date
+def source_signature():
+    files = []
+    for name, (path, colorkey, size, folder) in ASSET_MANIFEST.items():
+        paths = [path + '/' + img_name for img_name in sorted(os.listdir(BASE_IMG_PATH + path))] if folder else [path]
+        for img_path in paths:
+            stat = os.stat(BASE_IMG_PATH + img_path)
+            files.append([img_path, stat.st_mtime_ns, stat.st_size])
+    signature = {'version': ATLAS_VERSION, 'manifest': ASSET_MANIFEST, 'files': files}
+    return json.loads(json.dumps(signature)) # Turn the tuples into lists so it compares equal to the one read back from the JSON file
+
+# Copy of an image where the colorkey pixels are made fully transparent (The atlas has no colorkey, only alpha)
+def bake_colorkey(img):
+    colorkey = img.get_colorkey()
+    img = img.copy()
+    if colorkey:
+        img.set_colorkey(None)
+        mask = pygame.mask.from_threshold(img, colorkey, (1, 1, 1, 255))
+        mask.to_surface(img, setcolor=(0, 0, 0, 0), unsetcolor=None)
+    return img
+
+# Pack every frame into one atlas surface (Frames are placed in rows, tallest first)
+def pack_atlas(assets):
+    frames = []
+    for name in assets:
+        images = assets[name] if isinstance(assets[name], list) else [assets[name]]
+        for i, img in enumerate(images):
+            frames.append((name, i, img))
+
+    index = {name: [None] * (len(assets[name]) if isinstance(assets[name], list) else 1) for name in assets}
+    x = y = row_height = 0
+    for name, i, img in sorted(frames, key=lambda frame: -frame[2].get_height()):
+        if x + img.get_width() > ATLAS_WIDTH:
+            x = 0
+            y += row_height
+            row_height = 0
+        index[name][i] = [x, y, img.get_width(), img.get_height()]
+        x += img.get_width()
+        row_height = max(row_height, img.get_height())
+
+    atlas = pygame.Surface((ATLAS_WIDTH, y + row_height), pygame.SRCALPHA)
+    for name, i, img in frames:
+        atlas.blit(bake_colorkey(img), index[name][i][:2], special_flags=pygame.BLEND_RGBA_MAX) # Copy the pixels as they are, without blending
+    return atlas, {name: {'frames': index[name], 'list': isinstance(assets[name], list)} for name in assets}
+
+# Build the atlas from the PNG files and write it to the cache (Raw RGBA pixels plus a JSON index of the frames)
+def build_atlas(signature=None):
+    atlas, index = pack_atlas(load_source_assets())
+    atlas = display_format(atlas)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        f = open(CACHE_DIR + 'atlas.rgba', 'wb')
+        f.write(pygame.image.tobytes(atlas, 'RGBA'))
+        f.close()
+        f = open(CACHE_DIR + 'atlas.json', 'w')
+        json.dump({'signature': signature or source_signature(), 'size': atlas.get_size(), 'assets': index}, f)
+        f.close()
+    except OSError:
+        pass # The game still runs when the cache can't be written, it just builds the atlas again next time
+    return atlas, index
+
+# Read the cached atlas by memory mapping its pixels (Returns None when there is no cache or it is out of date)
+def read_atlas(signature):
+    try:
+        f = open(CACHE_DIR + 'atlas.json', 'r')
+        info = json.load(f)
+        f.close()
+    except (OSError, ValueError):
+        return None
+    if info['signature'] != signature:
+        return None
+    try:
+        f = open(CACHE_DIR + 'atlas.rgba', 'rb')
+        pixels = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+    except (OSError, ValueError):
+        return None
+    if len(pixels) != info['size'][0] * info['size'][1] * 4:
+        return None
+    atlas = pygame.image.frombuffer(pixels, info['size'], 'RGBA')
+    atlas = display_format(atlas) # Copy into the display's pixel format so blits are fast
+    return atlas, info['assets']
+
+# Load the assets from the atlas, building it first when needed (Returns name -> image or list of frames)
+def load_assets(names=None):
+    signature = source_signature()
+    atlas, index = read_atlas(signature) or build_atlas(signature)
+    assets = {}
+    for name in (names or ASSET_MANIFEST):
+        frames = [atlas.subsurface(rect) for rect in index[name]['frames']]
+        assets[name] = frames if index[name]['list'] else frames[0]
+    return assets
+
+# Same shape as load_assets() but every image is a blank 1x1 surface (Stands in for images that aren't loaded yet)
+def placeholder_assets(names=None):
+    blank = pygame.Surface((1, 1), pygame.SRCALPHA)
+    assets = {}
+    for name in (names or ASSET_MANIFEST):
+        path, colorkey, size, folder = ASSET_MANIFEST[name]
+        assets[name] = [blank] * len(os.listdir(BASE_IMG_PATH + path)) if folder else blank
+    return assets
+
+# Sound that doesn't play anything (Stands in for sounds that aren't loaded yet, and for every sound when the game runs headless)
+class NullSound:
+    def __init__(self, path=None):
+        pass
+
+    def play(self):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+# Class to load assets on demand, or all of them on a background thread
+# Reading an asset that the background thread hasn't loaded yet gives its placeholder instead of waiting for it
+class AssetManager:
+    def __init__(self):
+        self.loaders = {} # Function that loads each asset
+        self.placeholders = {}
+        self.loaded = {}
+        self.lock = threading.Lock()
+        self.thread = None
+        self.error = None
+
+    # Register an asset with the function that loads it
+    def add(self, name, loader, placeholder=None):
+        self.loaders[name] = loader
+        self.placeholders[name] = placeholder
+
+    # Register several assets that are loaded together by one function (It returns name -> asset)
+    def add_group(self, loader, placeholders):
+        group = {}
+        def load_group():
+            if not group:
+                group.update(loader())
+            return group
+        for name in placeholders:
+            self.add(name, lambda name=name: load_group()[name], placeholders[name])
+
+    # Load an asset now (Does nothing when it's already loaded)
+    def load(self, name):
+        with self.lock:
+            if name not in self.loaded:
+                self.loaded[name] = self.loaders[name]()
+        return self.loaded[name]
+
+    # Load every asset that isn't loaded yet
+    def load_all(self):
+        try:
+            for name in list(self.loaders):
+                self.load(name)
+        except Exception as error:
+            self.error = error # Raised again on the main thread by ready()
+
+    # Start loading every asset on a background thread
+    def start(self):
+        self.thread = threading.Thread(target=self.load_all, daemon=True)
+        self.thread.start()
+
+    # Wait until the background thread has loaded every asset
+    def wait(self):
+        if self.thread:
+            self.thread.join()
+        return self.ready()
+
+    # Check if every asset has been loaded
+    def ready(self):
+        if self.error:
+            raise self.error
+        return len(self.loaded) == len(self.loaders)
+
+    def __getitem__(self, name):
+        if name in self.loaded:
+            return self.loaded[name]
+        if self.thread:
+            return self.placeholders[name] # Still being loaded in the background
+        return self.load(name) # Lazy loading, the asset is loaded the first time it's used
+
+    def __contains__(self, name):
+        return name in self.loaders
+
+    def __iter__(self):
+        return iter(self.loaders)
@@ -0,0 +1,738 @@
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # Benchmarks don't need a window
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+import argparse
+import gc
+import json
+import math
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+import pygame
+from map import Tilemap, PHYSICS_BLOCKS, NEIGHBOR_OFFSETS, AUTOTILE_MAP, AUTOTILES_TYPES, loc_key
+from pagedmap import PagedTilemap
+from level import LevelSnapshot
+from projectiles import ProjectilePool
+from finaleprojecto import Game, NO_INPUT
+from entities import PhysicsEntity, Enemy
+from broadphase import SpatialGrid
+from replay import Replay, load_replay, seed_arg, SEEDS
+from hud import Hud
+from mapgen import generate_map, ground_heights
+from tests.legacy import legacy_tiles_around, legacy_solid_check, legacy_physics_rects_around, legacy_autotile, legacy_extract, LegacyEntity, legacy_overlay
+
+MAPS = ['maps/0.json', 'maps/1.json', 'maps/2.json']
+# Code run in a fresh process to time a cold start (MODE is 'png', 'atlas', 'first_frame' or 'ready')
+# 'first_frame' is the time until the loading screen is drawn, 'ready' is the time until the level is playable
+STARTUP_CODE = '''
+import os, time
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+import pygame
+pygame.init()
+pygame.display.set_mode((960, 720))
+start = time.perf_counter()
+if MODE == 'png':
+    import assets
+    assets.load_source_assets()
+elif MODE == 'atlas':
+    import assets
+    assets.load_assets()
+else:
+    from finaleprojecto import Game, NO_INPUT
+    game = Game()
+    game.render()
+    while MODE == 'ready' and game.loading:
+        game.update(NO_INPUT)
+        game.render()
+print(time.perf_counter() - start)
+'''
+# Code run in a fresh process to time a presenter (Each one opens the window its own way, so they can't share a process)
+# 'playing' frames change every frame, 'static' frames show the same picture again like the win screen or an idle editor
+PRESENT_CODE = '''
+import json, random, time
+from finaleprojecto import Game
+game = Game(headless=True, present=NAME, seed=0)
+while game.loading:
+    game.update(NO_INPUT)
+game.render() # Makes the Hud
+rng = random.Random(0)
+timings = {'render': [], 'present': []}
+present = game.presenter.present
+def timed_present(display):
+    start = time.perf_counter()
+    present(display)
+    timings['present'].append(time.perf_counter() - start)
+game.presenter.present = timed_present
+for frame in range(FRAMES):
+    game.update({'left': False, 'right': frame // 120 % 2 == 0, 'jump': rng.random() < 0.03, 'dash': rng.random() < 0.02})
+    start = time.perf_counter()
+    game.render()
+    timings['render'].append(time.perf_counter() - start)
+playing = timings['present']
+timings['present'] = []
+for frame in range(FRAMES):
+    game.present()
+print(json.dumps({'playing': playing, 'static': timings['present'], 'render': timings['render']}))
+'''.replace('NO_INPUT', repr({'left': False, 'right': False, 'jump': False, 'dash': False}))
+PHASES = ['leaves', 'clouds', 'tilemap_render', 'enemy_update', 'entity_render', 'player_physics', 'projectiles', 'sparks', 'particles', 'present']
+
+# Times the bulk and incremental autotiles against the old autotile (tests/test_autotile.py checks they give the same variants)
+def bench_autotile(args):
+    game = Game(headless=True)
+    rng = random.Random(args.seed)
+    tilemap = generate_map(Tilemap(game), args.tiles, seed=args.seed)
+    legacy = {loc_key(loc): dict(tilemap.grid[loc]) for loc in tilemap.grid}
+    legacy_ms = timeit.timeit(lambda: legacy_autotile(legacy), number=args.repeat) / args.repeat * 1000
+    bulk_ms = timeit.timeit(tilemap.autotile, number=args.repeat) / args.repeat * 1000
+    locs = list(tilemap.grid)
+    incremental_us = timeit.timeit(lambda: tilemap.autotile_around(rng.choice(locs)), number=10000) / 10000 * 1000000
+    print(f'{len(tilemap.grid)} tiles: old autotile {legacy_ms:.1f} ms, bulk autotile {bulk_ms:.1f} ms, incremental {incremental_us:.1f} us per edit')
+    return {'tiles': len(tilemap.grid), 'legacy_ms': legacy_ms, 'bulk_ms': bulk_ms, 'incremental_us': incremental_us}
+
+# Level setup lookups (The spawners and the trees) on a big map: scanning every tile vs the (type, variant) index
+# (tests/test_tilemap.py checks they find the same tiles)
+def bench_extract(args):
+    tilemap = generate_map(Tilemap(None), args.tiles, seed=args.seed)
+    rng = random.Random(args.seed)
+    locs = list(tilemap.grid)
+    for loc in rng.sample(locs, args.spawners):
+        tilemap.store_tile((loc[0], loc[1] - 1), {'type': 'spawners', 'variant': 1, 'pos': [loc[0], loc[1] - 1]})
+    pairs = [('spawners', 0), ('spawners', 1)]
+    legacy_ms = timeit.timeit(lambda: legacy_extract(tilemap, pairs), number=args.repeat) / args.repeat * 1000
+    index_ms = timeit.timeit(lambda: tilemap.extract(pairs, keep=True), number=args.repeat) / args.repeat * 1000
+    print(f'{len(tilemap.grid)} tiles, {tilemap.count_tiles(pairs[1])} enemy spawners: scan {legacy_ms:.2f} ms, index {index_ms:.3f} ms')
+    return {'tiles': len(tilemap.grid), 'scan_ms': legacy_ms, 'index_ms': index_ms}
+
+# Memory and update speed of many entities: the slotted entities with shared animation clips vs the legacy ones
+# Every entity walks back and forth on the ground of the level and switches between its walk and idle animations
+# (tests/test_entities.py checks both kinds end up in the same places)
+def bench_entities(args):
+    game = Game(headless=True)
+    rng = random.Random(args.seed)
+    spots = ground_heights(game.tilemap)
+    positions = [(spot[0] + rng.random() * 8, spot[1] - 16) for spot in (rng.choice(spots) for i in range(args.entities))]
+    results = {'entities': args.entities, 'frames': args.frames}
+    for name, cls in [('legacy', LegacyEntity), ('slotted', PhysicsEntity)]:
+        gc.collect()
+        tracemalloc.start()
+        entities = [cls(game, 'enemy', pos, (16, 16)) for pos in positions]
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        gc.collect()
+        gc_runs = sum(stats['collections'] for stats in gc.get_stats())
+        start = time.perf_counter()
+        for frame in range(args.frames):
+            movement = (0.5 if frame // 30 % 2 else -0.5, 0) if frame // 15 % 2 else (0, 0)
+            for entity in entities:
+                entity.update(game.tilemap, movement)
+                entity.set_action('walk' if movement[0] else 'idle')
+        update_ms = (time.perf_counter() - start) * 1000 / args.frames
+        gc_runs = sum(stats['collections'] for stats in gc.get_stats()) - gc_runs
+        results[name] = {'bytes_per_entity': memory / args.entities, 'update_ms_per_frame': update_ms, 'gc_collections': gc_runs}
+        print(f'{name:8} {memory / args.entities:7.0f} bytes per entity   {update_ms:8.2f} ms per frame   {gc_runs} garbage collections')
+    return results
+
+# Cost of the overlay (Enemy counter and the transition) per frame, drawn the legacy way vs with the Hud, over a whole transition out and in
+# and how many times the win screen is drawn and shown in a second of frames (tests/test_hud.py checks both draw the same pixels)
+def bench_hud(args):
+    game = Game(headless=True)
+    game.hud = Hud(game.display.get_size())
+    results = {'frames': args.frames}
+    for name, draw in [('legacy', legacy_overlay), ('hud', lambda game: game.render_overlay())]:
+        total = 0
+        for frame in range(args.frames):
+            game.transition = frame % 61 - 30
+            game.display.blit(game.assets['background'], (0, 0))
+            start = time.perf_counter()
+            draw(game)
+            total += time.perf_counter() - start
+        results[name] = {'overlay_ms': total * 1000 / args.frames}
+        print(f'{name:7} overlay {total * 1000 / args.frames:6.3f} ms per frame')
+
+    game.transition = 0
+    game.win_screen = True
+    presents = [0]
+    present = game.present
+    def counted_present():
+        presents[0] += 1
+        present()
+    game.present = counted_present
+    start = time.perf_counter()
+    for frame in range(60):
+        game.render()
+    render_ms = (time.perf_counter() - start) * 1000 / 60
+    results['win_screen'] = {'presents_per_60_frames': presents[0], 'render_ms': render_ms, 'frame_cap': game.frame_cap()}
+    print(f'win screen: shown {presents[0]} times in 60 frames, {render_ms:.3f} ms per frame, capped at {game.frame_cap()} fps')
+    return results
+
+# Interaction checks between many enemies, projectiles and the player: checking every pair vs the SpatialGrid broadphase
+# The grid times include building it, since the game builds it again every frame (tests/test_broadphase.py checks both find the same things)
+def bench_broadphase(args):
+    game = Game(headless=True)
+    rng = random.Random(args.seed)
+    size = args.area
+    game.enemies = [Enemy(game, (rng.random() * size, rng.random() * size), (16, 16)) for i in range(args.enemies)]
+    game.projectiles = ProjectilePool(args.projectiles)
+    for i in range(args.projectiles):
+        game.projectiles.spawn((rng.random() * size, rng.random() * size), rng.choice((-1.5, 1.5)))
+    projectiles = game.projectiles
+    players = [pygame.Rect(rng.random() * size, rng.random() * size, 16, 16) for i in range(args.repeat)]
+
+    # The player dashing through the enemies (The game checks every pair, see Game.update_enemies)
+    def pairs_dash(player):
+        return [enemy for enemy in game.enemies if enemy.rect().colliderect(player)]
+    def grid_dash(player):
+        game.enemy_grid = None
+        return game.enemies_in(player)
+
+    # Projectiles touching each enemy (Like a projectile that could hit any enemy)
+    def pairs_shots():
+        return [[slot for slot in projectiles.live if enemy.rect().collidepoint(projectiles.x[slot], projectiles.y[slot])] for enemy in game.enemies]
+    def grid_shots():
+        grid = SpatialGrid()
+        projectiles.register(grid)
+        hits = []
+        for enemy in game.enemies:
+            rect = enemy.rect()
+            hits.append(sorted(slot for slot in grid.query(rect) if rect.collidepoint(projectiles.x[slot], projectiles.y[slot])))
+        return hits
+
+    # Enemies touching each other
+    def pairs_crowd():
+        rects = [enemy.rect() for enemy in game.enemies]
+        return [[j for j, other in enumerate(rects) if i != j and rect.colliderect(other)] for i, rect in enumerate(rects)]
+    def grid_crowd():
+        grid = SpatialGrid()
+        rects = [enemy.rect() for enemy in game.enemies]
+        for i, rect in enumerate(rects):
+            grid.insert(i, rect)
+        return [[j for j in grid.query(rect) if i != j and rect.colliderect(rects[j])] for i, rect in enumerate(rects)]
+
+    checks = [
+        ('player vs enemies', lambda: [pairs_dash(player) for player in players], lambda: [grid_dash(player) for player in players], len(players)),
+        ('  (grid built once)', lambda: [pairs_dash(player) for player in players], lambda: [game.enemies_in(player) for player in players], len(players)),
+        ('enemies vs projectiles', pairs_shots, grid_shots, 1),
+        ('enemies vs enemies', pairs_crowd, grid_crowd, 1),
+    ]
+    results = {'enemies': args.enemies, 'projectiles': args.projectiles}
+    print(f'{args.enemies} enemies and {args.projectiles} projectiles in a {size}x{size} pixel area')
+    for name, pairs, grid, calls in checks:
+        pairs_ms = min(timeit.repeat(pairs, number=1, repeat=3)) / calls * 1000
+        grid_ms = min(timeit.repeat(grid, number=1, repeat=3)) / calls * 1000
+        results[name] = {'pairs_ms': pairs_ms, 'grid_ms': grid_ms}
+        print(f'{name:24} every pair {pairs_ms:9.3f} ms   grid {grid_ms:8.3f} ms')
+    return results
+
+# Offgrid lookups of the chunk renderer and the editor eraser: scanning the whole list vs the spatial hash
+# (tests/test_tilemap.py checks they find the same tiles)
+def bench_offgrid(args):
+    game = Game(headless=True)
+    rng = random.Random(args.seed)
+    tilemap = Tilemap(game)
+    width = args.width * tilemap.tile_size
+    for i in range(args.decor):
+        tilemap.offgrid_tiles.append({'type': rng.choice(['decor', 'large_decor']), 'variant': rng.randrange(3), 'pos': [rng.random() * width, rng.random() * width]})
+    chunk_px = tilemap.tile_size * 16
+    rects = [pygame.Rect(rng.randrange(width), rng.randrange(width), chunk_px, chunk_px) for i in range(200)]
+    points = [(rng.random() * width, rng.random() * width) for i in range(200)]
+
+    # The old lookups: a rectangle for every offgrid tile
+    def scan_rect(rect):
+        return [tile for tile in tilemap.offgrid_tiles if tilemap.tile_rect(tile, ongrid=False).colliderect(rect)]
+    def scan_point(pos):
+        hits = []
+        for tile in tilemap.offgrid_tiles:
+            img = game.assets[tile['type']][tile['variant']]
+            if pygame.Rect(tile['pos'][0], tile['pos'][1], img.get_width(), img.get_height()).collidepoint(pos):
+                hits.append(tile)
+        return hits
+
+    start = time.perf_counter()
+    tilemap.offgrid_in_rect(rects[0])
+    build_ms = (time.perf_counter() - start) * 1000
+    results = {
+        'decor': args.decor,
+        'index_build_ms': build_ms,
+        'scan_rect_us': timeit.timeit(lambda: [scan_rect(rect) for rect in rects], number=1) / len(rects) * 1000000,
+        'index_rect_us': timeit.timeit(lambda: [tilemap.offgrid_in_rect(rect) for rect in rects], number=1) / len(rects) * 1000000,
+        'scan_point_us': timeit.timeit(lambda: [scan_point(pos) for pos in points], number=1) / len(points) * 1000000,
+        'index_point_us': timeit.timeit(lambda: [tilemap.offgrid_at(pos) for pos in points], number=1) / len(points) * 1000000,
+    }
+    print(f'{args.decor} offgrid tiles, index built in {build_ms:.1f} ms')
+    print(f'chunk lookup  scan {results["scan_rect_us"]:9.1f} us   index {results["index_rect_us"]:7.1f} us')
+    print(f'eraser lookup scan {results["scan_point_us"]:9.1f} us   index {results["index_point_us"]:7.1f} us')
+    return results
+
+# Random query positions spread over the area covered by the map
+def query_points(tilemap, count, seed=0):
+    rng = random.Random(seed)
+    xs = [loc[0] for loc in tilemap.grid]
+    ys = [loc[1] for loc in tilemap.grid]
+    size = tilemap.tile_size
+    return [(rng.uniform(min(xs), max(xs) + 1) * size, rng.uniform(min(ys), max(ys) + 1) * size) for i in range(count)]
+
+# Time one query function over all the points (Returns microseconds per query)
+def time_query(func, points, repeat):
+    def run():
+        for pos in points:
+            func(pos)
+    return min(timeit.repeat(run, number=1, repeat=repeat)) / len(points) * 1000000
+
+# Microbenchmark of the tilemap queries used by the physics every frame
+def bench_queries(args):
+    results = {}
+    for path in args.maps:
+        tilemap = Tilemap(None)
+        tilemap.load(path)
+        legacy = {loc: tilemap.tilemap[loc] for loc in tilemap.tilemap}
+        size = tilemap.tile_size
+        points = query_points(tilemap, args.points)
+        queries = {
+            'tiles_around': (lambda pos: legacy_tiles_around(legacy, size, pos), tilemap.tiles_around),
+            'solid_check': (lambda pos: legacy_solid_check(legacy, size, pos), tilemap.solid_check),
+            'physics_rects_around': (lambda pos: legacy_physics_rects_around(legacy, size, pos), tilemap.physics_rects_around),
+        }
+        results[path] = {}
+        print(path)
+        for name, (old, new) in queries.items():
+            old_us = time_query(old, points, args.repeat)
+            new_us = time_query(new, points, args.repeat)
+            results[path][name] = {'legacy_us': old_us, 'grid_us': new_us, 'speedup': old_us / new_us}
+            print('  %-22s legacy %6.2f us   grid %6.2f us   x%.1f' % (name, old_us, new_us, old_us / new_us))
+    return results
+
+# Percentile of an already sorted list
+def percentile(values, p):
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+# Mean, p95 and p99 of a list of times in milliseconds
+def summarize(times):
+    times = sorted(times)
+    return {'mean_ms': sum(times) / len(times), 'p95_ms': percentile(times, 95), 'p99_ms': percentile(times, 99)}
+
+# Keeps large numbers of enemies, projectiles, particles and sparks alive around the player
+class Scenario:
+    def __init__(self, game, args):
+        self.game = game
+        self.rng = random.Random(args.seed)
+        self.counts = {'projectiles': args.projectiles, 'particles': args.particles, 'sparks': args.sparks}
+        player = game.player.rect()
+        # Spawn the crowd on the ground within the area around the player
+        self.spots = [spot for spot in ground_heights(game.tilemap) if abs(spot[0] - player.centerx) < args.spread] or ground_heights(game.tilemap)
+        for i in range(args.enemies):
+            spot = self.rng.choice(self.spots)
+            game.enemies.append(Enemy(game, (spot[0], spot[1] - 16), (16, 16)))
+        game.enemy_count = game.total_enemies = len(game.enemies)
+
+    # Spawn new projectiles, particles and sparks to replace the ones that died
+    def refill(self):
+        game = self.game
+        rng = self.rng
+        for i in range(self.counts['projectiles'] - len(game.projectiles)):
+            spot = rng.choice(self.spots)
+            game.projectiles.spawn((spot[0], spot[1] - rng.randint(4, 40)), rng.choice((-1.5, 1.5)), age=rng.randint(0, 300))
+        for i in range(self.counts['particles'] - len(game.particles)):
+            spot = rng.choice(self.spots)
+            angle = rng.random() * math.pi * 2
+            game.particles.emit(rng.choice(('particle', 'leaf')), (spot[0], spot[1] - rng.randint(4, 80)), velocity=(math.cos(angle), math.sin(angle)), frame=rng.randint(0, 7))
+        for i in range(self.counts['sparks'] - len(game.sparks)):
+            spot = rng.choice(self.spots)
+            game.sparks.emit((spot[0], spot[1] - rng.randint(4, 40)), rng.random() * math.pi * 2, 2 + rng.random() * 3)
+
+# Run one frame with every phase timed on its own (Same order as Game.update and Game.render)
+def timed_frame(game, timings):
+    game.scroll[0] += (game.player.rect().centerx - game.display.get_width() / 2 - game.scroll[0]) / 20
+    game.scroll[1] += (game.player.rect().centery - game.display.get_height() / 2 - game.scroll[1]) / 20
+    offset = (int(game.scroll[0]), int(game.scroll[1]))
+    game.display.blit(game.assets['background'], (0, 0))
+
+    phases = [
+        ('leaves', game.update_leaves),
+        ('clouds', lambda: (game.clouds.update(), game.clouds.render(game.display, offset=offset))),
+        ('tilemap_render', lambda: game.tilemap.render(game.display, offset=offset)),
+        ('enemy_update', game.update_enemies),
+        ('player_physics', lambda: game.player.update(game.tilemap, (0, 0))),
+        ('entity_render', lambda: game.render_entities(offset)),
+        ('projectiles', lambda: (game.update_projectiles(), game.render_projectiles(offset))),
+        ('sparks', lambda: (game.update_sparks(), game.render_sparks(offset))),
+        ('particles', lambda: (game.update_particles(), game.render_particles(offset))),
+        ('present', game.present),
+    ]
+    frame_start = time.perf_counter()
+    for name, phase in phases:
+        start = time.perf_counter()
+        phase()
+        timings[name].append((time.perf_counter() - start) * 1000)
+    timings['frame'].append((time.perf_counter() - frame_start) * 1000)
+
+# The fixed-step loop at different display rates: the same seconds of play are rendered at 30, 60 and 144 frames a second
+# with the player running right and jumping every second. With --spike every 60th frame takes a quarter of a second.
+# (tests/test_timestep.py checks the player takes the same path at every rate and the catch-up stays bounded)
+def bench_timestep(args):
+    results = {}
+    for fps in args.rates:
+        game = Game(headless=True, seed=args.seed)
+        game.preload_levels = False
+        trace = []
+        step = game.update
+        game.update = lambda inputs: (step(inputs), trace.append((game.player.pos[0], game.player.pos[1])))
+        frames = 0
+        most_steps = 0
+        start = time.perf_counter()
+        for frame in range(int(args.seconds * fps)):
+            elapsed = 0.25 if args.spike and frame % 60 == 59 else 1 / fps
+            inputs = dict(NO_INPUT, right=True, jump=frame % fps == 0)
+            before = len(trace)
+            game.render(game.advance(elapsed, inputs))
+            most_steps = max(most_steps, len(trace) - before)
+            frames += 1
+        wall = time.perf_counter() - start
+        results[fps] = {'frames': frames, 'steps': len(trace), 'most_steps_in_a_frame': most_steps, 'ms_per_frame': wall * 1000 / frames}
+        print(f'{fps:4} fps: {frames:5} frames, {len(trace):5} simulation steps, at most {most_steps} in one frame, {wall * 1000 / frames:.2f} ms per frame')
+    return results
+
+# Record a run of a level with scripted inputs: the player runs in one direction for a while, jumps and dashes now and then
+def record_run(level, steps, seed):
+    game = Game(headless=True, level=level, seed=seed)
+    game.replay = Replay(game.seed, level)
+    rng = random.Random(seed)
+    right = True
+    for step in range(steps):
+        if rng.random() < 0.01:
+            right = not right
+        game.update({'left': not right, 'right': right, 'jump': rng.random() < 0.03, 'dash': rng.random() < 0.02})
+    return game.replay
+
+# Play replays back headless with rendering, as fixed workloads to compare frame times between versions of the game
+# Without paths, scripted runs of every level are recorded first (Each one is played back twice to check it's deterministic)
+def bench_replay(args):
+    paths = args.paths
+    if not paths:
+        folder = tempfile.mkdtemp()
+        paths = []
+        for level in range(3):
+            paths.append(os.path.join(folder, f'{level}.rpl'))
+            record_run(level, args.steps, (args.seed + level) % SEEDS).save(paths[-1])
+    results = {}
+    print('%-12s %7s %9s %9s %9s %11s   %s' % ('replay', 'steps', 'mean ms', 'p99 ms', 'max ms', 'max at step', 'checksums'))
+    for path in paths:
+        for run in range(1 if args.paths else 2):
+            replay = load_replay(path)
+            game = Game(headless=True, level=replay.level, seed=replay.seed, replay=replay)
+            times = game.run_replay(render=True)
+            stats = summarize(times)
+            stats['slowest_step'] = max(range(len(times)), key=lambda step: times[step])
+            stats['max_ms'] = times[stats['slowest_step']]
+            stats['diverged'] = replay.diverged
+            results[f'{os.path.basename(path)} run {run + 1}'] = stats
+            print('%-12s %7d %9.3f %9.3f %9.3f %11d   %s' % (os.path.basename(path), len(times), stats['mean_ms'], stats['p99_ms'], stats['max_ms'], stats['slowest_step'], 'match' if replay.diverged is None else f'diverged by step {replay.diverged}'))
+    return results
+
+# Frame times across every level change: the enemies are cleared after some frames of play so the level ends
+# Without preloading the next level is loaded on the frame the transition ends
+def bench_levels(args):
+    results = {}
+    for preload in [False, True]:
+        game = Game(headless=True)
+        game.preload_levels = preload
+        if not preload:
+            game.preload = None # Drop the preload of level 1 that the first level started
+        trace = []
+        changes = []
+        level = game.level
+        while not game.win_screen and len(trace) < 10000:
+            if game.level != level:
+                changes.append(len(trace))
+                level = game.level
+            if len(trace) - (changes[-1] if changes else 0) == args.play:
+                game.enemies.clear()
+            start = time.perf_counter()
+            game.update(NO_INPUT)
+            game.render()
+            trace.append((time.perf_counter() - start) * 1000)
+        name = 'preload' if preload else 'no_preload'
+        swaps = [max(trace[change - 2:change + 3]) for change in changes]
+        results[name] = {'trace_ms': trace, 'level_changes': changes, 'swap_frame_ms': swaps, 'median_frame_ms': sorted(trace)[len(trace) // 2]}
+        print('%-10s  median frame %.2f ms, slowest frame %.2f ms, slowest frame around each level change: %s' % (name, results[name]['median_frame_ms'], max(trace), ', '.join('%.2f ms' % t for t in swaps)))
+    return results
+
+# Frame timings of a stress scenario on a synthetic (or shipped) map
+def bench_frames(args):
+    game = Game(headless=True, seed=args.seed)
+    game.tilemap = Tilemap(game)
+    if args.map:
+        game.tilemap.load(args.map)
+    else:
+        generate_map(game.tilemap, args.tiles, seed=args.seed)
+    game.setup_level(LevelSnapshot(game.tilemap))
+    game.projectiles = ProjectilePool(args.projectiles + 1024) # Room for the scenario's projectiles and the ones the enemies shoot
+    game.dead = 0
+    game.cull = not args.no_cull
+    scenario = Scenario(game, args)
+
+    timings = {name: [] for name in PHASES + ['frame']}
+    for i in range(args.warmup + args.frames):
+        scenario.refill()
+        if i == args.warmup:
+            timings = {name: [] for name in PHASES + ['frame']}
+        timed_frame(game, timings)
+
+    results = {
+        'config': {'map': args.map, 'tiles': len(game.tilemap.grid), 'seed': args.seed, 'frames': args.frames, 'enemies': args.enemies, 'projectiles': args.projectiles, 'particles': args.particles, 'sparks': args.sparks, 'cull': game.cull},
+        'phases': {name: summarize(timings[name]) for name in timings},
+    }
+    baseline = None
+    if args.baseline:
+        f = open(args.baseline, 'r')
+        baseline = json.load(f)['phases']
+        f.close()
+
+    print('%-16s %9s %9s %9s' % ('phase', 'mean ms', 'p95 ms', 'p99 ms') + ('   vs baseline (mean / p95)' if baseline else ''))
+    for name, stats in results['phases'].items():
+        line = '%-16s %9.3f %9.3f %9.3f' % (name, stats['mean_ms'], stats['p95_ms'], stats['p99_ms'])
+        if baseline and name in baseline:
+            line += '   %+6.1f%% / %+6.1f%%' % ((stats['mean_ms'] / baseline[name]['mean_ms'] - 1) * 100, (stats['p95_ms'] / baseline[name]['p95_ms'] - 1) * 100)
+        print(line)
+    return results
+
+# Generate a synthetic map and save it as JSON (So it can be opened in the editor or loaded by the game)
+def bench_mapgen(args):
+    tilemap = generate_map(Tilemap(None), args.tiles, seed=args.seed)
+    tilemap.save(args.path)
+    print(f'Saved {len(tilemap.grid)} tiles to {args.path}')
+    return {'path': args.path, 'tiles': len(tilemap.grid)}
+
+# Load time and memory of a map in the JSON format vs the binary format (See mapfile.py)
+# Peak is the most memory in use while loading, retained is what is still in use once the Tilemap is loaded
+def bench_mapformat(args):
+    sources = [(path, None) for path in args.maps] + [('synthetic %d tiles' % args.tiles, generate_map(Tilemap(None), args.tiles, seed=args.seed))]
+    results = {}
+    folder = tempfile.mkdtemp()
+    for name, tilemap in sources:
+        if tilemap is None:
+            tilemap = Tilemap(None)
+            tilemap.load(name)
+        results[name] = {}
+        for ext in ['json', 'map']:
+            path = os.path.join(folder, 'bench.' + ext)
+            tilemap.save(path)
+            times = []
+            for i in range(args.repeat):
+                start = time.perf_counter()
+                Tilemap(None).load(path)
+                times.append((time.perf_counter() - start) * 1000)
+            tracemalloc.start()
+            loaded = Tilemap(None)
+            loaded.load(path)
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[name][ext] = {'file_bytes': os.path.getsize(path), 'load_ms': sorted(times)[len(times) // 2], 'peak_kb': peak / 1024, 'retained_kb': retained / 1024}
+            row = results[name][ext]
+            print('%-26s %-4s %9d bytes  load %8.2f ms  peak %9.0f KB  retained %9.0f KB' % (name, ext, row['file_bytes'], row['load_ms'], row['peak_kb'], row['retained_kb']))
+    return results
+
+# A camera runs along the ground of a big synthetic map, streamed with PagedTilemap vs loaded whole
+# Every frame does the physics queries of a player at the camera center
+def bench_streaming(args):
+    tilemap = generate_map(Tilemap(None), args.tiles, seed=args.seed)
+    path = os.path.join(tempfile.mkdtemp(), 'stream.map')
+    tilemap.save(path)
+    path_points = ground_heights(tilemap)
+    del tilemap
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    full = Tilemap(None)
+    full.load(path)
+    full_load_ms = (time.perf_counter() - start) * 1000
+    full_kb = tracemalloc.get_traced_memory()[0] / 1024
+    del full
+    tracemalloc.stop()
+
+    # The run is done twice, memory is traced in the first one and the second one is timed (Tracing slows everything down)
+    for traced in [True, False]:
+        if traced:
+            tracemalloc.start()
+        start = time.perf_counter()
+        paged = PagedTilemap(None, max_chunks=args.max_chunks)
+        paged.load(path)
+        paged_load_ms = (time.perf_counter() - start) * 1000
+        times = []
+        most_pages = 0
+        step = max(1, args.speed // paged.tile_size)
+        for frame, i in enumerate(range(0, min(len(path_points), args.frames * step), step)):
+            if frame == 10:
+                warmup_faults = paged.faults
+            x, y = path_points[i]
+            start = time.perf_counter()
+            paged.stream(pygame.Rect(x - 320, y - 240, 640, 480), [(x, y - 8)])
+            paged.physics_rects_around((x, y - 8))
+            paged.solid_check((x, y + 1))
+            times.append((time.perf_counter() - start) * 1000)
+            most_pages = max(most_pages, len(paged.pages))
+            time.sleep(args.frame_time / 1000) # Leave the background thread time to prefetch, like the rest of a frame would
+        if traced:
+            paged_kb = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        paged.close()
+
+    results = {
+        'full': {'load_ms': full_load_ms, 'memory_kb': full_kb},
+        'paged': {'load_ms': paged_load_ms, 'peak_memory_kb': paged_kb, 'frames': len(times), 'most_chunks': most_pages,
+                  'faults_after_warmup': paged.faults - warmup_faults, 'stream': summarize(times)},
+    }
+    print('full load   %8.1f ms   %8.0f KB' % (full_load_ms, full_kb))
+    print('paged load  %8.1f ms   %8.0f KB peak, %d chunks at most' % (paged_load_ms, paged_kb, most_pages))
+    print('stream per frame  mean %.3f ms  p99 %.3f ms  over %d frames, %d chunks loaded on the main thread after warmup' % (
+        results['paged']['stream']['mean_ms'], results['paged']['stream']['p99_ms'], len(times), results['paged']['faults_after_warmup']))
+    return results
+
+# Cold start time of the asset loading (After pygame is imported and the window is open), every run is a new process so nothing is cached in memory
+# Frame times of the presenters (Scaling the display up to the window and showing it), each in its own process
+# The render time is the whole frame, since the sdl2 presenter also changes how fast the images draw (They aren't converted)
+def bench_present(args):
+    results = {}
+    for name in args.presenters:
+        output = subprocess.run([sys.executable, '-c', 'NAME = %r\nFRAMES = %d\n' % (name, args.frames) + PRESENT_CODE], capture_output=True, text=True, check=True).stdout
+        times = json.loads(output.splitlines()[-1])
+        results[name] = {phase: summarize([t * 1000 for t in times[phase]]) for phase in ['playing', 'static', 'render']}
+        print(f"{name:6} present while playing {results[name]['playing']['mean_ms']:6.3f} ms   on a static screen {results[name]['static']['mean_ms']:6.3f} ms   whole frame {results[name]['render']['mean_ms']:6.3f} ms")
+    return results
+
+def bench_startup(args):
+    results = {}
+    for mode in args.modes:
+        times = []
+        for i in range(args.runs):
+            output = subprocess.run([sys.executable, '-c', 'MODE = %r\n' % mode + STARTUP_CODE], capture_output=True, text=True, check=True).stdout
+            times.append(float(output.split()[-1]) * 1000)
+        results[mode] = {'median_ms': sorted(times)[len(times) // 2], 'min_ms': min(times)}
+        print('%-11s median %7.1f ms   min %7.1f ms' % (mode, results[mode]['median_ms'], results[mode]['min_ms']))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Samurai Dash benchmarks')
+    parser.add_argument('--out', help='Write the results to this JSON file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    queries = commands.add_parser('queries', help='Per-query cost of the tilemap lookups')
+    queries.add_argument('--maps', nargs='+', default=MAPS)
+    queries.add_argument('--points', type=int, default=20000)
+    queries.add_argument('--repeat', type=int, default=5)
+    queries.set_defaults(func=bench_queries)
+
+    frames = commands.add_parser('frames', help='Per-phase frame timings of a stress scenario')
+    frames.add_argument('--map', help='Use this map file instead of a synthetic map')
+    frames.add_argument('--tiles', type=int, default=10000, help='Number of tiles in the synthetic map')
+    frames.add_argument('--seed', type=int, default=0)
+    frames.add_argument('--frames', type=int, default=300)
+    frames.add_argument('--warmup', type=int, default=30)
+    frames.add_argument('--enemies', type=int, default=100)
+    frames.add_argument('--projectiles', type=int, default=500)
+    frames.add_argument('--particles', type=int, default=1000)
+    frames.add_argument('--sparks', type=int, default=500)
+    frames.add_argument('--spread', type=int, default=1200, help='Entities are placed within this many pixels of the player')
+    frames.add_argument('--no-cull', action='store_true', help='Simulate and draw every enemy and tree, even the far away ones')
+    frames.add_argument('--baseline', help='Compare against results saved earlier with --out')
+    frames.set_defaults(func=bench_frames)
+
+    startup = commands.add_parser('startup', help='Cold start time: PNG decoding vs the cached atlas, and a Game() until its first frame and until it is playable')
+    startup.add_argument('--modes', nargs='+', default=['png', 'atlas', 'first_frame', 'ready'])
+    startup.add_argument('--runs', type=int, default=5)
+    startup.set_defaults(func=bench_startup)
+
+    mapformat = commands.add_parser('mapformat', help='Load time and memory of the JSON and binary map formats')
+    mapformat.add_argument('--maps', nargs='+', default=MAPS)
+    mapformat.add_argument('--tiles', type=int, default=200000, help='Number of tiles in the synthetic map')
+    mapformat.add_argument('--seed', type=int, default=0)
+    mapformat.add_argument('--repeat', type=int, default=5)
+    mapformat.set_defaults(func=bench_mapformat)
+
+    streaming = commands.add_parser('streaming', help='Chunk streaming of a big map vs loading it whole')
+    streaming.add_argument('--tiles', type=int, default=200000, help='Number of tiles in the synthetic map')
+    streaming.add_argument('--seed', type=int, default=0)
+    streaming.add_argument('--frames', type=int, default=3000)
+    streaming.add_argument('--max-chunks', type=int, default=128)
+    streaming.add_argument('--speed', type=int, default=16, help='Camera speed in pixels per frame')
+    streaming.add_argument('--frame-time', type=float, default=1.0, help='Milliseconds of other work per frame')
+    streaming.set_defaults(func=bench_streaming)
+
+    autotile = commands.add_parser('autotile', help='Time the bulk and incremental autotiles against the old one')
+    autotile.add_argument('--tiles', type=int, default=100000, help='Number of tiles in the synthetic map that is timed')
+    autotile.add_argument('--seed', type=int, default=0)
+    autotile.add_argument('--repeat', type=int, default=5)
+    autotile.set_defaults(func=bench_autotile)
+
+    extract = commands.add_parser('extract', help='Spawner lookups of the level setup: tile scan vs type index')
+    extract.add_argument('--tiles', type=int, default=200000)
+    extract.add_argument('--spawners', type=int, default=50)
+    extract.add_argument('--seed', type=int, default=0)
+    extract.add_argument('--repeat', type=int, default=20)
+    extract.set_defaults(func=bench_extract)
+
+    offgrid = commands.add_parser('offgrid', help='Offgrid tile lookups: list scan vs spatial hash')
+    offgrid.add_argument('--decor', type=int, default=20000, help='Number of offgrid tiles')
+    offgrid.add_argument('--width', type=int, default=1000, help='Width and height of the map in tiles')
+    offgrid.add_argument('--seed', type=int, default=0)
+    offgrid.set_defaults(func=bench_offgrid)
+
+    broadphase = commands.add_parser('broadphase', help='Enemy, projectile and player interaction checks: every pair vs the broadphase grid')
+    broadphase.add_argument('--enemies', type=int, default=500)
+    broadphase.add_argument('--projectiles', type=int, default=5000)
+    broadphase.add_argument('--area', type=int, default=4000, help='Width and height of the area the entities are spread over, in pixels')
+    broadphase.add_argument('--seed', type=int, default=0)
+    broadphase.add_argument('--repeat', type=int, default=100, help='Number of player positions to check')
+    broadphase.set_defaults(func=bench_broadphase)
+
+    entities = commands.add_parser('entities', help='Memory and update speed of many entities: slotted entities with shared clips vs the legacy ones')
+    entities.add_argument('--entities', type=int, default=10000)
+    entities.add_argument('--frames', type=int, default=60)
+    entities.add_argument('--seed', type=int, default=0)
+    entities.set_defaults(func=bench_entities)
+
+    timestep = commands.add_parser('timestep', help='The fixed-step simulation at different frame rates, and its catch-up after slow frames')
+    timestep.add_argument('--rates', type=int, nargs='+', default=[30, 60, 144], help='Frame rates to render at')
+    timestep.add_argument('--seconds', type=float, default=10)
+    timestep.add_argument('--spike', action='store_true', help='Make every 60th frame take a quarter of a second')
+    timestep.add_argument('--seed', type=int, default=0)
+    timestep.set_defaults(func=bench_timestep)
+
+    replay = commands.add_parser('replay', help='Frame times of replays played back with rendering (Scripted runs of every level when no files are given)')
+    replay.add_argument('paths', nargs='*', help='Replay files recorded with finaleprojecto.py --record')
+    replay.add_argument('--steps', type=int, default=3600, help='Steps of each scripted run')
+    replay.add_argument('--seed', type=seed_arg, default=0)
+    replay.set_defaults(func=bench_replay)
+
+    present = commands.add_parser('present', help='Frame times of the presenters (scale, sdl2 and dirty) while playing and on a static screen')
+    present.add_argument('--presenters', nargs='+', default=['scale', 'sdl2', 'dirty'])
+    present.add_argument('--frames', type=int, default=600)
+    present.set_defaults(func=bench_present)
+
+    hud = commands.add_parser('hud', help='Overlay cost per frame: loading the font and making the transition mask every frame vs the Hud, and the win screen redraws')
+    hud.add_argument('--frames', type=int, default=610)
+    hud.set_defaults(func=bench_hud)
+
+    levels = commands.add_parser('levels', help='Frame times across the level changes, with and without preloading the next level')
+    levels.add_argument('--play', type=int, default=120, help='Frames played on each level before its enemies are cleared')
+    levels.set_defaults(func=bench_levels)
+
+    mapgen = commands.add_parser('mapgen', help='Save a synthetic map')
+    mapgen.add_argument('path')
+    mapgen.add_argument('--tiles', type=int, default=10000)
+    mapgen.add_argument('--seed', type=int, default=0)
+    mapgen.set_defaults(func=bench_mapgen)
+
+    args = parser.parse_args()
+    results = args.func(args)
+    if args.out:
+        f = open(args.out, 'w')
+        json.dump(results, f, indent=2)
+        f.close()
+
+if __name__ == '__main__':
+    main()
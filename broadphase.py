@@ -0,0 +1,69 @@
+CELL_SIZE = 64 # Width and height of a grid cell in pixels (A few times the size of an entity)
+
+# Class to find the entities or projectiles near a place without checking every one of them
+# Items are added with the pixel rectangle they cover and stored in every cell of a uniform grid that the rectangle touches.
+# A query only looks at the cells its rectangle touches, so checking n things against m things costs about n + m instead of n * m.
+# The grid is meant to be filled again every frame (Items aren't moved, the grid is cleared and built from scratch)
+class SpatialGrid:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.clear()
+
+    # Remove every item
+    def clear(self):
+        self.cells = {} # (cell x, cell y) -> list of (order the item was added, item)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    # Add an item covering a pixel rectangle (A pygame.Rect or (x, y, width, height))
+    def insert(self, item, rect):
+        size = self.cell_size
+        entry = (self.count, item)
+        self.count += 1
+        x0 = int(rect[0] // size)
+        y0 = int(rect[1] // size)
+        x1 = int((rect[0] + rect[2]) // size)
+        y1 = int((rect[1] + rect[3]) // size)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            if (x0, y0) in cells:
+                cells[(x0, y0)].append(entry)
+            else:
+                cells[(x0, y0)] = [entry]
+            return
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                if (cx, cy) in cells:
+                    cells[(cx, cy)].append(entry)
+                else:
+                    cells[(cx, cy)] = [entry]
+
+    # Add an item at a single point (Faster than insert() for things like projectiles)
+    def insert_point(self, item, x, y):
+        cell = (int(x // self.cell_size), int(y // self.cell_size))
+        entry = (self.count, item)
+        self.count += 1
+        if cell in self.cells:
+            self.cells[cell].append(entry)
+        else:
+            self.cells[cell] = [entry]
+
+    # Items in the cells a pixel rectangle touches, in the order they were added
+    # These are candidates: the caller still checks if each one really overlaps
+    def query(self, rect):
+        size = self.cell_size
+        x0 = int(rect[0] // size)
+        y0 = int(rect[1] // size)
+        x1 = int((rect[0] + rect[2]) // size)
+        y1 = int((rect[1] + rect[3]) // size)
+        cells = self.cells
+        if x0 == x1 and y0 == y1:
+            return [item for order, item in cells.get((x0, y0), ())]
+        entries = {}
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for order, item in cells.get((cx, cy), ()):
+                    entries[order] = item # An item covering several cells is only returned once
+        return [entries[order] for order in sorted(entries)]
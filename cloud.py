@@ -16,16 +16,16 @@ class Cloud:
        
 
 class Clouds :
-    def __init__(self, cloud_images,count=16):
+    def __init__(self, cloud_images,count=16, rng=random):
         self.clouds = []
 
-        # Create clouds with random positions, images, speeds, and depths
+        # Create clouds with random positions, images, speeds, and depths (rng is a random.Random, or the random module itself)
         for i in range(count):
-            self.clouds.append(Cloud((random.random() * 999999, 
-                                     random.random() * 999999), 
-                                     random.choice(cloud_images), 
-                                     random.random() * 0.05 + 0.05, 
-                                     random.random() * 0.6 + 0.2
+            self.clouds.append(Cloud((rng.random() * 999999, 
+                                     rng.random() * 999999), 
+                                     rng.choice(cloud_images), 
+                                     rng.random() * 0.05 + 0.05, 
+                                     rng.random() * 0.6 + 0.2
                                      ))
 
         self.clouds.sort(key=lambda x : x.depth) # Sort clouds by depth for correct layering
@@ -1,26 +1,21 @@
 import pygame # Import the pygame module
 import sys # Import the sys to exit the program when the user clicks the X
-from utils import load_images
+import argparse
+from assets import load_assets
 from map import Tilemap
+from present import PRESENTERS
 
 RENDER_SCALE = 1.5
 
 class Editor():
-    def __init__(self): # Initialize the game
+    def __init__(self, present='scale'): # Initialize the game
         pygame.init() # Start the pygame
-        pygame.display.set_caption("Editor") # Rename the window title
-        self.screen = pygame.display.set_mode((960,720)) # Create the window for the game
+        self.presenter = PRESENTERS[present]("Editor") # Opens the window and shows the display on it, scaled up (See present.py)
         self.display = pygame.Surface((640,480)) # Create an empty image that has 320,240px size
         self.clock = pygame.time.Clock() # Set the fps at 60
 
-        # Load assets
-        self.assets = {
-            'decor' : (load_images ('tiles/decor' , colorkey = (0,0,0))),
-            'grass' : (load_images ('tiles/grass')),
-            'large_decor' : (load_images ('tiles/large_decor' , colorkey = (0,0,0))),
-            'stone' : (load_images ('tiles/stone')),
-            'spawners' : load_images('tiles/spawners'),
-        }
+        # Load assets (From the packed atlas, see assets.py)
+        self.assets = load_assets(['decor', 'grass', 'large_decor', 'stone', 'spawners'])
         
         self.movement = [False,False,False,False] # To move the image --> Boolean that could be updated by the if event.type statement
         self.tilemap = Tilemap(self, tile_size=16)
@@ -38,6 +33,8 @@ class Editor():
         self.right_clicking = False
         self.shift = False
         self.ongrid = True
+        self.autotiling = False # Autotile the tiles around every placed or removed tile
+        self.enemy_spawners = None # Number of enemy spawners shown in the window title
 
     def scale_images(self, images):
         return [pygame.transform.scale(img, (32,32)) for img in images] # Scale images to 32x32
@@ -70,30 +67,41 @@ class Editor():
 
             # Handle tile placement and removal
             if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ';' + str(tile_pos[1])] = {'type' : self.tile_list[self.tile_group], 'variant' : self.tile_variant, 'pos' : tile_pos}
+                tile = self.tilemap.grid.get(tile_pos)
+                # When autotiling, a tile of the same type is kept (Its variant was picked by the autotile)
+                if not self.autotiling or not tile or tile['type'] != self.tile_list[self.tile_group]:
+                    self.tilemap.place_tile({'type' : self.tile_list[self.tile_group], 'variant' : self.tile_variant, 'pos' : tile_pos})
+                    if self.autotiling:
+                        self.tilemap.autotile_around(tile_pos)
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ';' + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
-                for tile in self.tilemap.offgrid_tiles.copy():
-                    tile_img = self.assets[tile['type']][tile['variant']]
-                    tile_r = pygame.Rect(tile['pos'][0] - self.scroll[0], tile['pos'][1] - self.scroll[1], tile_img.get_width(), tile_img.get_height())
-                    if tile_r.collidepoint(mpos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                if tile_pos in self.tilemap.grid:
+                    self.tilemap.remove_tile(tile_pos)
+                    if self.autotiling:
+                        self.tilemap.autotile_around(tile_pos)
+                for tile in self.tilemap.offgrid_at((mpos[0] + self.scroll[0], mpos[1] + self.scroll[1])):
+                    self.tilemap.remove_offgrid(tile)
 
             self.display.blit(current_tile_img, (5,5)) # Display the current tile image
 
+            # Show how many enemies the map has in the window title (Counted with the tilemap's type index)
+            enemy_spawners = self.tilemap.count_tiles(('spawners', 1))
+            if enemy_spawners != self.enemy_spawners:
+                self.enemy_spawners = enemy_spawners
+                pygame.display.set_caption("Editor - " + str(enemy_spawners) + " enemies")
+
             for event in pygame.event.get(): # Handle events
                 if event.type == pygame.QUIT: # Exit the window if the user clicks the X
                     pygame.quit() # Quit the game
                     sys.exit()
+                if event.type == pygame.WINDOWEXPOSED:
+                    self.presenter.refresh() # The window has to be drawn again
 
                 # Mouse button down events
                 if event.type == pygame.MOUSEBUTTONDOWN: 
                     if event.button == 1:
                         self.clicking = True
                         if not self.ongrid:
-                            self.tilemap.offgrid_tiles.append({'type' : self.tile_list[self.tile_group], 'variant' : self.tile_variant, 'pos' : (mpos[0] + self.scroll [0], mpos[1] + self.scroll[1])})
+                            self.tilemap.add_offgrid({'type' : self.tile_list[self.tile_group], 'variant' : self.tile_variant, 'pos' : (mpos[0] + self.scroll [0], mpos[1] + self.scroll[1])})
                     if event.button == 3:
                         self.right_clicking = True
                     
@@ -131,6 +139,8 @@ class Editor():
                         self.ongrid = not self.ongrid # Toggle between grid and non-grid mode
                     if event.key == pygame.K_t:
                         self.tilemap.autotile()
+                    if event.key == pygame.K_r:
+                        self.autotiling = not self.autotiling # Toggle autotiling while placing and removing tiles
                     if event.key == pygame.K_o:
                         self.tilemap.save('map.json')
                     if event.key == pygame.K_LSHIFT:
@@ -147,10 +157,11 @@ class Editor():
                     if event.key == pygame.K_LSHIFT:
                         self.shift = False
 
-            self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0,0)) # Draw the game display on the screen
-            pygame.display.update()
+            self.presenter.present(self.display) # Draw the game display on the screen
             self.clock.tick(60) # Force the loop to run at 60 fps
 
-Editor().run()
+parser = argparse.ArgumentParser(description='Samurai Dash map editor')
+parser.add_argument('--present', choices=list(PRESENTERS), default='scale', help='How the editor is scaled up to the window: in software (scale), by SDL\'s renderer (sdl2) or only where the picture changed (dirty)')
+Editor(present=parser.parse_args().present).run()
 
 
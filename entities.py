@@ -2,21 +2,29 @@ import pygame
 
 import math
 
-import random
+SHOT_RANGE = 540 # How far an enemy's projectile flies before it disappears (1.5 pixels a frame for 360 frames)
+CATCH_UP_FRAMES = 120 # Most physics steps an enemy runs when it wakes up (Enough to land from any height)
 
-from particles import Particle
+# Collision flags of an entity, they are bits of one number (Test them with entity.collisions & COLLIDE_DOWN)
+COLLIDE_UP = 1
+COLLIDE_DOWN = 2
+COLLIDE_RIGHT = 4
+COLLIDE_LEFT = 8
 
-from spark import Spark
 
 # Class to represent a physics-based entity
+# The attributes are slots so an entity is a small fixed-size object (The game can have thousands of them)
 class PhysicsEntity:
+    __slots__ = ('game', 'type', 'pos', 'prev_pos', 'size', 'velocity', 'collisions', 'action', 'animation', 'anim_frame', 'anim_offset', 'flip')
+
     def __init__(self,game,e_type,pos,size):
         self.game = game
         self.type = e_type
         self.pos = list(pos) #To make each PhysicsEntity have its own position (Convert any iterable to a list)
+        self.prev_pos = tuple(pos) # Position before the last simulation step (See Game.save_positions)
         self.size = size
         self.velocity = [0,0] #Speed of falling down
-        self.collisions = {'up' : False, 'down' : False, 'right' : False, 'left' : False}
+        self.collisions = 0 # COLLIDE_ flags of the last update
 
         self.action = ''
         self.anim_offset = (-3,-3)
@@ -31,11 +39,12 @@ class PhysicsEntity:
     def set_action(self,action):
         if action != self.action:
             self.action = action
-            self.animation = self.game.assets[self.type + '/' + self.action].copy()
+            self.animation = self.game.assets[self.type + '/' + self.action] # The shared clip, played from its first frame
+            self.anim_frame = 0
 
     # Method to update the entity's position and handle collisions
     def update(self, tilemap, movement=(0,0)):
-        self.collisions = {'up' : False, 'down' : False, 'right' : False, 'left' : False}
+        collisions = 0
 
         frame_movement = (movement[0] + self.velocity[0], movement [1] + self.velocity[1]) #To determine how much will the PhysicsEntity move in this frame
         
@@ -45,10 +54,10 @@ class PhysicsEntity:
             if entity_rect.colliderect(rect) :
                 if frame_movement[0] > 0:
                     entity_rect.right = rect.left
-                    self.collisions ['right'] = True
+                    collisions |= COLLIDE_RIGHT
                 if frame_movement[0] < 0 : 
                     entity_rect.left = rect.right
-                    self.collisions ['left'] = True
+                    collisions |= COLLIDE_LEFT
                 self.pos[0] = entity_rect.x
 
         self.pos[1] += frame_movement[1]
@@ -57,12 +66,14 @@ class PhysicsEntity:
             if entity_rect.colliderect(rect) :
                 if frame_movement[1] > 0:
                     entity_rect.bottom = rect.top
-                    self.collisions ['down'] = True
+                    collisions |= COLLIDE_DOWN
                 if frame_movement[1] < 0 : 
                     entity_rect.top = rect.bottom
-                    self.collisions ['up'] = True
+                    collisions |= COLLIDE_UP
                 self.pos[1] = entity_rect.y
 
+        self.collisions = collisions
+
         if movement[0] > 0:
             self.flip = False
         if movement[0] < 0:
@@ -72,27 +83,53 @@ class PhysicsEntity:
         self.velocity [1] = min(5, self.velocity[1] + 0.1)
 
         #If there is a tile or collision below or above the entity then the y-velocity will be 0
-        if self.collisions['down'] or self.collisions['up']:
+        if collisions & (COLLIDE_DOWN | COLLIDE_UP):
             self.velocity[1] = 0
         
-        self.animation.update() #Update the animation
+        self.anim_frame = self.animation.advance(self.anim_frame) #Update the animation
 
-    #Render the entity on the surface
-    def render(self,surf, offset=(0,0)):
-        surf.blit(pygame.transform.flip(self.animation.img(), self.flip, False), (self.pos[0] - offset [0] + self.anim_offset[0], self.pos[1] - offset [1] + self.anim_offset[1])) #Flip the sprite so it can face right or left
+    #Render the entity on the surface, alpha of the way from its previous position to its current one
+    def render(self,surf, offset=(0,0), alpha=1):
+        x = self.pos[0] - (self.pos[0] - self.prev_pos[0]) * (1 - alpha)
+        y = self.pos[1] - (self.pos[1] - self.prev_pos[1]) * (1 - alpha)
+        surf.blit(self.animation.img(self.anim_frame, self.flip), (x - offset [0] + self.anim_offset[0], y - offset [1] + self.anim_offset[1])) #Use the flipped sprite so it can face right or left
 
 # Class to represent an enemy entity
 class Enemy(PhysicsEntity):
+    __slots__ = ('walking', 'slept')
+
     def __init__ (self, game, pos,size):
         super().__init__(game, 'enemy', pos, size)
 
         self.walking = 0
+        self.slept = 0 # Frames skipped while the enemy was far away
+
+    # Check if the enemy has to be simulated this frame: it's inside the active area around the camera,
+    # or on the player's row and close enough that its projectiles could reach the player
+    def near(self, active_rect, player_pos):
+        if active_rect.collidepoint(self.pos):
+            return True
+        return abs(player_pos[1] - self.pos[1]) < 32 and abs(player_pos[0] - self.pos[0]) < SHOT_RANGE
+
+    # Replay the frames skipped while asleep: the walk timer and the animation keep counting and an enemy in the air falls until it lands
+    # A sleeping enemy doesn't walk, turn or shoot and no random numbers are used, so it always wakes up in the same state
+    def catch_up(self):
+        frames = self.slept
+        self.slept = 0
+        self.walking = max(0, self.walking - frames)
+        for i in range(min(frames, CATCH_UP_FRAMES)):
+            if self.collisions & COLLIDE_DOWN and not self.velocity[1]:
+                break
+            PhysicsEntity.update(self, self.game.tilemap)
+            frames -= 1
+        self.set_action('idle')
+        self.anim_frame = self.animation.advance(self.anim_frame, frames)
 
     # To update the enemy's behavior and position (To attack or shoot projectiles)
     def update(self, tilemap, movement=(0,0)):
         if self.walking:
             if tilemap.solid_check((self.rect().centerx + (-7 if self.flip else 7), self.pos[1] + 23)):
-                if (self.collisions['right'] or self.collisions['left']):
+                if self.collisions & (COLLIDE_RIGHT | COLLIDE_LEFT):
                     self.flip = not self.flip
                 else: 
                     movement = (movement[0] - 0.5 if self.flip else 0.5, movement[1])
@@ -106,18 +143,20 @@ class Enemy(PhysicsEntity):
                     #Check if the entity is facing left (self.flip is True) and the player is to the left (dis[0] < 0)
                     if (self.flip and dis[0] < 0):
                         self.game.sfx['shoot'].play()
-                        self.game.projectiles.append([[self.rect().centerx - 7, self.rect().centery], -1.5, 0])
+                        pos = (self.rect().centerx - 7, self.rect().centery)
+                        self.game.projectiles.spawn(pos, -1.5)
                         for i in range(4):
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5 + math.pi, 2 + random.random()))
+                            self.game.sparks.emit(pos, self.game.fx_rng.random() - 0.5 + math.pi, 2 + self.game.fx_rng.random())
                     # Check if the entity is facing right (self.flip is False) and the player is to the right (dis[0] > 0)
                     if (not self.flip and dis[0] > 0):
                         self.game.sfx['shoot'].play()
-                        self.game.projectiles.append([[self.rect().centerx + 7, self.rect().centery], 1.5, 0])
+                        pos = (self.rect().centerx + 7, self.rect().centery)
+                        self.game.projectiles.spawn(pos, 1.5)
                         for i in range(4):
-                            self.game.sparks.append(Spark(self.game.projectiles[-1][0], random.random() - 0.5, 2 + random.random()))
+                            self.game.sparks.emit(pos, self.game.fx_rng.random() - 0.5, 2 + self.game.fx_rng.random())
 
-        elif random.random() < 0.01:
-            self.walking = random.randint(30, 120)
+        elif self.game.ai_rng.random() < 0.01:
+            self.walking = self.game.ai_rng.randint(30, 120)
 
         super().update(tilemap, movement=movement)
 
@@ -125,21 +164,26 @@ class Enemy(PhysicsEntity):
             self.set_action('walk')
         else:
             self.set_action('idle')
-        
-        if abs(self.game.player.dashing) >= 50:
-            if self.rect().colliderect(self.game.player.rect()):
-                self.game.sfx['hit'].play()
-                for i in range(30): 
-                    angle = random.random() * math.pi * 2
-                    speed = random.random() * 5
-                    self.game.sparks.append(Spark(self.rect().center, angle, 2 + random.random()))
-                    self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0, 7)))
-                self.game.sparks.append(Spark(self.rect().center, 0, 5 + random.random()))
-                self.game.sparks.append(Spark(self.rect().center, 0, 5 + random.random()))
-                return True
+
+    # The player dashed through the enemy (Game.update_enemies finds the enemies the player touches and removes them)
+    def hit(self):
+        self.game.sfx['hit'].play()
+        velocities = []
+        frames = []
+        for i in range(30): 
+            angle = self.game.fx_rng.random() * math.pi * 2
+            speed = self.game.fx_rng.random() * 5
+            self.game.sparks.emit(self.rect().center, angle, 2 + self.game.fx_rng.random())
+            velocities.append((math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5))
+            frames.append(self.game.fx_rng.randint(0, 7))
+        self.game.particles.emit_burst('particle', self.rect().center, velocities, frames)
+        self.game.sparks.emit(self.rect().center, 0, 5 + self.game.fx_rng.random())
+        self.game.sparks.emit(self.rect().center, 0, 5 + self.game.fx_rng.random())
 
 # Class to represent the player entity
 class Player (PhysicsEntity):
+    __slots__ = ('air_time', 'jumps', 'dashing')
+
     def __init__(self, game, pos, size):
         super().__init__(game, 'player', pos, size)
         self.air_time = 0 
@@ -155,7 +199,7 @@ class Player (PhysicsEntity):
         if self.air_time > 120:
             self.game.dead += 1
 
-        if self.collisions['down'] : 
+        if self.collisions & COLLIDE_DOWN : 
             self.air_time = 0
             self.jumps = 2
 
@@ -167,11 +211,14 @@ class Player (PhysicsEntity):
             self.set_action('idle')
         
         if abs(self.dashing) in {60, 50} : 
+            velocities = []
+            frames = []
             for i in range(20) : 
-                angle = random.random() * math.pi * 2
-                speed = random.random() * 0.5 + 0.5
-                pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed]    
-                self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity = pvelocity, frame = random.randint(0,7)))
+                angle = self.game.fx_rng.random() * math.pi * 2
+                speed = self.game.fx_rng.random() * 0.5 + 0.5
+                velocities.append((math.cos(angle) * speed, math.sin(angle) * speed))
+                frames.append(self.game.fx_rng.randint(0,7))
+            self.game.particles.emit_burst('particle', self.rect().center, velocities, frames)
         
         if self.dashing > 0 :
             self.dashing = max(0, self.dashing - 1)
@@ -181,8 +228,8 @@ class Player (PhysicsEntity):
             self.velocity[0] = abs(self.dashing) / self.dashing * 8
             if abs(self.dashing) == 51 :
                 self.velocity[0] *= 0.1
-            pvelocity = [abs(self.dashing) / self.dashing * random.random() * 3, 0]
-            self.game.particles.append(Particle(self.game, 'particle', self.rect().center, velocity = pvelocity, frame = random.randint(0,7)))
+            pvelocity = [abs(self.dashing) / self.dashing * self.game.fx_rng.random() * 3, 0]
+            self.game.particles.emit('particle', self.rect().center, velocity = pvelocity, frame = self.game.fx_rng.randint(0,7))
 
         if self.velocity[0] > 0 :
             self.velocity[0] = max(self.velocity[0] - 0.1, 0)
@@ -190,9 +237,9 @@ class Player (PhysicsEntity):
             self.velocity[0] = min(self.velocity[0] + 0.1, 0)
 
     # Method to render the player on the surface
-    def render(self, surf, offset=(0,0)):
+    def render(self, surf, offset=(0,0), alpha=1):
         if abs(self.dashing) <= 50 :
-            super().render(surf, offset=offset)
+            super().render(surf, offset=offset, alpha=alpha)
 
 
     # Method to make the player jump
@@ -3,246 +3,587 @@ import math
 import sys # Import the sys to exit the program when the user clicks the X
 import random 
 import os
-from utils import load_image, load_images, Animation
+import time
+import argparse
+from utils import Animation
+from assets import load_assets, placeholder_assets, AssetManager, NullSound
 from entities import PhysicsEntity, Player, Enemy
 from map import Tilemap
+from level import load_level_snapshot
+from pagedmap import PagedTilemap
 from cloud import Clouds
-from particles import Particle
-from spark import Spark
+from particles import Particles
+from spark import SparkField
+from projectiles import ProjectilePool
+from broadphase import SpatialGrid
+from replay import Replay, load_replay, seed_arg, SEEDS
+from profiler import FrameProfiler, NULL_PROFILER, CountingSurface
+from hud import Hud, IDLE_FPS
+from present import PRESENTERS
+
+NO_INPUT = {'left': False, 'right': False, 'jump': False, 'dash': False} # Inputs of a frame where no key is touched
+FIXED_STEP = 1 / 60 # The simulation always advances in steps of this many seconds, whatever the frame rate is
+MAX_STEPS = 5 # Most simulation steps run for one rendered frame (Past that the game slows down instead of falling further behind)
+ACTIVE_MARGIN = 320 # Enemies further than this many pixels outside the camera view are put to sleep (See Enemy.near)
+SFX_VOLUMES = {'jump': 0.7, 'dash': 0.3, 'hit': 0.8, 'shoot': 0.3} # Sound effects and their volume
+
+# Load a sound effect and set its volume
+def load_sound(name):
+    sound = pygame.mixer.Sound('sfx/' + name + '.mp3')
+    sound.set_volume(SFX_VOLUMES[name])
+    return sound
+
+# Load the background music (It's streamed from the file while it plays)
+def load_music():
+    pygame.mixer.music.load('sfx/bgm.mp3')
+    pygame.mixer.music.set_volume(0.5)
+    return True
 
 class Game():
-    def __init__(self): # Initialize the game
+    def __init__(self, headless=False, level=0, stream=False, fps=60, seed=None, replay=None, present='scale'): # Initialize the game
+        self.headless = headless # Headless mode has no window, no sound and no frame cap
+        self.fps = fps # Frame rate cap of the window (0 for no cap), the simulation runs at 60 steps a second at any frame rate
+        self.stream = stream # Stream the map chunks around the camera instead of loading the whole level (See pagedmap.py)
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy' # Use SDL's dummy drivers so no window or audio device is opened
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
         pygame.init() # Start the pygame
-        pygame.display.set_caption("Samurai Dash") # Rename the window title
-        self.screen = pygame.display.set_mode((960,720)) # Create the window for the game
+        self.presenter = PRESENTERS[present]("Samurai Dash") # Opens the window and shows the display on it, scaled up (See present.py)
         self.display = pygame.Surface((640,480)) # Create an empty image that has 320,240px size
-        self.clock = pygame.time.Clock() # Set the fps at 60
+        self.clock = pygame.time.Clock()
+        self.lag = 0 # Time the simulation is behind the clock, in seconds (Less than one FIXED_STEP after each frame)
+        self.pending = dict(NO_INPUT) # Jumps and dashes pressed on frames that didn't run a simulation step yet
         self.movement = [False,False] # To move the image --> Boolean that could be updated by the if event.type statement
-
-        # Load assets for the game
-        self.assets = {
-            'decor': (load_images('tiles/decor', colorkey=(0,0,0))),
-            'grass': (load_images('tiles/grass')),
-            'large_decor': (load_images('tiles/large_decor' , colorkey=(0,0,0))),
-            'stone': (load_images('tiles/stone')),
-            'player': (load_image('Player/idle/00_idle.png')),
-            'background': load_image('Background/mountain.png'),
-            'clouds': self.scale_clouds(load_images('clouds')),
-            'enemy/idle': Animation(self.scale_images(load_images('Enemy/idle')), img_dur=9),
-            'enemy/walk': Animation(self.scale_images(load_images('Enemy/walk')), img_dur=4),
-            'enemy/attack': Animation(self.scale_images(load_images('Enemy/attack')), img_dur=4),
-            'player/idle': Animation(self.scale_images(load_images('Player/idle')), img_dur=10),
-            'player/run': Animation(self.scale_images(load_images('Player/run')), img_dur=4),
-            'player/jump': Animation(self.scale_images(load_images('Player/jump')), img_dur=5.5),
-            'particle/leaf': Animation((load_images('particles/leaf')), img_dur=20, loop=False),
-            'particle/particle': Animation((load_images('particles/particle')), img_dur=6, loop=False),
-            'projectiles': load_image('tiles/projectile/blue.png'),
-        }
-
-        #Sound effects assets
-        self.sfx = {
-            'jump' : pygame.mixer.Sound('sfx/jump.mp3'),
-            'dash' : pygame.mixer.Sound('sfx/dash.mp3'),
-            'hit' : pygame.mixer.Sound('sfx/hit.mp3'),
-            'shoot' : pygame.mixer.Sound('sfx/shoot.mp3'),
+        self.hud = None # Text and transition drawn on top of the game, made on the first frame that's drawn (See hud.py)
+        self.static_screen = None # Text of the loading or win screen when it's already on the window (It's only drawn again when it changes)
+        self.profiler = NULL_PROFILER # Times the phases of every frame while profiling is on (See profiler.py)
+        self.cull = True # Put far away enemies to sleep, pause the trees out of view and only draw what's on the screen
+
+        # Assets are loaded on a background thread while the loading screen shows (Headless mode loads them right away)
+        self.assets = AssetManager()
+        self.assets.add_group(self.load_images, self.wrap_images(placeholder_assets()))
+        self.sfx = AssetManager()
+        for name in SFX_VOLUMES:
+            self.sfx.add(name, NullSound if headless else lambda name=name: load_sound(name), NullSound())
+        self.sfx.add('music', (lambda: False) if headless else load_music, False) # False until the music can be played
+        self.music_playing = False
+
+        # Every part of the game that uses random numbers has its own stream, so a seed and the inputs decide the whole run
+        # (The enemies' decisions don't change when more or fewer leaves or sparks are spawned)
+        self.seed = random.randrange(SEEDS) if seed is None else seed
+        self.ai_rng = random.Random(f'{self.seed}/ai') # Enemy decisions
+        self.fx_rng = random.Random(f'{self.seed}/fx') # Sparks and particles of shots, hits and dashes
+        self.leaf_rng = random.Random(f'{self.seed}/leaves')
+        self.cloud_rng = random.Random(f'{self.seed}/clouds')
+        self.replay = replay # Replay that records or plays back the inputs of every step (See replay.py)
+        self.replay_path = None # Where the recorded replay is saved when the game is closed
+
+        self.level = level
+        self.levels = {} # Snapshot of every level loaded so far (See level.py)
+        self.preload_levels = True # Load the next level in the background while the current one is played
+        self.preload = None # Loads the next level's snapshot on a background thread
+        self.win_screen = False  # Initialize win screen flag
+        self.max_levels = 3  # Set the maximum number of levels to 3 (0, 1, 2)
+        self.loading = True
+        if headless:
+            self.assets.load_all()
+            self.sfx.load_all()
+            self.finish_loading()
+        else:
+            self.assets.start()
+            self.sfx.start()
+
+    # Load the images from the packed atlas (See assets.py)
+    def load_images(self):
+        return self.wrap_images(load_assets())
+
+    # Pick the game's images and turn the sprite frames into animations
+    def wrap_images(self, images):
+        return {
+            'decor': images['decor'],
+            'grass': images['grass'],
+            'large_decor': images['large_decor'],
+            'stone': images['stone'],
+            'player': images['player'],
+            'background': images['background'],
+            'clouds': images['clouds'],
+            'enemy/idle': Animation(images['enemy/idle'], img_dur=9),
+            'enemy/walk': Animation(images['enemy/walk'], img_dur=4),
+            'enemy/attack': Animation(images['enemy/attack'], img_dur=4),
+            'player/idle': Animation(images['player/idle'], img_dur=10),
+            'player/run': Animation(images['player/run'], img_dur=4),
+            'player/jump': Animation(images['player/jump'], img_dur=5.5),
+            'particle/leaf': Animation(images['particle/leaf'], img_dur=20, loop=False),
+            'particle/particle': Animation(images['particle/particle'], img_dur=6, loop=False),
+            'projectiles': images['projectiles'],
         }
-        #Load the sound effects 
-        self.sfx['shoot'].set_volume(0.3)
-        self.sfx['hit'].set_volume(0.8)
-        self.sfx['dash'].set_volume(0.3)
-        self.sfx['jump'].set_volume(0.7)
-
-
 
-        self.clouds = Clouds(self.assets['clouds'], count=16) #Load the clouds on the screen(atleast there's 16 clouds)
+    # Set up the world once the images are loaded
+    def finish_loading(self):
+        self.clouds = Clouds(self.assets['clouds'], count=16, rng=self.cloud_rng) #Load the clouds on the screen(atleast there's 16 clouds)
         self.player = Player(self, (90, 90), (16,16)) # Adjust player size to match tile size
-        self.tilemap = Tilemap(self, tile_size=16) # Display the tile image on the screen with size (32,32)
-        self.level = 0
         self.load_level(self.level)
-
-        self.win_screen = False  # Initialize win screen flag
-        self.max_levels = 3  # Set the maximum number of levels to 3 (0, 1, 2)
-
-
-    def scale_images(self, images):
-        return [pygame.transform.scale(img, (16,19)) for img in images] # Scale the image so the physics will align correctly as the image and the player
-
-    def scale_clouds(self, images):
-        return [pygame.transform.scale(img, (50,25)) for img in images] # Scale the clouds so it will fit the screen
-
-    def load_level(self, map_id): # Load the map from the map.json file
-        self.tilemap.load('maps/' + str(map_id) + '.json')
-
-        self.leaf_spawners = []
-        # Extract 'large_decor' tiles with variant 2 and create leaf spawners
-        for tree in self.tilemap.extract([('large_decor' , 2)], keep=True):
-            # Create a rectangle for each tree to spawn leaves and add to leaf spawners list
-            self.leaf_spawners.append(pygame.Rect(4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13))
-
-        self.enemies = [] # Store the enemies in the game
-        self.enemy_count = 0
-        # Extract 'spawners' tiles with variant 0 and 1 to create enemies and player
-        for spawner in self.tilemap.extract([('spawners',0),('spawners',1)]):
-            if spawner['variant'] == 0:
-                # Set player position if spawner variant is 0
-                self.player.pos = spawner['pos']
-                self.player.air_time = 0 # Reset player's air time
-            else: 
-                # Create an enemy if spawner variant is 1 and add to enemies list
-                self.enemies.append(Enemy(self, spawner['pos'], (16,16)))
-                self.enemy_count += 1 # Increment enemy counter
+        self.loading = False
+
+    def load_level(self, map_id): # Load the map from the map.json file (Only the first time, or again when the file changed)
+        if self.preload and map_id in self.preload and self.preload.ready():
+            self.levels[map_id] = self.preload[map_id]
+            self.preload = None
+        snapshot = self.levels.get(map_id)
+        if not snapshot or not snapshot.up_to_date():
+            if snapshot:
+                snapshot.tilemap.close()
+            snapshot = self.build_level(map_id)
+            self.levels[map_id] = snapshot
+        self.tilemap = snapshot.tilemap
+        self.setup_level(snapshot)
+
+    # Start loading the next level on a background thread while this one is played
+    # (Called once the level has faded in, so the loading thread doesn't slow down the frames of the level change)
+    def preload_next_level(self):
+        map_id = self.level + 1
+        if self.preload or map_id >= self.max_levels or map_id in self.levels:
+            return
+        self.preload = AssetManager()
+        self.preload.add(map_id, lambda: self.build_level(map_id))
+        self.preload.start()
+
+    # Load a level and render the chunks it starts on (Runs on the preload thread for the next level)
+    def build_level(self, map_id):
+        snapshot = load_level_snapshot(self, map_id, PagedTilemap if self.stream else Tilemap)
+        snapshot.prerender(self.display.get_size())
+        return snapshot
+
+    # Check if a level can be switched to without loading anything
+    def level_ready(self, map_id):
+        if self.preload and map_id in self.preload:
+            return self.preload.ready()
+        return map_id in self.levels and self.levels[map_id].up_to_date()
+
+    # Set up the entities of the level from its snapshot (Respawning only does this part)
+    def setup_level(self, snapshot):
+        # Create the leaf spawners of the trees
+        self.leaf_spawners = [pygame.Rect(rect) for rect in snapshot.leaf_spawners]
+
+        if snapshot.player_pos:
+            self.player.pos = list(snapshot.player_pos) # Set player position
+            self.player.air_time = 0 # Reset player's air time
+        self.enemies = [Enemy(self, pos, (16,16)) for pos in snapshot.enemy_positions] # Store the enemies in the game
+        self.enemy_grid = None
+        self.enemy_count = len(self.enemies)
         self.total_enemies = self.enemy_count # Set total enemy counter
 
-        self.projectiles = [] # Store the projectiles in the game
-        self.particles = []
-        self.sparks = []
+        self.projectiles = ProjectilePool() # Store the projectiles in the game
+        self.particles = Particles(self)
+        self.sparks = SparkField()
         self.scroll = [0, 0]
+        self.save_positions() # Nothing is interpolated from the last level or life
         self.dead = 0
         self.transition = -30
 
-    def run(self): # To run the game
-        pygame.mixer.music.load('sfx/bgm.mp3') # Load the background music
-        pygame.mixer.music.set_volume(0.5)
-        pygame.mixer.music.play(-1) # Play the background music infinitely
-
-        while True: # Create a game loop
-            self.display.blit(self.assets['background'], (0, 0)) # Draw the background
-
-            if not len(self.enemies):
-                self.transition += 1
-                if self.transition > 30:
-                    if self.level < self.max_levels - 1:
+    # Read the window events and turn them into the inputs of this frame
+    def handle_events(self):
+        inputs = dict(NO_INPUT)
+        for event in pygame.event.get(): # To make the mini screen so it doesn't freeze
+            if event.type == pygame.QUIT: # To exit the window if the user clicks the X
+                if self.replay_path:
+                    self.replay.save(self.replay_path)
+                self.profiler.close()
+                pygame.quit() # To quit the game
+                sys.exit()
+            if event.type == pygame.WINDOWEXPOSED:
+                self.static_screen = None # The window has to be drawn again
+                self.presenter.refresh()
+            if event.type == pygame.KEYDOWN: # To move the sprite
+                if event.key == pygame.K_a:
+                    self.movement[0] = True
+                if event.key == pygame.K_d:
+                    self.movement[1] = True
+                if event.key == pygame.K_w or event.key == pygame.K_SPACE:
+                    inputs['jump'] = True
+                if event.key == pygame.K_LSHIFT:
+                    inputs['dash'] = True
+                if event.key == pygame.K_F3:
+                    self.toggle_profiler_overlay()
+            if event.type == pygame.KEYUP:
+                if event.key == pygame.K_a:
+                    self.movement[0] = False
+                if event.key == pygame.K_d:
+                    self.movement[1] = False
+        inputs['left'] = self.movement[0]
+        inputs['right'] = self.movement[1]
+        return inputs
+
+    # Advance the game by one frame (No drawing happens here)
+    def update(self, inputs):
+        # Start the music as soon as it's loaded
+        if not self.music_playing and self.sfx['music']:
+            pygame.mixer.music.play(-1) # Play the background music infinitely
+            self.music_playing = True
+
+        if self.loading:
+            if self.assets.ready():
+                self.finish_loading()
+            return
+
+        if self.replay:
+            inputs = self.replay.step(self, inputs)
+
+        if self.win_screen:
+            return
+
+        # Movement stuffs for the player
+        if inputs['jump']:
+            if self.player.jump():
+                self.sfx['jump'].play()
+        if inputs['dash']:
+            self.player.dash()
+
+        if not len(self.enemies):
+            self.transition += 1
+            if self.transition > 30:
+                if self.level < self.max_levels - 1:
+                    if self.preload_levels:
+                        self.preload_next_level() # The level can be cleared before it finished fading in, when the preload hasn't started yet
+                    if self.replay and self.preload:
+                        self.preload.wait() # A replay has to change level on the same step every time
+                    if not self.preload_levels or self.level_ready(self.level + 1):
                         self.level += 1
                         self.load_level(self.level)
                     else:
-                        self.win_screen = True
-            if self.transition < 0:
-                self.transition += 1
-
-            if self.dead: 
+                        self.transition = 30 # Stay on the black screen until the next level is loaded
+                else:
+                    self.win_screen = True
+        if self.transition < 0:
+            self.transition += 1
+        elif self.preload_levels and not self.transition:
+            self.preload_next_level()
+
+        if self.dead: 
+            self.dead += 1
+            if self.dead >= 10:
+                self.transition = min(30, self.transition + 1)
+            if self.dead > 40: 
+                self.load_level(self.level)
+
+        # Update scroll position based on player position (Center of the rectangle)
+        self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 20
+        self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 20
+        self.profiler.mark('player')
+
+        if self.stream:
+            self.update_stream()
+        self.profiler.mark('tilemap')
+
+        self.update_leaves()
+        self.profiler.mark('particles')
+        self.clouds.update()
+        self.profiler.mark('clouds')
+
+        self.update_enemies()
+        self.profiler.mark('enemies')
+
+        if not self.dead: 
+            self.player.update(self.tilemap, (inputs['right'] - inputs['left'], 0))
+        self.profiler.mark('player')
+
+        self.update_projectiles()
+        self.profiler.mark('projectiles')
+        self.update_sparks()
+        self.profiler.mark('sparks')
+        self.update_particles()
+        self.profiler.mark('particles')
+
+        # Check if all levels are completed
+        if self.level == self.max_levels and not len(self.enemies):
+            self.win_screen = True
+
+    # Load the map chunks around the camera and the entities (And drop the ones that aren't needed anymore)
+    def update_stream(self):
+        points = [self.player.pos] + [enemy.pos for enemy in self.enemies if not enemy.slept] # Sleeping enemies load their chunks when they wake up
+        points += [(self.projectiles.x[slot], self.projectiles.y[slot]) for slot in self.projectiles.live]
+        self.tilemap.stream(self.view_rect(), points)
+
+    # The part of the level the camera shows
+    def view_rect(self):
+        return pygame.Rect(int(self.scroll[0]), int(self.scroll[1]), self.display.get_width(), self.display.get_height())
+
+    # Leaf spawn rates (If we have a bigger tree it'll spawn more leafs)
+    # Trees whose leaves can't reach the view are paused: a leaf lives up to 360 frames, in that time it falls 108 pixels
+    # and drifts less than 48 pixels to the left, so only the trees a bit above or to the right of the view are kept
+    def update_leaves(self):
+        view = self.view_rect()
+        view = pygame.Rect(view.x - 8, view.y - 120, view.width + 64, view.height + 128)
+        for rect in self.leaf_spawners:
+            if self.cull and not view.colliderect(rect):
+                continue
+            if self.leaf_rng.random() * 49999 < rect.width * rect.height: # *49999 to control the spawn rate of the leaf (Make it doesn't spawn every frame)
+                pos = (rect.x + self.leaf_rng.random() * rect.width, rect.y + self.leaf_rng.random() * rect.height)
+                self.particles.emit('leaf', pos, velocity=(-0.1,0.3), frame=self.leaf_rng.randint(0,20))
+
+    # Update enemies (The ones far from the camera sleep and catch up on what they missed when they come close again)
+    def update_enemies(self):
+        active_rect = self.view_rect().inflate(ACTIVE_MARGIN * 2, ACTIVE_MARGIN * 2)
+        self.enemy_grid = None # The enemies move, so the grid is built again the next time it's needed
+        for enemy in self.enemies:
+            if self.cull and not enemy.near(active_rect, self.player.pos):
+                enemy.slept += 1
+                continue
+            if enemy.slept:
+                enemy.catch_up()
+            enemy.update(self.tilemap, (0,0))
+
+        # The enemies the player dashes through are killed
+        # (One rectangle against each enemy: there's only one player, so building the grid for it costs more than checking every enemy)
+        if abs(self.player.dashing) >= 50:
+            player_rect = self.player.rect()
+            for enemy in [enemy for enemy in self.enemies if enemy.rect().colliderect(player_rect)]:
+                enemy.hit()
+                self.enemies.remove(enemy)
+                self.enemy_count -= 1 # Decrement enemy counter
+            self.enemy_grid = None
+
+    # Enemies whose rectangle overlaps a pixel rectangle, in the order of self.enemies
+    # (The enemies are put in a SpatialGrid the first time this is called after they moved, see broadphase.py)
+    # For checks of many things against the enemies, where the grid is built once for all of them
+    def enemies_in(self, rect):
+        if not self.enemy_grid:
+            self.enemy_grid = SpatialGrid()
+            for enemy in self.enemies:
+                self.enemy_grid.insert_point(enemy, enemy.pos[0], enemy.pos[1])
+        # Enemies are stored by their top left corner, so the ones up to 16 pixels above or left of the rectangle can reach into it
+        candidates = self.enemy_grid.query((rect[0] - 16, rect[1] - 16, rect[2] + 16, rect[3] + 16))
+        return [enemy for enemy in candidates if enemy.rect().colliderect(rect)]
+
+    #Update projectiles (If the projectile hits the player or a wall, it will remove the projectile and spawn the particles)
+    def update_projectiles(self):
+        hits = self.projectiles.update(self.tilemap, self.player.rect(), abs(self.player.dashing) < 50)
+        for x, y, dx, hit_player in hits:
+            if not hit_player:
+                for i in range(4):
+                    self.sparks.emit((x, y), self.fx_rng.random() - 0.5 + (math.pi if dx > 0 else 0), 2 + self.fx_rng.random())
+            else:
                 self.dead += 1
-                if self.dead >= 10:
-                    self.transition = min(30, self.transition + 1)
-                if self.dead > 40: 
-                    self.load_level(self.level)
-
-            # Update scroll position based on player position (Center of the rectangle)
-            self.scroll[0] += (self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]) / 20
-            self.scroll[1] += (self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]) / 20
-            #Render the scroll to move horizontally or vertically, depends on the player movement
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-
-            # Leaf spawn rates (If we have a bigger tree it'll spawn more leafs)
-            for rect in self.leaf_spawners:
-                if random.random() * 49999 < rect.width * rect.height: # *49999 to control the spawn rate of the leaf (Make it doesn't spawn every frame)
-                    pos = (rect.x + random.random() * rect.width, rect.y + random.random() * rect.height)
-                    self.particles.append(Particle(self, 'leaf', pos, velocity=[-0.1,0.3], frame=random.randint(0,20)))
-            self.clouds.update()
-            self.clouds.render(self.display, offset=render_scroll) # Render the clouds and whenever the player moves it will still spawn the clouds out of the screen
-
-            self.tilemap.render(self.display, offset=render_scroll) # Render the tilemap
-
-            # Update and render enemies
-            for enemy in self.enemies.copy():
-                kill = enemy.update(self.tilemap, (0,0))
-                enemy.render(self.display, offset=render_scroll) #Render the enemy even though it is out of the screen
-                if kill:
-                    self.enemies.remove(enemy)
-                    self.enemy_count -= 1 # Decrement enemy counter
-
-            if not self.dead: 
-                self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
-                self.player.render(self.display, offset=render_scroll)
-
-            #Update and render projectiles (If the projectile hits the player or a wall, it will remove the projectile and spawn the particles)
-            for projectile in self.projectiles.copy(): 
-                projectile[0][0] += projectile[1]
-                projectile[2] += 1
-                img = self.assets['projectiles']
-                self.display.blit(img, (projectile[0][0] - img.get_width() / 2 - render_scroll[0], projectile[0][1] - img.get_height() / 2 - render_scroll[1]))
-                if self.tilemap.solid_check(projectile[0]):
-                    self.projectiles.remove(projectile)
-                    for i in range(4):
-                        self.sparks.append(Spark(projectile[0], random.random() - 0.5 + (math.pi if projectile[1] > 0 else 0), 2 + random.random()))
-                elif projectile[2] > 360:
-                    self.projectiles.remove(projectile)
-                elif abs(self.player.dashing) < 50:
-                    if self.player.rect().collidepoint(projectile[0]): 
-                        self.projectiles.remove(projectile)
-                        self.dead += 1
-                        self.sfx['hit'].play()
-                        for i in range(30): 
-                            angle = random.random() * math.pi * 2
-                            speed = random.random() * 5
-                            self.sparks.append(Spark(self.player.rect().center, angle, 2 + random.random()))
-                            self.particles.append(Particle(self, 'particle', self.player.rect().center, velocity=[math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5], frame=random.randint(0,7)))
-            
-            for spark in self.sparks.copy():
-                kill = spark.update()
-                spark.render(self.display, offset=render_scroll)
-                if kill:
-                    self.sparks.remove(spark)
-
-            # Copy, update, render each particle in the list, also remove the particle if it's on a certain condition. 
-            for particle in self.particles.copy():
-                kill = particle.update()
-                particle.render(self.display, offset=render_scroll)
-                if particle.type == 'leaf': 
-                    particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-                if kill:
-                    self.particles.remove(particle)
-
-            # Movement stuffs for the player
-            for event in pygame.event.get(): # To make the mini screen so it doesn't freeze
-                if event.type == pygame.QUIT: # To exit the window if the user clicks the X
-                    pygame.quit() # To quit the game
-                    sys.exit()
-                if event.type == pygame.KEYDOWN: # To move the sprite
-                    if event.key == pygame.K_a:
-                        self.movement[0] = True
-                    if event.key == pygame.K_d:
-                        self.movement[1] = True
-                    if event.key == pygame.K_w or event.key == pygame.K_SPACE:
-                        if self.player.jump():
-                            self.sfx['jump'].play()
-                    if event.key == pygame.K_LSHIFT:
-                        self.player.dash()
-                if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_a:
-                        self.movement[0] = False
-                    if event.key == pygame.K_d:
-                        self.movement[1] = False
-
-            #Make a transition effect when the player wins the game, start the game, or change levels
-            if self.transition:
-                transition_surf = pygame.Surface(self.display.get_size())
-                pygame.draw.circle(transition_surf, (255, 255, 255), (self.display.get_width() // 2, self.display.get_height() // 2), (30 - abs(self.transition)) * 8)
-                transition_surf.set_colorkey((255,255,255))
-                self.display.blit(transition_surf, (0,0))
-                
-            # Display enemy count and total enemies
-            font = pygame.font.SysFont(None, 24)
-            enemy_count_text = font.render(f'Enemies: {self.enemy_count}/{self.total_enemies}', True, (255, 255, 255))
-            self.display.blit(enemy_count_text, (10, 10))
-
-            # Check if all levels are completed
-            if self.level == self.max_levels and not len(self.enemies):
-                self.win_screen = True
-
-            # Display win screen if all levels are completed
-            if self.win_screen:
+                self.sfx['hit'].play()
+                velocities = []
+                frames = []
+                for i in range(30): 
+                    angle = self.fx_rng.random() * math.pi * 2
+                    speed = self.fx_rng.random() * 5
+                    self.sparks.emit(self.player.rect().center, angle, 2 + self.fx_rng.random())
+                    velocities.append((math.cos(angle + math.pi) * speed * 0.5, math.sin(angle + math.pi) * speed * 0.5))
+                    frames.append(self.fx_rng.randint(0,7))
+                self.particles.emit_burst('particle', self.player.rect().center, velocities, frames)
+
+    # Update sparks and remove the ones that stopped moving
+    def update_sparks(self):
+        self.sparks.update()
+
+    # Update every particle, the ones whose animation is done get removed
+    def update_particles(self):
+        self.particles.update()
+
+    # Run the simulation steps that fit in the time since the last frame and return how far the game is between the last step
+    # and the next one (0 to 1), for render() to interpolate. When more than MAX_STEPS are due, the extra time is dropped.
+    def advance(self, elapsed, inputs):
+        self.lag = min(self.lag + elapsed, FIXED_STEP * MAX_STEPS)
+        self.pending['jump'] = self.pending['jump'] or inputs['jump']
+        self.pending['dash'] = self.pending['dash'] or inputs['dash']
+        while self.lag > FIXED_STEP - 1e-9: # (Rounding of the sums of frame times mustn't put a step off to the next frame)
+            if not self.loading:
+                self.save_positions()
+            self.update(dict(inputs, jump=self.pending['jump'], dash=self.pending['dash'])) # A jump or dash is done by one step only
+            self.pending = dict(NO_INPUT)
+            self.lag -= FIXED_STEP
+        return max(0, self.lag / FIXED_STEP)
+
+    # Remember where the camera and the player and enemies are before a simulation step (render() draws them between there and their new place)
+    def save_positions(self):
+        self.prev_scroll = (self.scroll[0], self.scroll[1])
+        self.player.prev_pos = (self.player.pos[0], self.player.pos[1])
+        for enemy in self.enemies:
+            enemy.prev_pos = (enemy.pos[0], enemy.pos[1])
+
+    # Draw the current frame and show it on the screen
+    # alpha is how far between the previous and the last simulation step the camera and the entities are drawn (1 draws the last step)
+    def render(self, alpha=1):
+        if not self.hud:
+            self.hud = Hud(self.display.get_size())
+
+        # Loading screen while the assets are loaded in the background, and the win screen when all levels are completed
+        # They don't change, so they're only drawn when they first show up (Or every frame while the profiler graph is on them)
+        screen_text = 'Loading...' if self.loading else 'You Win!' if self.win_screen else None
+        if screen_text:
+            if screen_text != self.static_screen or self.profiler.overlay:
                 self.display.fill((0, 0, 0))  # Clear the screen
-                win_text = font.render('You Win!', True, (255, 255, 255))
-                self.display.blit(win_text, (self.display.get_width() // 2 - win_text.get_width() // 2, self.display.get_height() // 2 - win_text.get_height() // 2))
-                self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0, 0))
-                pygame.display.update()
-                continue
-
+                self.hud.render_centered(self.display, screen_text)
+                self.profiler.mark('hud')
+                self.present()
+                self.static_screen = screen_text
+            return
+        self.static_screen = None
+
+        self.display.blit(self.assets['background'], (0, 0)) # Draw the background
+        self.profiler.mark('background')
+
+        #Render the scroll to move horizontally or vertically, depends on the player movement
+        back = 1 - alpha
+        render_scroll = (int(self.scroll[0] - (self.scroll[0] - self.prev_scroll[0]) * back), int(self.scroll[1] - (self.scroll[1] - self.prev_scroll[1]) * back))
+
+        self.clouds.render(self.display, offset=render_scroll) # Render the clouds and whenever the player moves it will still spawn the clouds out of the screen
+        self.profiler.mark('clouds')
+
+        self.tilemap.render(self.display, offset=render_scroll) # Render the tilemap
+        self.profiler.mark('tilemap')
+
+        self.render_entities(render_scroll, alpha)
+        self.render_projectiles(render_scroll, alpha)
+        self.profiler.mark('projectiles')
+        self.render_sparks(render_scroll)
+        self.profiler.mark('sparks')
+        self.render_particles(render_scroll)
+        self.profiler.mark('particles')
+        self.render_overlay()
+        self.profiler.mark('hud')
+        self.present()
+
+    # Render the enemies and the player
+    def render_entities(self, render_scroll, alpha=1):
+        view = pygame.Rect(render_scroll, self.display.get_size()).inflate(64, 64) # The sprites reach less than 32 pixels from an enemy's position
+        for enemy in self.enemies:
+            if not self.cull or view.collidepoint(enemy.pos):
+                enemy.render(self.display, offset=render_scroll, alpha=alpha)
+        self.profiler.mark('enemies')
+
+        if not self.dead: 
+            self.player.render(self.display, offset=render_scroll, alpha=alpha)
+        self.profiler.mark('player')
+
+    # Render projectiles, sparks and particles
+    def render_projectiles(self, render_scroll, alpha=1):
+        self.projectiles.render(self.display, self.assets['projectiles'], offset=render_scroll, alpha=alpha)
+
+    def render_sparks(self, render_scroll):
+        self.sparks.render(self.display, offset=render_scroll)
+
+    def render_particles(self, render_scroll):
+        self.particles.render(self.display, offset=render_scroll)
+
+    # Render the transition and the enemy counter on top of the game
+    def render_overlay(self):
+        #Make a transition effect when the player wins the game, start the game, or change levels
+        if self.transition:
+            self.hud.render_iris(self.display, abs(self.transition))
             
+        # Display enemy count and total enemies
+        self.display.blit(self.hud.text(f'Enemies: {self.enemy_count}/{self.total_enemies}'), (10, 10))
+
+    # Scale the game display up to the window and show it (With the profiler's graph on top when it's shown)
+    def present(self):
+        self.profiler.render(self.display)
+        self.profiler.mark('profiler')
+        self.presenter.present(self.display) # To draw the game display on the screen
+        self.profiler.mark('present')
+
+    # Start or stop profiling (The display is swapped for one that counts its blits while profiling)
+    def set_profiler(self, profiler):
+        self.profiler.close()
+        self.profiler = profiler
+        display = pygame.Surface(self.display.get_size()) if profiler is NULL_PROFILER else CountingSurface(self.display.get_size())
+        display.blit(self.display, (0, 0))
+        self.display = display
+
+    # F3 shows or hides the profiler's graph (Profiling stops with it, unless the frames are being written to a file)
+    def toggle_profiler_overlay(self):
+        self.static_screen = None # Draw the loading or win screen again, with or without the graph
+        if self.profiler is NULL_PROFILER:
+            self.set_profiler(FrameProfiler(overlay=True))
+        elif self.profiler.path:
+            self.profiler.overlay = not self.profiler.overlay
+        else:
+            self.set_profiler(NULL_PROFILER)
+
+    # Frame rate cap of the window (The loading and win screens don't need more than IDLE_FPS, even when the game isn't capped)
+    def frame_cap(self):
+        if self.static_screen:
+            return min(self.fps or IDLE_FPS, IDLE_FPS)
+        return self.fps
 
-            self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0,0)) # To draw the game display on the screen
-            pygame.display.update()
-            self.clock.tick(60) # Force the loop to run at 60 fps
-Game().run()
-
-
+    def run(self): # To run the game
+        last = time.perf_counter()
+        while True: # Create a game loop
+            self.profiler.begin_frame()
+            inputs = self.handle_events()
+            self.profiler.mark('events')
+            now = time.perf_counter()
+            alpha = self.advance(now - last, inputs)
+            last = now
+            self.render(alpha)
+            self.profiler.end_frame(self)
+            self.clock.tick(self.frame_cap()) # Cap the frame rate
+
+    # Play back the whole replay without a frame cap (Rendering every step when render is True)
+    # Returns how long each step took in milliseconds
+    def run_replay(self, render=False):
+        times = []
+        while not self.replay.done():
+            start = time.perf_counter()
+            self.profiler.begin_frame()
+            self.update(NO_INPUT)
+            if render:
+                self.render()
+            self.profiler.end_frame(self)
+            times.append((time.perf_counter() - start) * 1000)
+        return times
+
+    # Step the game without rendering or a frame cap, as fast as the CPU allows (Returns the frames per second)
+    def run_headless(self, frames, inputs=NO_INPUT):
+        start = time.perf_counter()
+        for i in range(frames):
+            self.profiler.begin_frame()
+            self.update(inputs)
+            self.profiler.end_frame(self)
+        return frames / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Samurai Dash')
+    parser.add_argument('--headless', action='store_true', help='Run the simulation with no window, sound or frame cap and print its speed')
+    parser.add_argument('--frames', type=int, default=3600, help='Number of frames to step in headless mode')
+    parser.add_argument('--level', type=int, help='Level to start at (Headless mode runs every level when not given)')
+    parser.add_argument('--stream', action='store_true', help='Stream the map chunks around the camera instead of loading whole levels')
+    parser.add_argument('--seed', type=seed_arg, help='Seed of the random numbers, from 0 to 2**32 - 1 (A random one when not given)')
+    parser.add_argument('--record', metavar='PATH', help='Record the inputs of the run to a replay file, it is saved when the window is closed')
+    parser.add_argument('--replay', metavar='PATH', help='Play back a replay file headless as fast as possible and check it plays out the same')
+    parser.add_argument('--render', action='store_true', help='Also render every step of the replay')
+    parser.add_argument('--profile', metavar='PATH', help='Write the time of every phase of every frame to a CSV file (JSON Lines when PATH ends with .jsonl), F3 shows the graph')
+    parser.add_argument('--present', choices=list(PRESENTERS), default='scale', help='How the game is scaled up to the window: in software (scale), by SDL\'s renderer (sdl2) or only where the picture changed (dirty)')
+    parser.add_argument('--fps', type=int, default=60, help='Frame rate cap of the window (0 for no cap), the game runs at the same speed at any frame rate')
+    args = parser.parse_args()
+    profiler = FrameProfiler(args.profile) if args.profile else NULL_PROFILER
+
+    if args.replay:
+        replay = load_replay(args.replay)
+        game = Game(headless=True, level=replay.level, stream=args.stream, seed=replay.seed, replay=replay)
+        game.set_profiler(profiler)
+        times = game.run_replay(render=args.render)
+        slowest = max(range(len(times)), key=lambda step: times[step])
+        print(f'{len(times)} steps at {len(times) / sum(times) * 1000:.0f} fps, slowest step {slowest} took {times[slowest]:.2f} ms')
+        print('The replay played out the same as the recording' if replay.diverged is None else f'The replay diverged from the recording between steps {max(0, replay.diverged - replay.interval)} and {replay.diverged}')
+    elif args.headless:
+        levels = [args.level] if args.level is not None else range(3)
+        for level in levels:
+            game = Game(headless=True, level=level, stream=args.stream, seed=args.seed)
+            game.set_profiler(profiler)
+            fps = game.run_headless(args.frames)
+            print(f'Level {level}: {args.frames} frames at {fps:.0f} fps')
+    else:
+        game = Game(level=args.level or 0, stream=args.stream, fps=args.fps, seed=args.seed, present=args.present)
+        if args.record:
+            game.replay = Replay(game.seed, game.level)
+            game.replay_path = args.record
+        game.set_profiler(profiler)
+        game.run()
+    profiler.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import pygame
+
+IRIS_STEPS = 30 # Frames the transition takes to close or open (Game.transition goes from -30 to 30)
+IRIS_SPEED = 8 # Pixels the hole of the transition shrinks by every frame
+TEXT_CACHE_SIZE = 64 # Most different texts kept rendered (The cache is emptied when it's full)
+IDLE_FPS = 30 # Frame rate cap of the loading and win screens
+
+# Class for what's drawn on top of the game: text and the circle transition
+# The font is loaded once, a text is only rendered the first time it's shown, and the transition masks are made up front,
+# so drawing the overlay doesn't load or create anything while the game runs
+class Hud:
+    def __init__(self, size, font_size=24):
+        self.size = size
+        self.font = pygame.font.SysFont(None, font_size)
+        self.texts = {} # (text, color) -> rendered text
+        self.masks = [None] + [self.make_mask(step) for step in range(1, IRIS_STEPS + 1)] # Step 0 is no transition
+
+    # Mask of the transition: black with a see-through hole in the middle
+    # It only covers the square around the hole, the rest of the screen is filled with black when it's drawn
+    def make_mask(self, step):
+        radius = (IRIS_STEPS - step) * IRIS_SPEED
+        if not radius:
+            return None # Nothing left to see
+        mask = pygame.Surface((radius * 2 + 1, radius * 2 + 1))
+        pygame.draw.circle(mask, (255, 255, 255), (radius, radius), radius)
+        mask.set_colorkey((255, 255, 255), pygame.RLEACCEL) # Run length encoded, so the hole is skipped instead of checked pixel by pixel
+        return mask
+
+    # A text rendered with the font (Rendered once and kept)
+    def text(self, text, color=(255, 255, 255)):
+        key = (text, color)
+        if key not in self.texts:
+            if len(self.texts) >= TEXT_CACHE_SIZE:
+                self.texts.clear()
+            self.texts[key] = self.font.render(text, True, color)
+        return self.texts[key]
+
+    # Draw a text in the middle of the surface
+    def render_centered(self, surf, text):
+        text_surf = self.text(text)
+        surf.blit(text_surf, (surf.get_width() // 2 - text_surf.get_width() // 2, surf.get_height() // 2 - text_surf.get_height() // 2))
+
+    # Draw the circle transition, step goes from 0 (Open) to 30 (Closed)
+    def render_iris(self, surf, step):
+        mask = self.masks[min(step, IRIS_STEPS)]
+        if not mask:
+            surf.fill((0, 0, 0))
+            return
+        width, height = surf.get_size()
+        left = width // 2 - mask.get_width() // 2
+        top = height // 2 - mask.get_height() // 2
+        right = left + mask.get_width()
+        bottom = top + mask.get_height()
+        surf.fill((0, 0, 0), (0, 0, width, max(0, top)))
+        surf.fill((0, 0, 0), (0, bottom, width, height - bottom))
+        surf.fill((0, 0, 0), (0, top, max(0, left), mask.get_height()))
+        surf.fill((0, 0, 0), (right, top, width - right, mask.get_height()))
+        surf.blit(mask, (left, top))
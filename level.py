@@ -0,0 +1,57 @@
+import os
+import pygame
+from map import Tilemap
+
+# Where the map file of a level is
+def level_path(map_id):
+    return 'maps/' + str(map_id) + '.json'
+
+# Modification time and size of a map file, used to tell when a snapshot is out of date
+def file_signature(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+# Class to hold a level once it's loaded and set up: the tilemap with the spawners taken out, where the player and enemies start,
+# and the trees that drop leaves. Respawning restores the level from it instead of reading the map file again.
+# The game never edits the tilemap, so the snapshot's tilemap is used as it is. Everything else is stored as tuples
+# and copied into new objects by Game.setup_level().
+class LevelSnapshot:
+    def __init__(self, tilemap, path=None):
+        self.path = path # Map file the tilemap was loaded from (None when it wasn't loaded from a file)
+        self.signature = file_signature(path) if path else None
+        self.tilemap = tilemap
+
+        # Rectangles where the trees ('large_decor' variant 2) spawn leaves
+        self.leaf_spawners = tuple((4 + tree['pos'][0], 4 + tree['pos'][1], 23, 13) for tree in tilemap.extract([('large_decor', 2)], keep=True))
+
+        # Spawner variant 0 is where the player starts, variant 1 is an enemy
+        self.player_pos = None
+        enemy_positions = []
+        for spawner in tilemap.extract([('spawners', 0), ('spawners', 1)]):
+            if spawner['variant'] == 0:
+                self.player_pos = tuple(spawner['pos'])
+            else:
+                enemy_positions.append(tuple(spawner['pos']))
+        self.enemy_positions = tuple(sorted(enemy_positions)) # In the same order whatever kind of tilemap found them, so replays play out the same
+
+    # Render the chunks the camera shows at the start of the level: it starts at (0, 0) and moves to the player
+    def prerender(self, view_size):
+        view = pygame.Rect((0, 0), view_size)
+        if self.player_pos:
+            view.union_ip(pygame.Rect((self.player_pos[0] - view_size[0] // 2, self.player_pos[1] - view_size[1] // 2), view_size))
+        self.tilemap.prerender(view)
+
+    # Check if the map file is unchanged since the snapshot was taken
+    def up_to_date(self):
+        if not self.path:
+            return True
+        try:
+            return file_signature(self.path) == self.signature
+        except OSError:
+            return False
+
+# Load a level's map and take its snapshot
+def load_level_snapshot(game, map_id, tilemap_class=Tilemap):
+    tilemap = tilemap_class(game, tile_size=16)
+    tilemap.load(level_path(map_id))
+    return LevelSnapshot(tilemap, level_path(map_id))
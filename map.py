@@ -1,5 +1,8 @@
 import json
+import math
 import pygame
+from collections.abc import MutableMapping
+from mapfile import MapFile, write_map
 
 # Mapping of autotile configurations to tile variants
 AUTOTILE_MAP = {
@@ -14,108 +17,385 @@ AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8,
 }
 
+AUTOTILE_SHIFTS = [(1, 0), (-1, 0), (0, -1), (0, 1)] # Neighbors that decide a tile's variant, in the order of their bit in the neighbor mask
+# Variant for each of the 16 neighbor masks (None when the mask isn't in AUTOTILE_MAP, those tiles are left alone)
+AUTOTILE_LUT = [AUTOTILE_MAP.get(tuple(sorted(shift for bit, shift in enumerate(AUTOTILE_SHIFTS) if mask & 1 << bit))) for mask in range(16)]
+
 # Neighbor offsets for tile checking
 NEIGHBOR_OFFSETS = [(-1, 0), (-1, -1), (0, -1), (1, -1), (1, 0), (0, 0), (-1, 1), (0, 1), (1, 1)]
 PHYSICS_BLOCKS = {'grass', 'stone'}
 AUTOTILES_TYPES = {'grass', 'stone'}
+CHUNK_SIZE = 16 # Width and height of a render chunk in tiles
+
+# Convert a grid position to the "x;y" key used by the map files
+def loc_key(pos):
+    return str(pos[0]) + ';' + str(pos[1])
+
+# Convert an "x;y" key back to an integer grid position
+def loc_pos(loc):
+    x, y = loc.split(';')
+    return (int(x), int(y))
+
+# Dictionary-like view of the grid with the old "x;y" string keys (So code written for the old format keeps working)
+class TileDict(MutableMapping):
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+
+    def __getitem__(self, loc):
+        return self.tilemap.grid[loc_pos(loc)]
+
+    def __setitem__(self, loc, tile):
+        self.tilemap.set_tile(loc_pos(loc), tile)
+
+    def __delitem__(self, loc):
+        if loc_pos(loc) not in self.tilemap.grid:
+            raise KeyError(loc)
+        self.tilemap.remove_tile(loc_pos(loc))
+
+    def __contains__(self, loc):
+        return loc_pos(loc) in self.tilemap.grid
+
+    def __iter__(self):
+        return (loc_key(pos) for pos in list(self.tilemap.grid))
+
+    def __len__(self):
+        return len(self.tilemap.grid)
+
+# Spatial hash of the offgrid tiles: each tile is listed in every bucket its image overlaps
+# Tiles keep the order of offgrid_tiles inside each bucket, and a query over several buckets is sorted back into that order
+class OffgridIndex:
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        self.bucket_px = CHUNK_SIZE * tilemap.tile_size
+        self.buckets = {}
+        self.order = {} # Position of each tile (By id) in the order they are drawn
+        self.next_order = 0 # Position of the next added tile (It keeps counting up, so removed tiles never leave a position to reuse)
+        self.tiles = tilemap.offgrid_tiles # The list this index was built from
+        self.count = 0
+        for tile in self.tiles:
+            self.add(tile)
+
+    # Check if the index still matches the tilemap's offgrid list (It's rebuilt when the list was replaced or changed directly)
+    def matches(self, tilemap):
+        return self.tiles is tilemap.offgrid_tiles and self.count == len(self.tiles) and self.bucket_px == CHUNK_SIZE * tilemap.tile_size
+
+    def buckets_in(self, rect):
+        return [(bx, by) for bx in range(rect.left // self.bucket_px, (rect.right - 1) // self.bucket_px + 1) for by in range(rect.top // self.bucket_px, (rect.bottom - 1) // self.bucket_px + 1)]
+
+    def add(self, tile):
+        self.order[id(tile)] = self.next_order
+        self.next_order += 1
+        for bucket in self.buckets_in(self.tilemap.tile_rect(tile, ongrid=False)):
+            self.buckets.setdefault(bucket, []).append(tile)
+        self.count += 1
+
+    def remove(self, tile):
+        for bucket in self.buckets_in(self.tilemap.tile_rect(tile, ongrid=False)):
+            self.buckets[bucket].remove(tile)
+        del self.order[id(tile)] # Python can give the id to a new tile
+        self.count -= 1
+
+    # Tiles whose image overlaps a pixel rectangle, in the order they are drawn
+    def query(self, rect):
+        buckets = self.buckets_in(rect)
+        if len(buckets) == 1:
+            candidates = self.buckets.get(buckets[0], [])
+        else:
+            candidates = {id(tile): tile for bucket in buckets for tile in self.buckets.get(bucket, [])}
+            candidates = sorted(candidates.values(), key=lambda tile: self.order[id(tile)])
+        tile_rect = self.tilemap.tile_rect
+        return [tile for tile in candidates if tile_rect(tile, ongrid=False).colliderect(rect)]
 
 #To represent the tilemap
 class Tilemap:
     def __init__(self, game, tile_size=16):
         self.game = game
         self.tile_size = tile_size
-        self.tilemap = {}
+        self.grid = {} # Grid tiles keyed by their (x, y) tile position
+        self.solid_rects = {} # Pre-built collision rectangles of the solid tiles, keyed like grid
+        self.type_index = {} # Positions of the grid tiles of each (type, variant), in the order they were stored
         self.offgrid_tiles = []
+        self.offgrid_index = None # Built the first time it's needed (See offgrid_in_rect)
+        self.offgrid_types = None # Built the first time it's needed (See offgrid_by_type)
+        self.chunk_cache = {} # Pre-rendered chunk surfaces (None for empty chunks)
+
+    # The grid with "x;y" string keys, like it is stored in the map files
+    @property
+    def tilemap(self):
+        return TileDict(self)
 
-    # Method to extract tiles based on type and variant
+    @tilemap.setter
+    def tilemap(self, tiles):
+        self.clear_grid()
+        for loc in tiles:
+            self.store_tile(loc_pos(loc), tiles[loc])
+        self.invalidate()
+
+    # Method to extract tiles based on type and variant (Only the matching tiles are visited, through the type index)
     def extract(self, id_pairs, keep=False):
-        matches = []
-        # Iterate over a copy of offgrid_tiles to avoid modifying the list while iterating
-        for tile in self.offgrid_tiles.copy():
-             # Check if the tile's type and variant match any in id_pairs
-            if (tile['type'], tile['variant']) in id_pairs:
-                matches.append(tile.copy())
-                if not keep:
-                    self.offgrid_tiles.remove(tile)
+        matches = self.extract_offgrid(id_pairs, keep)
         
-        # Iterate over a list of keys from the tilemap dictionary 
-        for loc in list(self.tilemap):
-            tile = self.tilemap[loc]
-            if (tile['type'], tile['variant']) in id_pairs:
-                matches.append(tile.copy())
-                matches[-1]['pos'] = matches[-1]['pos'].copy()
-                matches[-1]['pos'][0] *= self.tile_size
-                matches[-1]['pos'][1] *= self.tile_size
+        for pair in id_pairs:
+            for loc in list(self.type_index.get(pair, ())):
+                matches.append(self.grid[loc].copy())
+                matches[-1]['pos'] = [loc[0] * self.tile_size, loc[1] * self.tile_size]
                 if not keep:
-                    del self.tilemap[loc]
+                    self.unstore_tile(loc)
+
+        # Extracted tiles (like the spawners) may have no image loaded, so the whole cache is dropped instead of only their chunks
+        if matches and not keep:
+            self.invalidate()
         
         return matches
 
+    # Method to extract the offgrid tiles based on type and variant
+    def extract_offgrid(self, id_pairs, keep=False):
+        offgrid_types = self.offgrid_by_type()
+        matches = [tile.copy() for pair in id_pairs for tile in offgrid_types.get(pair, [])]
+        if matches and not keep:
+            self.offgrid_tiles = [tile for tile in self.offgrid_tiles if (tile['type'], tile['variant']) not in id_pairs]
+        return matches
+
+    # Get the offgrid tiles of each (type, variant) (Built again after offgrid_tiles was replaced or changed)
+    def offgrid_by_type(self):
+        if not self.offgrid_types or self.offgrid_types[0] is not self.offgrid_tiles or self.offgrid_types[1] != len(self.offgrid_tiles):
+            offgrid_types = {}
+            for tile in self.offgrid_tiles:
+                offgrid_types.setdefault((tile['type'], tile['variant']), []).append(tile)
+            self.offgrid_types = (self.offgrid_tiles, len(self.offgrid_tiles), offgrid_types)
+        return self.offgrid_types[2]
+
+    # Count the tiles of a (type, variant) on and off the grid
+    def count_tiles(self, pair):
+        return len(self.type_index.get(pair, ())) + len(self.offgrid_by_type().get(pair, []))
+
+    # Method to remove every grid tile
+    def clear_grid(self):
+        self.grid = {}
+        self.solid_rects = {}
+        self.type_index = {}
+
+    # Method to store a tile in the grid without touching the render cache
+    def store_tile(self, loc, tile):
+        if loc in self.grid:
+            self.unstore_tile(loc)
+        self.grid[loc] = tile
+        self.type_index.setdefault((tile['type'], tile['variant']), {})[loc] = None
+        if tile['type'] in PHYSICS_BLOCKS:
+            self.solid_rects[loc] = pygame.Rect(loc[0] * self.tile_size, loc[1] * self.tile_size, self.tile_size, self.tile_size)
+        else:
+            self.solid_rects.pop(loc, None)
+
+    # Method to take a tile out of the grid without touching the render cache
+    def unstore_tile(self, loc):
+        tile = self.grid.pop(loc)
+        self.solid_rects.pop(loc, None)
+        self.type_index[(tile['type'], tile['variant'])].pop(loc)
+
+    # Method to change the variant of a grid tile without touching the render cache
+    def set_variant(self, loc, variant):
+        tile = self.grid[loc]
+        self.type_index[(tile['type'], tile['variant'])].pop(loc)
+        tile['variant'] = variant
+        self.type_index.setdefault((tile['type'], variant), {})[loc] = None
+
+    # Method to place a tile on the grid (Used by the editor)
+    def place_tile(self, tile):
+        self.set_tile((int(tile['pos'][0]), int(tile['pos'][1])), tile)
+
+    # Method to put a tile at a grid position
+    def set_tile(self, loc, tile):
+        old = self.grid.get(loc)
+        if old and (old['type'], old['variant']) == (tile['type'], tile['variant']):
+            return
+        if old:
+            self.invalidate_rect(self.tile_rect(old))
+        self.store_tile(loc, tile)
+        self.invalidate_rect(self.tile_rect(tile))
+
+    # Method to remove the tile at a grid position
+    def remove_tile(self, tile_pos):
+        loc = (int(tile_pos[0]), int(tile_pos[1]))
+        if loc in self.grid:
+            self.invalidate_rect(self.tile_rect(self.grid[loc]))
+            self.unstore_tile(loc)
+
+    # Method to add an offgrid tile (Decor that isn't aligned to the grid)
+    def add_offgrid(self, tile):
+        self.offgrid_tiles.append(tile)
+        if self.offgrid_index and self.offgrid_index.count == len(self.offgrid_tiles) - 1:
+            self.offgrid_index.add(tile)
+        self.offgrid_types = None
+        self.invalidate_rect(self.tile_rect(tile, ongrid=False))
+
+    # Method to remove an offgrid tile
+    def remove_offgrid(self, tile):
+        self.offgrid_tiles.remove(tile)
+        if self.offgrid_index and self.offgrid_index.count == len(self.offgrid_tiles) + 1:
+            self.offgrid_index.remove(tile)
+        self.offgrid_types = None
+        self.invalidate_rect(self.tile_rect(tile, ongrid=False))
+
+    # Get the offgrid tiles whose image overlaps a pixel rectangle (In the order they are drawn)
+    def offgrid_in_rect(self, rect):
+        if not self.offgrid_index or not self.offgrid_index.matches(self):
+            self.offgrid_index = OffgridIndex(self)
+        return self.offgrid_index.query(rect)
+
+    # Get the offgrid tiles whose image covers a pixel position
+    def offgrid_at(self, pos):
+        return self.offgrid_in_rect(pygame.Rect(math.floor(pos[0]), math.floor(pos[1]), 1, 1))
+
+    # Get the pixel rectangle covered by a tile image
+    def tile_rect(self, tile, ongrid=True):
+        img = self.game.assets[tile['type']][tile['variant']]
+        if ongrid:
+            return pygame.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, img.get_width(), img.get_height())
+        return pygame.Rect(math.floor(tile['pos'][0]), math.floor(tile['pos'][1]), img.get_width(), img.get_height())
+
+    # Method to drop every cached chunk so they get rendered again
+    def invalidate(self):
+        self.chunk_cache = {}
+
+    # Method to drop the cached chunks that overlap a pixel rectangle
+    def invalidate_rect(self, rect):
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for cx in range(rect.left // chunk_px, (rect.right - 1) // chunk_px + 1):
+            for cy in range(rect.top // chunk_px, (rect.bottom - 1) // chunk_px + 1):
+                self.chunk_cache.pop((cx, cy), None)
+
     #Get tiles around a position
     def tiles_around(self, pos):
-        tiles = []
-        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
-        for offset in NEIGHBOR_OFFSETS:
-            check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
-        return tiles
+        x = int(pos[0] // self.tile_size)
+        y = int(pos[1] // self.tile_size)
+        grid = self.grid
+        return [grid[(x + ox, y + oy)] for ox, oy in NEIGHBOR_OFFSETS if (x + ox, y + oy) in grid]
     
-    #Save the tilemap to a JSON file
+    #Save the tilemap to a JSON file (Or to the binary format of mapfile.py when the path ends with .map)
     def save(self, path):
+        if path.endswith('.map'):
+            write_map(path, self.tile_size, self.grid, self.offgrid_tiles, chunk_size=CHUNK_SIZE)
+            return
         f = open(path, 'w')
-        json.dump({'tilemap': self.tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f)
+        json.dump({'tilemap': {loc_key(loc): self.grid[loc] for loc in self.grid}, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f)
         f.close()
         
-    #Load the tilemap from a JSON file
+    #Load the tilemap from a JSON file (Or from the binary format of mapfile.py when the path ends with .map)
     def load(self, path):
+        if path.endswith('.map'):
+            map_file = MapFile(path)
+            self.tile_size = map_file.tile_size
+            self.clear_grid()
+            for loc, tile in map_file.all_tiles():
+                self.store_tile(loc, tile)
+            self.offgrid_tiles = map_file.offgrid()
+            map_file.close()
+            self.invalidate()
+            return
         f = open(path, 'r')
         map_data = json.load(f)
         f.close()
-        self.tilemap = map_data['tilemap']
         self.tile_size = map_data['tile_size']
+        self.tilemap = map_data['tilemap']
         self.offgrid_tiles = map_data['offgrid']
+        self.invalidate()
+
+    # Release what the tilemap holds open (Nothing for a tilemap that is fully in memory, see PagedTilemap)
+    def close(self):
+        pass
 
     # Method to check if a position is solid tile or not
     def solid_check(self, pos):
-        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size))
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]['type'] in PHYSICS_BLOCKS:
-                return self.tilemap[tile_loc]
+        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        if tile_loc in self.solid_rects:
+            return self.grid[tile_loc]
 
     #Get physics rectangles around a position (Applying the physics to the tiles)
+    #The rectangles are shared between calls, so they must not be modified
     def physics_rects_around(self, pos):
-        rects = []
-        for tile in self.tiles_around(pos):
-            if tile['type'] in PHYSICS_BLOCKS:
-                rects.append(pygame.Rect(tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size, self.tile_size, self.tile_size))
-        return rects
+        x = int(pos[0] // self.tile_size)
+        y = int(pos[1] // self.tile_size)
+        rects = self.solid_rects
+        return [rects[(x + ox, y + oy)] for ox, oy in NEIGHBOR_OFFSETS if (x + ox, y + oy) in rects]
     
     #To autotile the map based on the tile location (Map creating)
+    #The tiles are grouped by type first, so each neighbor check is one set lookup, and the 4 checks make a bit mask
+    #that picks the variant from AUTOTILE_LUT
     def autotile(self):
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            neighbors = set()
-            for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
-                if check_loc in self.tilemap:
-                    if self.tilemap[check_loc]['type'] == tile['type']:
-                        neighbors.add(shift)
-            neighbors = tuple(sorted(neighbors))
-            if (tile['type'] in AUTOTILES_TYPES) and (neighbors in AUTOTILE_MAP):
-                tile['variant'] = AUTOTILE_MAP[neighbors]
+        types = {}
+        for loc in self.grid:
+            types.setdefault(self.grid[loc]['type'], set()).add(loc)
+        lut = AUTOTILE_LUT
+        for tile_type in AUTOTILES_TYPES & types.keys():
+            locs = types[tile_type]
+            for x, y in locs:
+                mask = ((x + 1, y) in locs) | ((x - 1, y) in locs) << 1 | ((x, y - 1) in locs) << 2 | ((x, y + 1) in locs) << 3
+                if lut[mask] is not None and lut[mask] != self.grid[(x, y)]['variant']:
+                    self.set_variant((x, y), lut[mask])
+        self.invalidate()
+
+    #Autotile one tile from its 4 neighbors
+    def autotile_tile(self, loc):
+        tile = self.grid.get(loc)
+        if not tile or tile['type'] not in AUTOTILES_TYPES:
+            return
+        mask = 0
+        for bit, shift in enumerate(AUTOTILE_SHIFTS):
+            neighbor = self.grid.get((loc[0] + shift[0], loc[1] + shift[1]))
+            if neighbor and neighbor['type'] == tile['type']:
+                mask |= 1 << bit
+        variant = AUTOTILE_LUT[mask]
+        if variant is not None and variant != tile['variant']:
+            self.invalidate_rect(self.tile_rect(tile))
+            self.set_variant(loc, variant)
+            self.invalidate_rect(self.tile_rect(tile))
+
+    #Autotile a tile and its 4 neighbors (Call it after placing or removing a tile, instead of autotiling the whole map)
+    def autotile_around(self, loc):
+        self.autotile_tile(loc)
+        for shift in AUTOTILE_SHIFTS:
+            self.autotile_tile((loc[0] + shift[0], loc[1] + shift[1]))
     
-    #Render the tilemap on the surface
+    # Render one chunk into its own surface (Returns None when nothing is drawn in it)
+    def render_chunk(self, chunk):
+        chunk_px = CHUNK_SIZE * self.tile_size
+        chunk_rect = pygame.Rect(chunk[0] * chunk_px, chunk[1] * chunk_px, chunk_px, chunk_px)
+        surf = None
+
+        # Offgrid decor is drawn first, into every chunk it overlaps
+        tiles = [(tile, self.tile_rect(tile, ongrid=False)) for tile in self.offgrid_in_rect(chunk_rect)]
+
+        # Grid tiles from this chunk and the chunks above/left of it (Their images can hang over into this chunk)
+        grid_tiles = []
+        for x in range((chunk[0] - 1) * CHUNK_SIZE, (chunk[0] + 1) * CHUNK_SIZE):
+            for y in range((chunk[1] - 1) * CHUNK_SIZE, (chunk[1] + 1) * CHUNK_SIZE):
+                if (x, y) in self.grid:
+                    tile_r = self.tile_rect(self.grid[(x, y)])
+                    if tile_r.colliderect(chunk_rect):
+                        grid_tiles.append((self.grid[(x, y)], tile_r))
+        tiles += grid_tiles
+
+        for tile, tile_r in tiles:
+            if not surf:
+                surf = pygame.Surface((chunk_px, chunk_px), pygame.SRCALPHA)
+            surf.blit(self.game.assets[tile['type']][tile['variant']], (tile_r.x - chunk_rect.x, tile_r.y - chunk_rect.y))
+        return surf
+
+    # Render the chunks that cover a pixel rectangle ahead of time, so the frames that first show them don't have to
+    def prerender(self, rect):
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for cx in range(rect.left // chunk_px, (rect.right - 1) // chunk_px + 1):
+            for cy in range(rect.top // chunk_px, (rect.bottom - 1) // chunk_px + 1):
+                if (cx, cy) not in self.chunk_cache:
+                    self.chunk_cache[(cx, cy)] = self.render_chunk((cx, cy))
+
+    #Render the tilemap on the surface (Each chunk is rendered once and then reused every frame)
     def render(self, surf, offset=(0, 0)):
-        for tile in self.offgrid_tiles:
-            surf.blit(self.game.assets[tile['type']][tile['variant']], (tile['pos'][0] - offset[0], tile['pos'][1] - offset[1]))
-        
-        # Calculate the range of tiles to render based on the offset and surface size
-        for x in range(offset[0] // self.tile_size, (offset[0] + surf.get_width()) // self.tile_size + 1):
-            for y in range(offset[1] // self.tile_size, (offset[1] + surf.get_height()) // self.tile_size + 1):
-                loc = str(x) + ';' + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    surf.blit(self.game.assets[tile['type']][tile['variant']], 
-                              (tile['pos'][0] * self.tile_size - offset[0], 
-                               tile['pos'][1] * self.tile_size - offset[1]))
\ No newline at end of file
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for cx in range(offset[0] // chunk_px, (offset[0] + surf.get_width()) // chunk_px + 1):
+            for cy in range(offset[1] // chunk_px, (offset[1] + surf.get_height()) // chunk_px + 1):
+                if (cx, cy) not in self.chunk_cache:
+                    self.chunk_cache[(cx, cy)] = self.render_chunk((cx, cy))
+                chunk_surf = self.chunk_cache[(cx, cy)]
+                if chunk_surf:
+                    surf.blit(chunk_surf, (cx * chunk_px - offset[0], cy * chunk_px - offset[1]))
@@ -0,0 +1,124 @@
+import sys
+import json
+import mmap
+import struct
+
+# Binary map format (Little endian):
+#   header     magic, version, tile size, chunk size, number of tile types, number of chunks, number of offgrid tiles
+#   types      tile type names, each one is a length byte followed by the UTF-8 name
+#   directory  (chunk x, chunk y, file offset of the chunk's data) for every chunk that has tiles
+#   offgrid    (type id, variant, x, y) for every offgrid tile
+#   chunks     chunk size * chunk size type bytes (0 is an empty cell, n is the type n - 1), then as many variant bytes
+# Cells of a chunk are stored row by row
+MAGIC = b'SDMP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHHII')
+DIRECTORY_ENTRY = struct.Struct('<iiI')
+OFFGRID_ENTRY = struct.Struct('<BBdd')
+
+# Write a map in the binary format (grid is (x, y) -> tile, like Tilemap.grid)
+def write_map(path, tile_size, grid, offgrid_tiles, chunk_size=16):
+    types = sorted(set(tile['type'] for tile in grid.values()) | set(tile['type'] for tile in offgrid_tiles))
+    type_ids = {tile_type: i for i, tile_type in enumerate(types)}
+
+    # Fill the dense arrays of every chunk that has at least one tile
+    chunks = {}
+    for (x, y), tile in grid.items():
+        chunk = (x // chunk_size, y // chunk_size)
+        if chunk not in chunks:
+            chunks[chunk] = (bytearray(chunk_size * chunk_size), bytearray(chunk_size * chunk_size))
+        cell = (y % chunk_size) * chunk_size + x % chunk_size
+        chunks[chunk][0][cell] = type_ids[tile['type']] + 1
+        chunks[chunk][1][cell] = tile['variant']
+
+    type_table = b''.join(bytes([len(name.encode())]) + name.encode() for name in types)
+    offset = HEADER.size + len(type_table) + DIRECTORY_ENTRY.size * len(chunks) + OFFGRID_ENTRY.size * len(offgrid_tiles)
+    directory = b''
+    for chunk in sorted(chunks):
+        directory += DIRECTORY_ENTRY.pack(chunk[0], chunk[1], offset)
+        offset += chunk_size * chunk_size * 2
+
+    f = open(path, 'wb')
+    f.write(HEADER.pack(MAGIC, VERSION, tile_size, chunk_size, len(types), len(chunks), len(offgrid_tiles)))
+    f.write(type_table)
+    f.write(directory)
+    for tile in offgrid_tiles:
+        f.write(OFFGRID_ENTRY.pack(type_ids[tile['type']], tile['variant'], tile['pos'][0], tile['pos'][1]))
+    for chunk in sorted(chunks):
+        f.write(chunks[chunk][0])
+        f.write(chunks[chunk][1])
+    f.close()
+
+# Class to read a map in the binary format (The file is memory mapped, chunks are only decoded when asked for)
+class MapFile:
+    def __init__(self, path):
+        f = open(path, 'rb')
+        self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        f.close()
+        magic, version, self.tile_size, self.chunk_size, type_count, chunk_count, offgrid_count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(path + ' is not a version ' + str(VERSION) + ' map file')
+
+        offset = HEADER.size
+        self.types = []
+        for i in range(type_count):
+            length = self.data[offset]
+            self.types.append(self.data[offset + 1:offset + 1 + length].decode())
+            offset += 1 + length
+
+        self.chunks = {} # File offset of every chunk that has tiles
+        for cx, cy, chunk_offset in DIRECTORY_ENTRY.iter_unpack(self.data[offset:offset + DIRECTORY_ENTRY.size * chunk_count]):
+            self.chunks[(cx, cy)] = chunk_offset
+        offset += DIRECTORY_ENTRY.size * chunk_count
+
+        self.offgrid_offset = offset
+        self.offgrid_count = offgrid_count
+        self.cells = [(cell % self.chunk_size, cell // self.chunk_size) for cell in range(self.chunk_size * self.chunk_size)] # Position of every cell in its chunk
+
+    # Get the offgrid tiles
+    def offgrid(self):
+        end = self.offgrid_offset + OFFGRID_ENTRY.size * self.offgrid_count
+        return [{'type': self.types[type_id], 'variant': variant, 'pos': [x, y]} for type_id, variant, x, y in OFFGRID_ENTRY.iter_unpack(self.data[self.offgrid_offset:end])]
+
+    # Get the tiles of a chunk as a list of ((x, y), tile) (Empty when the chunk has no tiles)
+    def chunk_tiles(self, chunk):
+        if chunk not in self.chunks:
+            return []
+        size = self.chunk_size
+        cells = size * size
+        offset = self.chunks[chunk]
+        names = self.types
+        left = chunk[0] * size
+        top = chunk[1] * size
+        return [
+            ((left + dx, top + dy), {'type': names[type_id - 1], 'variant': variant, 'pos': [left + dx, top + dy]})
+            for type_id, variant, (dx, dy) in zip(self.data[offset:offset + cells], self.data[offset + cells:offset + cells * 2], self.cells)
+            if type_id
+        ]
+
+    # Get every tile of the map as a list of ((x, y), tile)
+    def all_tiles(self):
+        tiles = []
+        for chunk in self.chunks:
+            tiles += self.chunk_tiles(chunk)
+        return tiles
+
+    def close(self):
+        self.data.close()
+
+# Convert JSON map files to the binary format (The new file has the same name with a .map extension)
+def convert(path):
+    f = open(path, 'r')
+    map_data = json.load(f)
+    f.close()
+    grid = {}
+    for loc, tile in map_data['tilemap'].items():
+        x, y = loc.split(';')
+        grid[(int(x), int(y))] = tile
+    out_path = path.rsplit('.', 1)[0] + '.map'
+    write_map(out_path, map_data['tile_size'], grid, map_data['offgrid'])
+    return out_path
+
+if __name__ == '__main__':
+    for path in sys.argv[1:] or ['maps/0.json', 'maps/1.json', 'maps/2.json']:
+        print(path, '->', convert(path))
@@ -0,0 +1,58 @@
+import random
+
+# Seeded generators of maps for the tests and benchmarks
+
+# Random blobs of grass, stone and decor tiles with random variants
+def random_tiles(rng, tiles, width):
+    grid = {}
+    while len(grid) < tiles:
+        x = rng.randrange(width)
+        y = rng.randrange(width)
+        tile_type = rng.choice(['grass', 'grass', 'stone', 'decor'])
+        for px in range(x, x + rng.randint(1, 6)):
+            for py in range(y, y + rng.randint(1, 4)):
+                grid[(px, py)] = {'type': tile_type, 'variant': rng.randrange(4 if tile_type == 'decor' else 9), 'pos': [px, py]}
+    return grid
+
+# Seeded generator for a large map with rolling ground, floating platforms and trees (Returns the tilemap)
+def generate_map(tilemap, tiles, seed=0):
+    rng = random.Random(seed)
+    tilemap.tilemap = {}
+    tilemap.offgrid_tiles = []
+    size = tilemap.tile_size
+    x = 0
+    ground = 20
+    count = 0
+    while count < tiles:
+        ground = max(10, min(40, ground + rng.choice((-1, 0, 0, 0, 1))))
+        tile_type = 'stone' if (x // 64) % 3 == 2 else 'grass'
+        for y in range(ground, ground + 6):
+            tilemap.store_tile((x, y), {'type': tile_type, 'variant': 0, 'pos': [x, y]})
+            count += 1
+
+        # Floating platform above the ground
+        if rng.random() < 0.04:
+            height = ground - rng.randint(4, 7)
+            for px in range(x, x + rng.randint(3, 8)):
+                tilemap.store_tile((px, height), {'type': tile_type, 'variant': 0, 'pos': [px, height]})
+                count += 1
+
+        # Trees and small decor standing on the ground
+        if rng.random() < 0.03:
+            tilemap.offgrid_tiles.append({'type': 'large_decor', 'variant': 2, 'pos': [x * size, ground * size - 44]})
+        elif rng.random() < 0.1:
+            tilemap.offgrid_tiles.append({'type': 'decor', 'variant': rng.randint(0, 3), 'pos': [x * size + rng.random() * size, ground * size - 7]})
+        x += 1
+
+    tilemap.offgrid_tiles.append({'type': 'spawners', 'variant': 0, 'pos': [2 * size, 0]})
+    tilemap.autotile()
+    return tilemap
+
+# Top of the ground in every column of the map (In pixels)
+def ground_heights(tilemap):
+    heights = {}
+    for loc in tilemap.solid_rects:
+        if loc[0] not in heights or loc[1] < heights[loc[0]]:
+            heights[loc[0]] = loc[1]
+    size = tilemap.tile_size
+    return [(x * size, heights[x] * size) for x in sorted(heights)]
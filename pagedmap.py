@@ -0,0 +1,232 @@
+import os
+import queue
+import threading
+import pygame
+from collections import OrderedDict
+from map import Tilemap, CHUNK_SIZE
+from mapfile import MapFile, convert
+
+PREFETCH_FRAMES = 30 # Chunks are prefetched where the camera will be in this many frames if it keeps moving the same way
+
+# Tilemap that only keeps the chunks around the camera and the active entities in memory
+# The chunks are read from a binary map file (See mapfile.py), the ones ahead of the camera are decoded on a background thread
+# and the least recently used ones are dropped once more than max_chunks are loaded (A chunk holds up to 256 tiles, roughly 100 KB)
+# tiles_around, solid_check, physics_rects_around and render load the chunks they need right away when they aren't loaded yet,
+# so they give the same answers as a fully loaded Tilemap. Code reading grid or solid_rects directly only sees the loaded chunks.
+# Chunks with edits (set_tile/remove_tile) are never dropped
+class PagedTilemap(Tilemap):
+    def __init__(self, game, tile_size=16, max_chunks=256):
+        super().__init__(game, tile_size)
+        self.max_chunks = max_chunks
+        self.map_file = None
+        self.worker = None
+        self.reset_pages()
+
+    def reset_pages(self):
+        self.pages = OrderedDict() # Loaded chunks (Least recently used first) -> positions of their tiles
+        self.pinned = set() # Chunks with edits
+        self.removed = set() # Positions of the tiles taken out by extract()
+        self.pending = set() # Chunks waiting to be decoded by the background thread
+        self.requests = queue.Queue()
+        self.decoded = queue.Queue()
+        self.faults = 0 # Chunks loaded on the main thread because they were needed before the prefetch got to them
+        self.last_view = None
+
+    # Load a map (A JSON map is converted to a .map file next to it first, or loaded whole when that file can't be written)
+    def load(self, path):
+        self.close()
+        if path.endswith('.json'):
+            map_path = path[:-5] + '.map'
+            try:
+                if not os.path.exists(map_path) or os.path.getmtime(map_path) < os.path.getmtime(path):
+                    convert(path)
+            except OSError:
+                self.reset_pages()
+                super().load(path)
+                return
+            path = map_path
+
+        self.map_file = MapFile(path)
+        self.tile_size = self.map_file.tile_size
+        self.page_size = self.map_file.chunk_size
+        self.clear_grid()
+        self.offgrid_tiles = self.map_file.offgrid() # Offgrid decor is sparse, so it is always loaded
+        self.reset_pages()
+        self.invalidate()
+        self.worker = threading.Thread(target=self.prefetch, args=(self.map_file, self.requests, self.decoded), daemon=True)
+        self.worker.start()
+
+    # Stop the background thread and close the map file
+    def close(self):
+        if self.worker:
+            self.requests.put(None)
+            self.worker.join()
+            self.worker = None
+        if self.map_file:
+            self.map_file.close()
+            self.map_file = None
+
+    # Background thread that decodes the requested chunks (None stops it)
+    def prefetch(self, map_file, requests, decoded):
+        while True:
+            chunk = requests.get()
+            if chunk is None:
+                return
+            decoded.put((chunk, map_file.chunk_tiles(chunk)))
+
+    # Put the decoded tiles of a chunk in the grid
+    def add_page(self, chunk, tiles):
+        if chunk in self.pages:
+            return
+        locs = set()
+        for loc, tile in tiles:
+            if loc not in self.removed:
+                self.store_tile(loc, tile)
+                locs.add(loc)
+        self.pages[chunk] = locs
+
+    # Load a chunk right away
+    def load_page(self, chunk):
+        if chunk in self.map_file.chunks:
+            self.faults += 1
+        self.add_page(chunk, self.map_file.chunk_tiles(chunk))
+
+    # Take the tiles of a chunk out of the grid
+    def drop_page(self, chunk):
+        for loc in self.pages.pop(chunk):
+            if loc in self.grid:
+                self.unstore_tile(loc)
+        page_px = self.page_size * self.tile_size
+        self.invalidate_rect(pygame.Rect(chunk[0] * page_px, chunk[1] * page_px, page_px, page_px))
+
+    # Make sure the chunks covering a range of tile positions are loaded
+    def require(self, x0, y0, x1, y1):
+        if not self.map_file:
+            return
+        size = self.page_size
+        if (x0 // size, y0 // size) == (x1 // size, y1 // size) and (x0 // size, y0 // size) in self.pages:
+            return # The whole range is in one loaded chunk (The usual case)
+        for cx in range(x0 // size, x1 // size + 1):
+            for cy in range(y0 // size, y1 // size + 1):
+                if (cx, cy) not in self.pages:
+                    self.load_page((cx, cy))
+
+    # Chunks that cover a pixel rectangle
+    def chunks_in(self, rect):
+        page_px = self.page_size * self.tile_size
+        return [(cx, cy) for cx in range(rect.left // page_px, (rect.right - 1) // page_px + 1) for cy in range(rect.top // page_px, (rect.bottom - 1) // page_px + 1)]
+
+    # Called once per frame: load the chunks around the camera view (A pixel rectangle) and the entity positions in points,
+    # ask the background thread for the chunks ahead of the camera and drop the least recently used chunks over the cap
+    def stream(self, view, points=()):
+        if not self.map_file:
+            return
+        while True:
+            try:
+                chunk, tiles = self.decoded.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.discard(chunk)
+            self.add_page(chunk, tiles)
+
+        # The view and one chunk around it (Rendering a chunk also needs the chunks above and left of it)
+        page_px = self.page_size * self.tile_size
+        needed = set(self.chunks_in(view.inflate(page_px * 2, page_px * 2)))
+        for cx, cy in {(int(x // page_px), int(y // page_px)) for x, y in points}:
+            needed.update([(cx - 1, cy - 1), (cx, cy - 1), (cx + 1, cy - 1), (cx - 1, cy), (cx, cy), (cx + 1, cy), (cx - 1, cy + 1), (cx, cy + 1), (cx + 1, cy + 1)])
+        for chunk in needed:
+            if chunk in self.pages:
+                self.pages.move_to_end(chunk)
+            else:
+                self.load_page(chunk)
+
+        # Prefetch where the camera is heading
+        if self.last_view:
+            shift = [view.centerx - self.last_view[0], view.centery - self.last_view[1]]
+            for i in range(2):
+                if shift[i]:
+                    shift[i] = max(abs(shift[i]) * PREFETCH_FRAMES, page_px) * (1 if shift[i] > 0 else -1)
+            if shift != [0, 0]:
+                for chunk in self.chunks_in(view.move(shift).inflate(page_px * 2, page_px * 2)):
+                    if chunk not in self.pages and chunk not in self.pending:
+                        self.pending.add(chunk)
+                        self.requests.put(chunk)
+        self.last_view = view.center
+
+        if len(self.pages) > self.max_chunks:
+            for chunk in list(self.pages):
+                if len(self.pages) <= self.max_chunks:
+                    break
+                if chunk not in needed and chunk not in self.pinned:
+                    self.drop_page(chunk)
+
+    def tiles_around(self, pos):
+        x = int(pos[0] // self.tile_size)
+        y = int(pos[1] // self.tile_size)
+        self.require(x - 1, y - 1, x + 1, y + 1)
+        return super().tiles_around(pos)
+
+    def solid_check(self, pos):
+        x = int(pos[0] // self.tile_size)
+        y = int(pos[1] // self.tile_size)
+        self.require(x, y, x, y)
+        return super().solid_check(pos)
+
+    def physics_rects_around(self, pos):
+        x = int(pos[0] // self.tile_size)
+        y = int(pos[1] // self.tile_size)
+        self.require(x - 1, y - 1, x + 1, y + 1)
+        return super().physics_rects_around(pos)
+
+    def render_chunk(self, chunk):
+        self.require((chunk[0] - 1) * CHUNK_SIZE, (chunk[1] - 1) * CHUNK_SIZE, (chunk[0] + 1) * CHUNK_SIZE - 1, (chunk[1] + 1) * CHUNK_SIZE - 1)
+        return super().render_chunk(chunk)
+
+    def set_tile(self, loc, tile):
+        self.edit_page(loc)
+        super().set_tile(loc, tile)
+        if self.map_file:
+            self.pages[(loc[0] // self.page_size, loc[1] // self.page_size)].add(loc)
+
+    def remove_tile(self, tile_pos):
+        loc = (int(tile_pos[0]), int(tile_pos[1]))
+        self.edit_page(loc)
+        super().remove_tile(tile_pos)
+
+    # Load and pin the chunk of a tile that is about to be edited
+    def edit_page(self, loc):
+        if self.map_file:
+            self.require(loc[0], loc[1], loc[0], loc[1])
+            self.pinned.add((loc[0] // self.page_size, loc[1] // self.page_size))
+
+    # Same as Tilemap.extract() but it also finds the tiles of the chunks that aren't loaded (They are read from the map file)
+    def extract(self, id_pairs, keep=False):
+        if not self.map_file:
+            return super().extract(id_pairs, keep)
+        matches = self.extract_offgrid(id_pairs, keep)
+
+        for chunk in sorted(set(self.map_file.chunks) | set(self.pages)):
+            if chunk in self.pages:
+                tiles = [(loc, self.grid[loc]) for loc in sorted(self.pages[chunk], key=lambda loc: (loc[1], loc[0])) if loc in self.grid] # Row by row like the map file
+            else:
+                tiles = [(loc, tile) for loc, tile in self.map_file.chunk_tiles(chunk) if loc not in self.removed]
+            for loc, tile in tiles:
+                if (tile['type'], tile['variant']) in id_pairs:
+                    matches.append(dict(tile, pos=[loc[0] * self.tile_size, loc[1] * self.tile_size]))
+                    if not keep:
+                        self.removed.add(loc)
+                        if loc in self.grid:
+                            self.unstore_tile(loc)
+
+        if matches and not keep:
+            self.invalidate()
+        return matches
+
+    # Load every chunk before saving, so the whole map is written
+    def save(self, path):
+        if self.map_file:
+            for chunk in self.map_file.chunks:
+                if chunk not in self.pages:
+                    self.load_page(chunk)
+                self.pinned.add(chunk)
+        super().save(path)
@@ -1,28 +1,92 @@
-import pygame
+import math
 
-# Class to represent a particle
-class Particle:
-    def __init__(self, game, p_type, pos, velocity=[0, 0], frame=0):
+# Class to hold every particle of the game (Stored as parallel lists, one entry per particle, so they update in bulk)
+class Particles:
+    def __init__(self, game):
         self.game = game
-        self.type = p_type
-        self.pos = list(pos)
-        self.velocity = list(velocity)
-        self.animation = self.game.assets['particle/' + p_type].copy()
-        self.animation.frame = frame
+        self.kinds = ['leaf', 'particle'] # Particle types, a particle stores the index of its type
+        self.images = [] # Animation frames of each type, with half of their size to center them
+        self.img_duration = [] # How many updates each frame is shown for
+        self.last_frame = [] # Frame counter value of the last frame of the animation (The counter goes one past it on the update the particle is drawn for the last time)
+        for p_type in self.kinds:
+            animation = self.game.assets['particle/' + p_type]
+            self.images.append([(img, img.get_width() // 2, img.get_height() // 2) for img in animation.images])
+            self.img_duration.append(animation.img_duration)
+            self.last_frame.append(animation.img_duration * len(animation.images) - 1)
+        self.reach = max(max(img.get_size()) for images in self.images for img, half_w, half_h in images) # Farthest a particle's image reaches from its position
+        self.clear()
 
-    #Updates the particle's position and animation
+    # Remove every particle
+    def clear(self):
+        self.type = []
+        self.x = []
+        self.y = []
+        self.vx = []
+        self.vy = []
+        self.frame = []
+        self.sway = [] # Sideways move of the leaves that's added on the next update (They sway after they're drawn)
+
+    def __len__(self):
+        return len(self.type)
+
+    # Spawn one particle (A frame past the end of the animation starts on the frame before the last one, the old animations ended the same way from there)
+    def emit(self, p_type, pos, velocity=(0, 0), frame=0):
+        self.type.append(self.kinds.index(p_type))
+        self.x.append(pos[0])
+        self.y.append(pos[1])
+        self.vx.append(velocity[0])
+        self.vy.append(velocity[1])
+        self.frame.append(min(frame, self.last_frame[self.type[-1]] - 1))
+        self.sway.append(0)
+
+    # Spawn many particles of one type at the same position (One velocity and frame per particle)
+    def emit_burst(self, p_type, pos, velocities, frames):
+        count = len(velocities)
+        p_type = self.kinds.index(p_type)
+        self.type += [p_type] * count
+        self.x += [pos[0]] * count
+        self.y += [pos[1]] * count
+        self.vx += [velocity[0] for velocity in velocities]
+        self.vy += [velocity[1] for velocity in velocities]
+        last = self.last_frame[p_type] - 1
+        self.frame += [min(frame, last) for frame in frames]
+        self.sway += [0] * count
+
+    # Updates every particle's position and animation, and removes the ones whose animation was already done on the last update
+    # (Like the old Particle objects, a particle is still drawn once more after its animation is done)
     def update(self):
-        kill = False
-        if self.animation.done:
-            kill = True
-        
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
-        
-        self.animation.update()
-        return kill
-    
-    #Render the particle on the surface
+        last_frame = self.last_frame
+        alive = [frame <= last_frame[p_type] for p_type, frame in zip(self.type, self.frame)]
+        if not all(alive):
+            self.type = [v for v, keep in zip(self.type, alive) if keep]
+            self.x = [v for v, keep in zip(self.x, alive) if keep]
+            self.y = [v for v, keep in zip(self.y, alive) if keep]
+            self.vx = [v for v, keep in zip(self.vx, alive) if keep]
+            self.vy = [v for v, keep in zip(self.vy, alive) if keep]
+            self.frame = [v for v, keep in zip(self.frame, alive) if keep]
+            self.sway = [v for v, keep in zip(self.sway, alive) if keep]
+
+        leaf = self.kinds.index('leaf')
+        sin = math.sin
+        self.x = [x + vx + sway for x, vx, sway in zip(self.x, self.vx, self.sway)]
+        self.y = [y + vy for y, vy in zip(self.y, self.vy)]
+        self.frame = [frame + 1 for frame in self.frame]
+        # Leaves sway from side to side while they fall, the sway of this update shows on the next one
+        self.sway = [sin(min(frame, last_frame[p_type]) * 0.035) * 0.3 if p_type == leaf else 0 for p_type, frame in zip(self.type, self.frame)]
+
+    #Render every particle on the surface with a single blits call (Particles outside of the surface are skipped)
     def render(self, surf, offset=(0, 0)):
-        img = self.animation.img()
-        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2, self.pos[1] - offset[1] - img.get_height() // 2))
\ No newline at end of file
+        images = self.images
+        img_duration = self.img_duration
+        last_frame = self.last_frame
+        left = offset[0] - self.reach
+        top = offset[1] - self.reach
+        right = offset[0] + surf.get_width() + self.reach
+        bottom = offset[1] + surf.get_height() + self.reach
+        batch = []
+        for p_type, x, y, frame in zip(self.type, self.x, self.y, self.frame):
+            if not (left < x < right and top < y < bottom):
+                continue
+            img, half_w, half_h = images[p_type][int(min(frame, last_frame[p_type]) / img_duration[p_type])]
+            batch.append((img, (x - offset[0] - half_w, y - offset[1] - half_h)))
+        surf.blits(batch, doreturn=False)
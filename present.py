@@ -0,0 +1,89 @@
+import pygame
+try:
+    from pygame._sdl2.video import Window, Renderer, Texture
+except ImportError:
+    Window = None # pygame._sdl2 is experimental, builds of pygame without it can still use the other presenters
+
+WINDOW_SIZE = (960, 720)
+DIRTY_BAND = 16 # Rows of the display compared at a time by DirtyPresenter (24 rows on the window, so a band scales to whole pixels)
+
+# Presenters open the window and show the game's display on it, scaled up to the window's size
+# Game and Editor pick one by name with their present option: 'scale', 'sdl2' or 'dirty' (See PRESENTERS)
+
+# Scales the display in software every frame and updates the whole window (The game's usual way)
+class ScalePresenter:
+    def __init__(self, title, size=WINDOW_SIZE):
+        pygame.display.set_caption(title) # Rename the window title
+        self.screen = pygame.display.set_mode(size) # Create the window for the game
+
+    def present(self, display):
+        pygame.transform.scale(display, self.screen.get_size(), self.screen) # Scale straight onto the window, no new surface every frame
+        pygame.display.update()
+
+    # Show the whole display again on the next present() (The window was covered or restored)
+    def refresh(self):
+        pass
+
+# Lets SDL's renderer scale the display: every frame the display is copied to a texture that the renderer draws the size of the window
+# It uses the graphics card when SDL has a driver for it, the software renderer otherwise
+# There's no pygame display surface with it (See utils.display_format)
+class RendererPresenter:
+    def __init__(self, title, size=WINDOW_SIZE):
+        if not Window:
+            raise RuntimeError('The sdl2 presenter needs pygame._sdl2, use the scale or dirty presenter')
+        self.window = Window(title, size)
+        self.renderer = Renderer(self.window)
+        self.texture = None
+
+    def present(self, display):
+        if not self.texture or self.texture.width != display.get_width() or self.texture.height != display.get_height():
+            self.texture = Texture(self.renderer, display.get_size(), streaming=True)
+        self.texture.update(display)
+        self.texture.draw() # Stretched over the whole window
+        self.renderer.present()
+
+    def refresh(self):
+        pass
+
+# Only scales and updates the parts of the window that changed since the last frame, for screens that stay the same (Like the win screen,
+# or the editor when nothing moves). The display is compared with the last frame in bands of DIRTY_BAND rows.
+# When the whole display changes it costs a little more than ScalePresenter (The comparison)
+class DirtyPresenter(ScalePresenter):
+    def __init__(self, title, size=WINDOW_SIZE):
+        super().__init__(title, size)
+        self.bands = None # Pixels of every band of the last frame (None to show everything on the next frame)
+
+    def present(self, display):
+        width, height = display.get_size()
+        band_size = display.get_pitch() * DIRTY_BAND
+        pixels = display.get_buffer().raw
+        bands = [pixels[i:i + band_size] for i in range(0, len(pixels), band_size)]
+        last = self.bands
+        self.bands = bands
+        if last and len(last) == len(bands):
+            changed = [i for i in range(len(bands)) if bands[i] != last[i]]
+        else:
+            changed = list(range(len(bands)))
+        if not changed:
+            return
+
+        # Consecutive bands are scaled and updated as one rectangle
+        scale_y = self.screen.get_height() / height
+        rects = []
+        start = changed[0]
+        for i, band in enumerate(changed):
+            if i + 1 < len(changed) and changed[i + 1] == band + 1:
+                continue
+            top = start * DIRTY_BAND
+            bottom = min(height, (band + 1) * DIRTY_BAND)
+            rect = pygame.Rect(0, int(top * scale_y), self.screen.get_width(), int(bottom * scale_y) - int(top * scale_y))
+            pygame.transform.scale(display.subsurface((0, top, width, bottom - top)), rect.size, self.screen.subsurface(rect))
+            rects.append(rect)
+            if i + 1 < len(changed):
+                start = changed[i + 1]
+        pygame.display.update(rects)
+
+    def refresh(self):
+        self.bands = None
+
+PRESENTERS = {'scale': ScalePresenter, 'sdl2': RendererPresenter, 'dirty': DirtyPresenter}
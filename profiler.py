@@ -0,0 +1,150 @@
+import gc
+import json
+import time
+import pygame
+from collections import deque
+
+# Phases of a frame, in the order the game runs them (Some phases run in both the update and the render, their times are added up)
+PHASES = ['events', 'background', 'clouds', 'tilemap', 'enemies', 'player', 'projectiles', 'sparks', 'particles', 'hud', 'present', 'profiler']
+COUNTS = ['blits', 'enemies', 'projectiles', 'particles', 'sparks', 'gc']
+GRAPH_FRAMES = 160 # Frames shown by the overlay graph (One pixel column each)
+GRAPH_SCALE = 4 # Pixels per millisecond in the overlay graph
+PHASE_COLORS = {
+    'events': (120, 120, 120), 'background': (70, 90, 160), 'clouds': (150, 190, 240), 'tilemap': (60, 160, 80),
+    'enemies': (220, 60, 60), 'player': (240, 200, 60), 'projectiles': (80, 200, 220), 'sparks': (255, 255, 255),
+    'particles': (200, 120, 220), 'hud': (240, 140, 60), 'present': (40, 60, 90), 'profiler': (90, 90, 90),
+}
+
+# Display surface that counts the blits drawn on it (The game draws on one of these instead of a plain Surface while profiling)
+class CountingSurface(pygame.Surface):
+    def __init__(self, size):
+        super().__init__(size)
+        self.blit_count = 0
+
+    def blit(self, *args, **kwargs):
+        self.blit_count += 1
+        return super().blit(*args, **kwargs)
+
+    def blits(self, blit_sequence, *args, **kwargs):
+        blit_sequence = list(blit_sequence)
+        self.blit_count += len(blit_sequence)
+        return super().blits(blit_sequence, *args, **kwargs)
+
+# Profiler that doesn't record anything (The game uses it while profiling is off, so the marks cost almost nothing)
+class NullProfiler:
+    overlay = False
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end_frame(self, game):
+        pass
+
+    def render(self, surf):
+        pass
+
+    def close(self):
+        pass
+
+# Class to time the phases of every frame, count what was drawn and alive, and show it as a graph or write it to a file
+# game code calls mark(phase) when a phase ends: the time since the last mark is added to that phase
+# Records are written to path as CSV, or as JSON Lines when path ends with .jsonl
+class FrameProfiler:
+    def __init__(self, path=None, overlay=False):
+        self.path = path
+        self.overlay = overlay # Show the graph on the screen
+        self.history = deque(maxlen=GRAPH_FRAMES) # Records of the last frames, for the graph
+        self.frame = 0
+        self.font = None
+        self.panel = None # Dark background of the graph
+        self.file = None
+        if path:
+            self.file = open(path, 'w')
+            self.jsonl = path.endswith('.jsonl')
+            if not self.jsonl:
+                self.file.write(','.join(['frame', 'frame_ms'] + [phase + '_ms' for phase in PHASES] + COUNTS) + '\n')
+        self.gc_collections = self.count_collections()
+        self.begin_frame()
+
+    def count_collections(self):
+        return sum(stats['collections'] for stats in gc.get_stats())
+
+    def begin_frame(self):
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.start = self.last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.times[phase] += now - self.last
+        self.last = now
+
+    # Finish the record of the frame and start timing the next one
+    def end_frame(self, game):
+        record = {'frame': self.frame, 'frame_ms': (self.last - self.start) * 1000}
+        for phase in PHASES:
+            record[phase + '_ms'] = self.times[phase] * 1000
+        loaded = not game.loading
+        record['blits'] = getattr(game.display, 'blit_count', 0)
+        record['enemies'] = len(game.enemies) if loaded else 0
+        record['projectiles'] = len(game.projectiles) if loaded else 0
+        record['particles'] = len(game.particles) if loaded else 0
+        record['sparks'] = len(game.sparks) if loaded else 0
+        collections = self.count_collections()
+        record['gc'] = collections - self.gc_collections
+        self.gc_collections = collections
+        if isinstance(game.display, CountingSurface):
+            game.display.blit_count = 0
+        self.history.append(record)
+        self.frame += 1
+        if self.file:
+            if self.jsonl:
+                self.file.write(json.dumps(record) + '\n')
+            else:
+                self.file.write(','.join(str(round(value, 4)) for value in record.values()) + '\n')
+        self.begin_frame()
+
+    # Draw the graph of the last frames in the bottom right corner: one column per frame, stacked by phase
+    def render(self, surf):
+        if not self.overlay or not self.history:
+            return
+        if not self.font:
+            self.font = pygame.font.SysFont(None, 16)
+        height = 120
+        left = surf.get_width() - GRAPH_FRAMES - 8
+        bottom = surf.get_height() - 8
+        if not self.panel:
+            self.panel = pygame.Surface((GRAPH_FRAMES, height))
+            self.panel.set_alpha(200)
+        surf.blit(self.panel, (left, bottom - height))
+        for y_ms in (1000 / 60, 1000 / 30): # Lines at the time of a frame at 60 and 30 fps
+            y = bottom - y_ms * GRAPH_SCALE
+            if y > bottom - height:
+                pygame.draw.line(surf, (255, 80, 80), (left, y), (left + GRAPH_FRAMES - 1, y))
+        for x, record in enumerate(self.history):
+            y = bottom
+            for phase in PHASES:
+                size = record[phase + '_ms'] * GRAPH_SCALE
+                if size >= 0.5:
+                    top = max(bottom - height, y - size)
+                    pygame.draw.line(surf, PHASE_COLORS[phase], (left + x, y), (left + x, top))
+                    y = top
+        record = self.history[-1]
+        slowest = max(PHASES, key=lambda phase: record[phase + '_ms'])
+        lines = [
+            f'{record["frame_ms"]:.2f} ms   slowest {slowest} {record[slowest + "_ms"]:.2f} ms',
+            f'blits {record["blits"]}  enemies {record["enemies"]}  projectiles {record["projectiles"]}',
+            f'particles {record["particles"]}  sparks {record["sparks"]}  gc {record["gc"]}',
+        ]
+        for i, line in enumerate(lines):
+            text = self.font.render(line, True, (255, 255, 255))
+            surf.blit(text, (surf.get_width() - text.get_width() - 8, bottom - height - 14 * (len(lines) - i))) # Right aligned, the lines are wider than the graph
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,96 @@
+# Class to hold the projectiles shot by the enemies
+# The pool has a fixed number of slots, each field is a list indexed by slot and the slots of removed projectiles get reused
+class ProjectilePool:
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.x = [0.0] * capacity
+        self.y = [0.0] * capacity
+        self.dx = [0.0] * capacity # Horizontal speed (Projectiles fly straight)
+        self.age = [0] * capacity
+        self.free = list(range(capacity - 1, -1, -1)) # Slots that aren't used
+        self.live = [] # Slots in use, oldest projectile first
+        # Slots of the projectiles that hit something or got too old on the last update: they are drawn once more, like the old loop
+        # drew a projectile before checking it, and their slots are freed on the next update
+        self.spent = []
+        self.shown = [] # Slots render() draws, in the order they were shot
+
+    def __len__(self):
+        return len(self.live)
+
+    # Remove every projectile
+    def clear(self):
+        self.free = list(range(self.capacity - 1, -1, -1))
+        self.live = []
+        self.spent = []
+        self.shown = []
+
+    # Shoot a projectile from a position (When the pool is full the oldest projectile makes room for it)
+    def spawn(self, pos, dx, age=0):
+        if not self.free:
+            self.release()
+        if not self.free:
+            self.free.append(self.live.pop(0))
+        slot = self.free.pop()
+        self.x[slot] = pos[0]
+        self.y[slot] = pos[1]
+        self.dx[slot] = dx
+        self.age[slot] = age
+        self.live.append(slot)
+        return slot
+
+    # Free the slots of the projectiles that were drawn for the last time
+    def release(self):
+        self.free += self.spent
+        self.spent = []
+
+    # Move every projectile, then check all of them against the solid tiles and the player in one pass
+    # Returns the projectiles that hit something, as (x, y, dx, hit_player) in the order they were shot
+    def update(self, tilemap, player_rect, can_hit_player=True):
+        self.release()
+        self.shown = self.live
+        x = self.x
+        y = self.y
+        dx = self.dx
+        age = self.age
+        solid = tilemap.solid_rects
+        size = tilemap.tile_size
+        left, top, right, bottom = player_rect.left, player_rect.top, player_rect.right, player_rect.bottom
+        hits = []
+        keep = []
+        for slot in self.live:
+            x[slot] += dx[slot]
+            age[slot] += 1
+            if (int(x[slot] // size), int(y[slot] // size)) in solid:
+                hits.append((x[slot], y[slot], dx[slot], False))
+            elif age[slot] > 360:
+                pass # Old projectiles disappear without hitting anything
+            elif can_hit_player and left <= int(x[slot]) < right and top <= int(y[slot]) < bottom:
+                hits.append((x[slot], y[slot], dx[slot], True))
+            else:
+                keep.append(slot)
+                continue
+            self.spent.append(slot)
+        self.live = keep
+        return hits
+
+    # Add every projectile to a SpatialGrid as its slot number (See broadphase.py)
+    def register(self, grid):
+        x = self.x
+        y = self.y
+        for slot in self.live:
+            grid.insert_point(slot, x[slot], y[slot])
+
+    # Render every projectile of the last update with a single blits call, the ones it removed too (Projectiles outside of the surface are skipped)
+    # alpha is how far along its last step each projectile is drawn (They fly straight, so the step is dx back from where they are)
+    def render(self, surf, img, offset=(0, 0), alpha=1):
+        x = self.x
+        y = self.y
+        dx = self.dx
+        back = 1 - alpha
+        half_w = img.get_width() / 2
+        half_h = img.get_height() / 2
+        left = offset[0] - half_w
+        top = offset[1] - half_h
+        right = offset[0] + surf.get_width() + half_w
+        bottom = offset[1] + surf.get_height() + half_h
+        surf.blits([(img, (x[slot] - dx[slot] * back - half_w - offset[0], y[slot] - half_h - offset[1])) for slot in self.shown if left < x[slot] < right and top < y[slot] < bottom], doreturn=False)
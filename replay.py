@@ -0,0 +1,114 @@
+import argparse
+import struct
+import zlib
+
+# Binary replay format (Little endian):
+#   header     magic, version, seed, start level, checksum interval, number of steps, number of input runs, number of checksums
+#   inputs     (inputs byte, number of steps) runs, the inputs byte has a bit for each of left, right, jump and dash
+#   checksums  the state checksum at every checksum interval steps (Taken before the step runs)
+MAGIC = b'SDRP'
+VERSION = 1
+HEADER = struct.Struct('<4sHIHHIII')
+INPUT_RUN = struct.Struct('<BH')
+CHECKSUM = struct.Struct('<I')
+INPUT_BITS = (('left', 1), ('right', 2), ('jump', 4), ('dash', 8))
+CHECKSUM_INTERVAL = 60 # Steps between two state checksums (One a second)
+SEEDS = 2 ** 32 # Seeds go from 0 to SEEDS - 1, so they fit in the 4 bytes of the header
+
+# Pack the inputs of a step into one byte
+def pack_inputs(inputs):
+    value = 0
+    for name, bit in INPUT_BITS:
+        if inputs[name]:
+            value |= bit
+    return value
+
+def unpack_inputs(value):
+    return {name: bool(value & bit) for name, bit in INPUT_BITS}
+
+# Seed given on the command line (Checked when the arguments are read, so a run isn't recorded with a seed that can't be saved)
+def seed_arg(value):
+    seed = int(value)
+    if not 0 <= seed < SEEDS:
+        raise argparse.ArgumentTypeError(f'the seed has to be from 0 to {SEEDS - 1}, got {seed}')
+    return seed
+
+# Checksum of everything that decides how the game plays out: the level, the player, the enemies, the projectiles and the enemies' random stream
+# (Particles, sparks, leaves and clouds only change how it looks, so they aren't part of it)
+def state_checksum(game):
+    player = game.player
+    data = [struct.pack('<HHhddddhhh', game.level, game.dead, game.transition, player.pos[0], player.pos[1], player.velocity[0], player.velocity[1], player.dashing, player.jumps, player.air_time)]
+    for enemy in game.enemies:
+        data.append(struct.pack('<ddd?h', enemy.pos[0], enemy.pos[1], enemy.velocity[1], enemy.flip, enemy.walking))
+    for slot in game.projectiles.live:
+        data.append(struct.pack('<dddh', game.projectiles.x[slot], game.projectiles.y[slot], game.projectiles.dx[slot], game.projectiles.age[slot]))
+    data.append(repr(game.ai_rng.getstate()).encode())
+    return zlib.crc32(b''.join(data))
+
+# Class to record the inputs of a run, or to play them back
+# The game calls step() once per simulation step with the inputs it got from the player, and uses the inputs it returns
+class Replay:
+    def __init__(self, seed, level=0, interval=CHECKSUM_INTERVAL, inputs=None, checksums=None):
+        if not 0 <= seed < SEEDS:
+            raise ValueError(f'The seed of a replay has to be from 0 to {SEEDS - 1}, got {seed}')
+        self.seed = seed
+        self.level = level # Level the run starts on
+        self.interval = interval
+        self.playing = inputs is not None # Playing back a recorded run (Otherwise a new run is recorded)
+        self.inputs = inputs if inputs is not None else [] # Inputs byte of every step
+        self.checksums = checksums if checksums is not None else []
+        self.steps = 0 # Steps recorded or played so far
+        self.diverged = None # First step where the playback's state didn't match the recording
+
+    # Check if every recorded step has been played back
+    def done(self):
+        return self.playing and self.steps >= len(self.inputs)
+
+    # Record a step's inputs, or replace them with the recorded ones when playing back
+    def step(self, game, inputs):
+        if self.steps % self.interval == 0:
+            checksum = state_checksum(game)
+            if not self.playing:
+                self.checksums.append(checksum)
+            elif self.diverged is None and self.steps // self.interval < len(self.checksums) and self.checksums[self.steps // self.interval] != checksum:
+                self.diverged = self.steps
+        if self.playing:
+            inputs = unpack_inputs(self.inputs[self.steps]) if self.steps < len(self.inputs) else unpack_inputs(0)
+        else:
+            self.inputs.append(pack_inputs(inputs))
+        self.steps += 1
+        return inputs
+
+    # Write the replay to a file (The inputs are stored as runs of steps with the same inputs, held keys make long runs)
+    def save(self, path):
+        runs = []
+        for value in self.inputs:
+            if runs and runs[-1][0] == value and runs[-1][1] < 65535:
+                runs[-1][1] += 1
+            else:
+                runs.append([value, 1])
+        f = open(path, 'wb')
+        f.write(HEADER.pack(MAGIC, VERSION, self.seed, self.level, self.interval, len(self.inputs), len(runs), len(self.checksums)))
+        for value, count in runs:
+            f.write(INPUT_RUN.pack(value, count))
+        for checksum in self.checksums:
+            f.write(CHECKSUM.pack(checksum))
+        f.close()
+
+# Read a replay file to play it back
+def load_replay(path):
+    f = open(path, 'rb')
+    data = f.read()
+    f.close()
+    magic, version, seed, level, interval, steps, run_count, checksum_count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(path + ' is not a version ' + str(VERSION) + ' replay file')
+    offset = HEADER.size
+    inputs = []
+    for value, count in INPUT_RUN.iter_unpack(data[offset:offset + INPUT_RUN.size * run_count]):
+        inputs += [value] * count
+    offset += INPUT_RUN.size * run_count
+    checksums = [checksum for checksum, in CHECKSUM.iter_unpack(data[offset:offset + CHECKSUM.size * checksum_count])]
+    if len(inputs) != steps:
+        raise ValueError(path + ' is truncated')
+    return Replay(seed, level, interval, inputs, checksums)
@@ -1,32 +1,63 @@
 import math
 import pygame
 
-# Class to represent a single spark
-class Spark:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
+# Class to hold every spark of the game (Stored as parallel lists, the trig of each spark's angle is worked out once when it spawns)
+class SparkField:
+    def __init__(self):
+        self.clear()
 
-    # Method to update the spark's position and speed
+    # Remove every spark
+    def clear(self):
+        self.x = []
+        self.y = []
+        self.speed = []
+        # Cos and sin of the angle, then of the angle turned 90 degrees clockwise, 180 degrees and 90 degrees counterclockwise
+        self.trig = []
+
+    def __len__(self):
+        return len(self.speed)
+
+    # Spawn a spark moving in the direction of the angle
+    def emit(self, pos, angle, speed):
+        self.x.append(pos[0])
+        self.y.append(pos[1])
+        self.speed.append(speed)
+        self.trig.append((
+            math.cos(angle), math.sin(angle),
+            math.cos(angle + math.pi * 0.5), math.sin(angle + math.pi * 0.5),
+            math.cos(angle + math.pi), math.sin(angle + math.pi),
+            math.cos(angle - math.pi * 0.5), math.sin(angle - math.pi * 0.5),
+        ))
+
+    # Method to update every spark's position and speed, the sparks that stopped moving on the last update are removed
+    # (Like the old Spark objects, a spark is still drawn once after it stopped, as a dot)
     def update(self):
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
-        self.speed = max(0, self.speed - 0.1)
-        # Return True if the spark has stopped moving
-        return not self.speed
-    
-    # Method to render the spark on the surface
+        if not all(self.speed):
+            self.x = [v for v, speed in zip(self.x, self.speed) if speed]
+            self.y = [v for v, speed in zip(self.y, self.speed) if speed]
+            self.trig = [v for v, speed in zip(self.trig, self.speed) if speed]
+            self.speed = [speed for speed in self.speed if speed]
+        self.x = [x + trig[0] * speed for x, trig, speed in zip(self.x, self.trig, self.speed)]
+        self.y = [y + trig[1] * speed for y, trig, speed in zip(self.y, self.trig, self.speed)]
+        self.speed = [max(0, speed - 0.1) for speed in self.speed]
+
+    # Method to render the sparks on the surface (Sparks outside of the surface are skipped)
     def render(self, surf, offset=(0, 0)):
-        # Calculate the points of the polygon to render based on the spark's position, angle, and speed
-        render_points = [
-            # First point: in the direction of the angle, scaled by speed * 3
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            # Second point: 90 degrees clockwise from the angle, scaled by speed * 0.5
-            (self.pos[0] + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1]),
-            # Third point: opposite direction of the angle, scaled by speed * 3
-            (self.pos[0] + math.cos(self.angle + math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle + math.pi) * self.speed * 3 - offset[1]),
-            # Fourth point: 90 degrees counterclockwise from the angle, scaled by speed * 0.5
-            (self.pos[0] + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[1]),
+        left = offset[0] - 1
+        top = offset[1] - 1
+        right = offset[0] + surf.get_width() + 1
+        bottom = offset[1] + surf.get_height() + 1
+        # The points of each polygon: in the direction of the angle scaled by speed * 3, 90 degrees clockwise scaled by speed * 0.5,
+        # the opposite direction scaled by speed * 3 and 90 degrees counterclockwise scaled by speed * 0.5
+        polygons = [
+            [
+                (x + c * speed * 3 - offset[0], y + s * speed * 3 - offset[1]),
+                (x + c90 * speed * 0.5 - offset[0], y + s90 * speed * 0.5 - offset[1]),
+                (x + c180 * speed * 3 - offset[0], y + s180 * speed * 3 - offset[1]),
+                (x + c270 * speed * 0.5 - offset[0], y + s270 * speed * 0.5 - offset[1]),
+            ]
+            for x, y, speed, (c, s, c90, s90, c180, s180, c270, s270) in zip(self.x, self.y, self.speed, self.trig)
+            if left < x + speed * 3 and x - speed * 3 < right and top < y + speed * 3 and y - speed * 3 < bottom
         ]
-        pygame.draw.polygon(surf, (255, 255, 255), render_points)
\ No newline at end of file
+        for points in polygons:
+            pygame.draw.polygon(surf, (255, 255, 255), points)
@@ -0,0 +1,17 @@
+import os
+import sys
+
+# The tests run the game without a window or sound, from the repository's folder (The game loads its files by relative paths)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import pytest
+from finaleprojecto import Game
+
+# A game for the tests of a module, without a window (The tilemaps, entities and particles look up its images)
+@pytest.fixture(scope='module')
+def game():
+    return Game(headless=True)
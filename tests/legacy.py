@@ -0,0 +1,200 @@
+import math
+import pygame
+from map import PHYSICS_BLOCKS, NEIGHBOR_OFFSETS, AUTOTILE_MAP, AUTOTILES_TYPES
+
+# Copies of how the game did things before it was made faster: the tests check the new code still does the same,
+# and benchmark.py times them as the baseline
+
+# The old "x;y" string keyed queries
+def legacy_tiles_around(tilemap, tile_size, pos):
+    tiles = []
+    tile_loc = (int(pos[0] // tile_size), int(pos[1] // tile_size))
+    for offset in NEIGHBOR_OFFSETS:
+        check_loc = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
+        if check_loc in tilemap:
+            tiles.append(tilemap[check_loc])
+    return tiles
+
+def legacy_solid_check(tilemap, tile_size, pos):
+    tile_loc = str(int(pos[0] // tile_size)) + ';' + str(int(pos[1] // tile_size))
+    if tile_loc in tilemap:
+        if tilemap[tile_loc]['type'] in PHYSICS_BLOCKS:
+            return tilemap[tile_loc]
+
+def legacy_physics_rects_around(tilemap, tile_size, pos):
+    rects = []
+    for tile in legacy_tiles_around(tilemap, tile_size, pos):
+        if tile['type'] in PHYSICS_BLOCKS:
+            rects.append(pygame.Rect(tile['pos'][0] * tile_size, tile['pos'][1] * tile_size, tile_size, tile_size))
+    return rects
+
+# The old autotile that looks up the 4 neighbors of every tile by their "x;y" keys
+def legacy_autotile(tilemap):
+    for loc in tilemap:
+        tile = tilemap[loc]
+        neighbors = set()
+        for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
+            check_loc = str(tile['pos'][0] + shift[0]) + ';' + str(tile['pos'][1] + shift[1])
+            if check_loc in tilemap:
+                if tilemap[check_loc]['type'] == tile['type']:
+                    neighbors.add(shift)
+        neighbors = tuple(sorted(neighbors))
+        if (tile['type'] in AUTOTILES_TYPES) and (neighbors in AUTOTILE_MAP):
+            tile['variant'] = AUTOTILE_MAP[neighbors]
+
+# The old extract that checks every grid tile
+def legacy_extract(tilemap, id_pairs):
+    matches = [tile.copy() for tile in tilemap.offgrid_tiles if (tile['type'], tile['variant']) in id_pairs]
+    for loc in tilemap.grid:
+        tile = tilemap.grid[loc]
+        if (tile['type'], tile['variant']) in id_pairs:
+            matches.append(dict(tile, pos=[loc[0] * tilemap.tile_size, loc[1] * tilemap.tile_size]))
+    return matches
+
+# The entities as they were before they had slots: a collisions dict built every update and an Animation copied on every action change
+class LegacyAnimation:
+    def __init__(self, images, img_dur=5, loop=True):
+        self.images = images
+        self.loop = loop
+        self.img_duration = img_dur
+        self.done = False
+        self.frame = 0
+
+    def copy(self):
+        return LegacyAnimation(self.images, self.img_duration, self.loop)
+
+    def update(self):
+        if self.loop:
+            self.frame = (self.frame + 1) % (self.img_duration * len(self.images))
+        else:
+            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
+            if self.frame >= self.img_duration * len(self.images) - 1:
+                self.done = True
+
+class LegacyEntity:
+    def __init__(self, game, e_type, pos, size):
+        self.game = game
+        self.type = e_type
+        self.pos = list(pos)
+        self.size = size
+        self.velocity = [0, 0]
+        self.collisions = {'up': False, 'down': False, 'right': False, 'left': False}
+        self.action = ''
+        self.anim_offset = (-3, -3)
+        self.flip = False
+        self.set_action('idle')
+
+    def rect(self):
+        return pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
+
+    def set_action(self, action):
+        if action != self.action:
+            self.action = action
+            clip = self.game.assets[self.type + '/' + self.action]
+            self.animation = LegacyAnimation(clip.images, clip.img_duration, clip.loop)
+
+    def update(self, tilemap, movement=(0, 0)):
+        self.collisions = {'up': False, 'down': False, 'right': False, 'left': False}
+        frame_movement = (movement[0] + self.velocity[0], movement[1] + self.velocity[1])
+        self.pos[0] += frame_movement[0]
+        entity_rect = self.rect()
+        for rect in tilemap.physics_rects_around(self.pos):
+            if entity_rect.colliderect(rect):
+                if frame_movement[0] > 0:
+                    entity_rect.right = rect.left
+                    self.collisions['right'] = True
+                if frame_movement[0] < 0:
+                    entity_rect.left = rect.right
+                    self.collisions['left'] = True
+                self.pos[0] = entity_rect.x
+        self.pos[1] += frame_movement[1]
+        entity_rect = self.rect()
+        for rect in tilemap.physics_rects_around(self.pos):
+            if entity_rect.colliderect(rect):
+                if frame_movement[1] > 0:
+                    entity_rect.bottom = rect.top
+                    self.collisions['down'] = True
+                if frame_movement[1] < 0:
+                    entity_rect.top = rect.bottom
+                    self.collisions['up'] = True
+                self.pos[1] = entity_rect.y
+        if movement[0] > 0:
+            self.flip = False
+        if movement[0] < 0:
+            self.flip = True
+        self.velocity[1] = min(5, self.velocity[1] + 0.1)
+        if self.collisions['down'] or self.collisions['up']:
+            self.velocity[1] = 0
+        self.animation.update()
+
+# The overlay as it was drawn before hud.py: the font loaded, the text rendered and a full screen mask made every frame
+def legacy_overlay(game):
+    font = pygame.font.SysFont(None, 24)
+    if game.transition:
+        transition_surf = pygame.Surface(game.display.get_size())
+        pygame.draw.circle(transition_surf, (255, 255, 255), (game.display.get_width() // 2, game.display.get_height() // 2), (30 - abs(game.transition)) * 8)
+        transition_surf.set_colorkey((255,255,255))
+        game.display.blit(transition_surf, (0,0))
+    game.display.blit(font.render(f'Enemies: {game.enemy_count}/{game.total_enemies}', True, (255, 255, 255)), (10, 10))
+
+# A particle as it was before the particles were kept in parallel lists
+class LegacyParticle:
+    def __init__(self, game, p_type, pos, velocity=(0, 0), frame=0):
+        clip = game.assets['particle/' + p_type]
+        self.type = p_type
+        self.pos = list(pos)
+        self.velocity = list(velocity)
+        self.animation = LegacyAnimation(clip.images, clip.img_duration, False)
+        self.animation.frame = frame
+
+    def update(self):
+        kill = self.animation.done
+        self.pos[0] += self.velocity[0]
+        self.pos[1] += self.velocity[1]
+        self.animation.update()
+        return kill
+
+    def render(self, surf, offset=(0, 0)):
+        img = self.animation.images[int(self.animation.frame / self.animation.img_duration)]
+        surf.blit(img, (self.pos[0] - offset[0] - img.get_width() // 2, self.pos[1] - offset[1] - img.get_height() // 2))
+
+# A spark as it was before the sparks were kept in parallel lists
+class LegacySpark:
+    def __init__(self, pos, angle, speed):
+        self.pos = list(pos)
+        self.angle = angle
+        self.speed = speed
+
+    def update(self):
+        self.pos[0] += math.cos(self.angle) * self.speed
+        self.pos[1] += math.sin(self.angle) * self.speed
+        self.speed = max(0, self.speed - 0.1)
+        return not self.speed
+
+    def render(self, surf, offset=(0, 0)):
+        render_points = [
+            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
+            (self.pos[0] + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1]),
+            (self.pos[0] + math.cos(self.angle + math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle + math.pi) * self.speed * 3 - offset[1]),
+            (self.pos[0] + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[1]),
+        ]
+        pygame.draw.polygon(surf, (255, 255, 255), render_points)
+
+# The old projectile loop: each projectile was a [[x, y], dx, age] list, moved and drawn, then checked against the walls, its age and the player
+# Returns the projectiles that hit something, like ProjectilePool.update()
+def legacy_projectiles(projectiles, tilemap, player_rect, can_hit_player, surf, img, offset=(0, 0)):
+    hits = []
+    for projectile in projectiles.copy():
+        projectile[0][0] += projectile[1]
+        projectile[2] += 1
+        surf.blit(img, (projectile[0][0] - img.get_width() / 2 - offset[0], projectile[0][1] - img.get_height() / 2 - offset[1]))
+        if tilemap.solid_check(projectile[0]):
+            projectiles.remove(projectile)
+            hits.append((projectile[0][0], projectile[0][1], projectile[1], False))
+        elif projectile[2] > 360:
+            projectiles.remove(projectile)
+        elif can_hit_player:
+            if player_rect.collidepoint(projectile[0]):
+                projectiles.remove(projectile)
+                hits.append((projectile[0][0], projectile[0][1], projectile[1], True))
+    return hits
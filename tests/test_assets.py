@@ -0,0 +1,53 @@
+import os
+import pygame
+import pytest
+import assets
+from utils import load_image
+
+# Sprites the entities draw, the old game flipped them with pygame.transform.flip() every frame
+ENTITY_ASSETS = ('enemy/', 'player/')
+BACKGROUNDS = [(200, 0, 200), (0, 0, 0), (255, 255, 255), (30, 90, 160)]
+
+@pytest.fixture(scope='module')
+def atlas():
+    pygame.init()
+    pygame.display.set_mode((960, 720))
+    surf, index = assets.pack_atlas(assets.load_source_assets())
+    return surf.convert_alpha(), index
+
+# The frames as the game loaded them before the atlas: each PNG loaded with its colorkey, then scaled
+def old_frames(path, colorkey, size, folder):
+    paths = [path + '/' + img_name for img_name in sorted(os.listdir(assets.BASE_IMG_PATH + path))] if folder else [path]
+    images = [load_image(img_path, colorkey) for img_path in paths]
+    if size:
+        images = [pygame.transform.scale(img, size) for img in images]
+    return images
+
+def drawn(img, background, flip=None):
+    surf = pygame.Surface(img.get_size())
+    surf.fill(background)
+    surf.blit(img if flip is None else pygame.transform.flip(img, flip, False), (0, 0))
+    return surf
+
+# Every atlas frame draws like the old frame did: the same pixels are covered with the same colors
+# (SDL blends a surface that has a colorkey with a different routine, so half transparent pixels can be one level apart)
+@pytest.mark.parametrize('name', list(assets.ASSET_MANIFEST))
+def test_atlas_frames_draw_like_the_old_frames(atlas, name):
+    surf, index = atlas
+    path, colorkey, size, folder = assets.ASSET_MANIFEST[name]
+    entity = name.startswith(ENTITY_ASSETS)
+    for i, old in enumerate(old_frames(path, colorkey, size, folder)):
+        frame = surf.subsurface(index[name]['frames'][i])
+        for flip in ([False, True] if entity else [None]):
+            source = pygame.transform.flip(old, True, False) if flip else old
+            for background in BACKGROUNDS:
+                expected = drawn(old, background, flip)
+                got = drawn(frame, background, flip or None)
+                for x in range(old.get_width()):
+                    for y in range(old.get_height()):
+                        alpha = source.get_at((x, y)).a
+                        a, b = expected.get_at((x, y)), got.get_at((x, y))
+                        if alpha in (0, 255):
+                            assert a == b, (name, i, flip, (x, y))
+                        else:
+                            assert max(abs(a[c] - b[c]) for c in range(3)) <= 1, (name, i, flip, (x, y))
@@ -0,0 +1,39 @@
+import random
+import pytest
+from legacy import legacy_autotile
+from map import Tilemap, loc_key
+from mapgen import random_tiles
+
+# The bulk autotile gives every tile of a random map the same variant as the old autotile
+@pytest.mark.parametrize('seed', range(20))
+def test_bulk_autotile_matches_the_old_autotile(seed):
+    rng = random.Random(seed)
+    width = rng.randint(8, 80)
+    grid = random_tiles(rng, rng.randint(10, width * width // 2), width)
+    legacy = {loc_key(loc): dict(grid[loc], pos=list(loc)) for loc in grid}
+    legacy_autotile(legacy)
+    tilemap = Tilemap(None)
+    for loc in grid:
+        tilemap.store_tile(loc, dict(grid[loc]))
+    tilemap.autotile()
+    assert {loc_key(loc): tilemap.grid[loc]['variant'] for loc in tilemap.grid} == {loc: legacy[loc]['variant'] for loc in legacy}
+
+# Random edits autotiled one at a time end up like an autotile of the whole edited map
+@pytest.mark.parametrize('seed', range(20))
+def test_incremental_autotile_matches_the_bulk_autotile(game, seed):
+    rng = random.Random(seed)
+    width = rng.randint(8, 80)
+    tilemap = Tilemap(game)
+    for loc, tile in random_tiles(rng, rng.randint(10, width * width // 2), width).items():
+        tilemap.store_tile(loc, tile)
+    tilemap.autotile()
+    for i in range(200):
+        loc = (rng.randrange(-2, 82), rng.randrange(-2, 82))
+        if rng.random() < 0.3:
+            tilemap.remove_tile(loc)
+        else:
+            tilemap.set_tile(loc, {'type': rng.choice(['grass', 'stone', 'decor']), 'variant': rng.randrange(4), 'pos': list(loc)})
+        tilemap.autotile_around(loc)
+    incremental = {loc: tilemap.grid[loc]['variant'] for loc in tilemap.grid}
+    tilemap.autotile()
+    assert incremental == {loc: tilemap.grid[loc]['variant'] for loc in tilemap.grid}
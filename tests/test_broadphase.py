@@ -0,0 +1,46 @@
+import random
+import pygame
+import pytest
+from broadphase import SpatialGrid
+from entities import Enemy
+from projectiles import ProjectilePool
+
+# Enemies and projectiles spread over an area that reaches left of and above the origin
+@pytest.fixture
+def crowd(game):
+    rng = random.Random(0)
+    game.enemies = [Enemy(game, (rng.uniform(-500, 1500), rng.uniform(-500, 1500)), (16, 16)) for i in range(300)]
+    game.enemy_grid = None
+    game.projectiles = ProjectilePool(3000)
+    for i in range(3000):
+        game.projectiles.spawn((rng.uniform(-500, 1500), rng.uniform(-500, 1500)), rng.choice((-1.5, 1.5)))
+    return game, rng
+
+# The grid finds the same enemies touching a rectangle as checking every enemy, in the order of the enemy list
+def test_enemies_in_matches_every_pair(crowd):
+    game, rng = crowd
+    for i in range(200):
+        rect = pygame.Rect(rng.uniform(-520, 1500), rng.uniform(-520, 1500), rng.randint(1, 80), rng.randint(1, 80))
+        assert game.enemies_in(rect) == [enemy for enemy in game.enemies if enemy.rect().colliderect(rect)]
+
+# The projectiles registered in a grid are found on the enemies they touch, like checking every projectile against every enemy
+def test_registered_projectiles_match_every_pair(crowd):
+    game, rng = crowd
+    projectiles = game.projectiles
+    grid = SpatialGrid()
+    projectiles.register(grid)
+    assert len(grid) == len(projectiles)
+    for enemy in game.enemies:
+        rect = enemy.rect()
+        expected = [slot for slot in projectiles.live if rect.collidepoint(projectiles.x[slot], projectiles.y[slot])]
+        assert [slot for slot in grid.query(rect) if rect.collidepoint(projectiles.x[slot], projectiles.y[slot])] == expected
+
+# Rectangles in the grid (Covering several cells) are found once each, in the order they were added, like checking every pair
+def test_grid_of_rectangles_matches_every_pair(crowd):
+    game, rng = crowd
+    rects = [enemy.rect().inflate(rng.randint(0, 150), rng.randint(0, 150)) for enemy in game.enemies]
+    grid = SpatialGrid()
+    for i, rect in enumerate(rects):
+        grid.insert(i, rect)
+    for i, rect in enumerate(rects):
+        assert [j for j in grid.query(rect) if i != j and rect.colliderect(rects[j])] == [j for j, other in enumerate(rects) if i != j and rect.colliderect(other)]
@@ -0,0 +1,100 @@
+import random
+import pygame
+import pytest
+from entities import PhysicsEntity, Enemy, CATCH_UP_FRAMES, COLLIDE_DOWN
+from finaleprojecto import Game, NO_INPUT, ACTIVE_MARGIN
+from legacy import LegacyEntity
+from mapgen import ground_heights
+
+# The frame of its animation an entity is showing (As an index into the clip's images)
+def shown_image(entity):
+    if isinstance(entity, LegacyEntity):
+        return int(entity.animation.frame / entity.animation.img_duration)
+    return int(entity.anim_frame / entity.animation.img_duration)
+
+# Slotted entities with shared animation clips move, turn and animate exactly like the entities before them
+@pytest.mark.parametrize('seed', range(3))
+def test_slotted_entities_match_the_legacy_ones(game, seed):
+    rng = random.Random(seed)
+    spots = ground_heights(game.tilemap)
+    positions = [(spot[0] + rng.random() * 8, spot[1] - 16) for spot in (rng.choice(spots) for i in range(50))]
+    final = {}
+    for cls in [LegacyEntity, PhysicsEntity]:
+        entities = [cls(game, 'enemy', pos, (16, 16)) for pos in positions]
+        frames = []
+        for frame in range(300):
+            movement = (0.5 if frame // 30 % 2 else -0.5, 0) if frame // 15 % 2 else (0, 0)
+            for entity in entities:
+                entity.update(game.tilemap, movement)
+                entity.set_action('walk' if movement[0] else 'idle')
+            frames.append([(tuple(entity.pos), entity.flip, entity.action, shown_image(entity)) for entity in entities])
+        final[cls] = frames
+    assert final[LegacyEntity] == final[PhysicsEntity]
+
+# Every clip's left-facing frames are its frames mirrored, like the old game flipped them every frame
+def test_clip_flipped_frames_match_transform_flip(game):
+    clips = [game.assets[name] for name in ['enemy/idle', 'enemy/walk', 'enemy/attack', 'player/idle', 'player/run', 'player/jump']]
+    for clip in clips:
+        for frame in range(int(clip.length)):
+            flipped = pygame.transform.flip(clip.img(frame), True, False)
+            assert pygame.image.tobytes(clip.img(frame, flip=True), 'RGBA') == pygame.image.tobytes(flipped, 'RGBA')
+
+# An enemy that falls asleep in the air falls on waking like it would have fallen awake (Without using any random numbers),
+# and it lands on the same spot however long it slept
+@pytest.mark.parametrize('height', [0, 30, 120])
+def test_enemy_asleep_in_the_air_wakes_where_it_would_have_fallen(game, height):
+    spot = ground_heights(game.tilemap)[30]
+    start = (spot[0], spot[1] - 16 - height)
+    falling = Enemy(game, start, (16, 16))
+    path = []
+    while not (falling.collisions & COLLIDE_DOWN and not falling.velocity[1]):
+        PhysicsEntity.update(falling, game.tilemap)
+        path.append(tuple(falling.pos))
+    assert path[-1][1] == spot[1] - 16 and len(path) < CATCH_UP_FRAMES # Landed on the ground
+    for slept in [1, 5, 40, 119, 120, 500, 10000]:
+        enemy = Enemy(game, start, (16, 16))
+        rng_state = game.ai_rng.getstate()
+        enemy.slept = slept
+        enemy.catch_up()
+        assert tuple(enemy.pos) == path[min(slept, len(path)) - 1] and not enemy.slept
+        assert enemy.action == 'idle' and game.ai_rng.getstate() == rng_state
+
+# An enemy that falls asleep while walking stops where it was (On the ground), and its walk timer keeps counting while it sleeps
+@pytest.mark.parametrize('slept', [10, 59, 60, 300])
+def test_enemy_asleep_mid_walk_wakes_in_the_same_state(game, slept):
+    spot = ground_heights(game.tilemap)[30]
+    states = []
+    for run in range(2):
+        enemy = Enemy(game, (spot[0], spot[1] - 16), (16, 16))
+        enemy.update(game.tilemap)
+        enemy.walking = 60
+        enemy.update(game.tilemap)
+        x = enemy.pos[0]
+        enemy.slept = slept
+        enemy.catch_up()
+        assert tuple(enemy.pos) == (x, spot[1] - 16) and enemy.walking == max(0, 59 - slept) # Settled on the ground
+        states.append((tuple(enemy.pos), enemy.flip, enemy.walking, enemy.action, enemy.anim_frame))
+    assert states[0] == states[1]
+
+# Every enemy inside the active area gets the same update() call with culling on and off
+@pytest.mark.parametrize('target', range(4))
+def test_enemies_near_the_camera_update_the_same_with_culling(monkeypatch, target):
+    calls = {}
+    for cull in [True, False]:
+        game = Game(headless=True, level=0, seed=0)
+        while game.loading:
+            game.update(NO_INPUT)
+        game.cull = cull
+        enemy = game.enemies[target * (len(game.enemies) - 1) // 3]
+        game.scroll = [enemy.pos[0] - 160, enemy.pos[1] - 120]
+        active_rect = game.view_rect().inflate(ACTIVE_MARGIN * 2, ACTIVE_MARGIN * 2)
+        calls[cull] = []
+        update = Enemy.update
+        def recorded_update(enemy, tilemap, movement=(0, 0)):
+            if active_rect.collidepoint(enemy.pos):
+                calls[cull].append((game.enemies.index(enemy), tuple(enemy.pos), enemy.flip, enemy.walking, movement))
+            update(enemy, tilemap, movement)
+        monkeypatch.setattr(Enemy, 'update', recorded_update)
+        game.update_enemies()
+        monkeypatch.undo()
+    assert calls[True] and calls[True] == calls[False]
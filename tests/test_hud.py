@@ -0,0 +1,30 @@
+import pygame
+import pytest
+from hud import Hud
+from legacy import legacy_overlay
+
+@pytest.fixture(scope='module', autouse=True)
+def hud(game):
+    game.hud = Hud(game.display.get_size()) # The overlay is drawn before the first render() makes the Hud
+
+# The Hud draws the enemy counter and every step of the circle transition exactly like the overlay that was made every frame
+@pytest.mark.parametrize('transition', range(-30, 31))
+def test_hud_draws_like_the_old_overlay(game, transition):
+    game.transition = transition
+    images = []
+    for draw in [legacy_overlay, lambda game: game.render_overlay()]:
+        game.display.blit(game.assets['background'], (0, 0))
+        draw(game)
+        images.append(pygame.image.tobytes(game.display, 'RGB'))
+    assert images[0] == images[1]
+
+# The loading and win screens are only drawn again when they change
+def test_static_screen_is_shown_once(game):
+    presents = []
+    game.present = lambda: presents.append(game.static_screen)
+    game.win_screen = True
+    for i in range(10):
+        game.render()
+    game.win_screen = False
+    del game.present
+    assert len(presents) == 1
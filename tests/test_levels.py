@@ -0,0 +1,52 @@
+import pytest
+from finaleprojecto import Game, NO_INPUT
+from replay import Replay
+
+def loaded_game(**kwargs):
+    game = Game(headless=True, level=0, seed=0, **kwargs)
+    while game.loading:
+        game.update(NO_INPUT)
+    return game
+
+# Clearing the level on any step of its fade in (Or the step after) still moves on to the next level
+@pytest.mark.parametrize('step', range(32))
+def test_level_changes_when_cleared_during_fade_in(step):
+    game = loaded_game()
+    for i in range(step):
+        game.update(NO_INPUT)
+    game.enemies.clear()
+    for i in range(900):
+        game.update(NO_INPUT)
+        if game.level == 1:
+            break
+    assert game.level == 1
+
+# A level with no enemies at all (Like a map made in the editor without enemy spawners) is skipped
+def test_level_without_enemies_changes():
+    game = loaded_game()
+    game.enemies = []
+    game.transition = -30
+    for i in range(900):
+        game.update(NO_INPUT)
+        if game.level == 1:
+            break
+    assert game.level == 1
+
+# While recording a replay the level changes on the same step every time, even when the preload started late
+def steps_to_next_level(clear_step):
+    game = loaded_game()
+    game.replay = Replay(game.seed, game.level)
+    for i in range(clear_step):
+        game.update(NO_INPUT)
+    game.enemies.clear()
+    steps = 0
+    while game.level == 0 and steps < 900:
+        game.update(NO_INPUT)
+        steps += 1
+    return steps
+
+@pytest.mark.parametrize('step', [0, 4, 30])
+def test_replay_changes_level_on_a_fixed_step(step):
+    steps = steps_to_next_level(step)
+    assert steps < 900
+    assert steps_to_next_level(step) == steps
@@ -0,0 +1,32 @@
+import random
+import pytest
+from map import Tilemap
+from mapgen import random_tiles
+
+# Each shipped map saved in the binary format loads back with the same grid and offgrid tiles
+@pytest.mark.parametrize('path', ['maps/0.json', 'maps/1.json', 'maps/2.json'])
+def test_shipped_maps_round_trip_through_the_binary_format(tmp_path, path):
+    tilemap = Tilemap(None)
+    tilemap.load(path)
+    tilemap.save(str(tmp_path / 'level.map'))
+    loaded = Tilemap(None)
+    loaded.load(str(tmp_path / 'level.map'))
+    assert loaded.tile_size == tilemap.tile_size
+    assert loaded.grid == tilemap.grid
+    assert loaded.offgrid_tiles == tilemap.offgrid_tiles
+
+# Tiles at negative positions (Chunks left of and above the origin) and offgrid tiles between pixels are kept as they are
+@pytest.mark.parametrize('seed', range(3))
+def test_negative_positions_and_float_offgrid_round_trip(tmp_path, seed):
+    rng = random.Random(seed)
+    tilemap = Tilemap(None)
+    for (x, y), tile in random_tiles(rng, 2000, 120).items():
+        tilemap.store_tile((x - 60, y - 60), dict(tile, pos=[x - 60, y - 60]))
+    for i in range(100):
+        tilemap.offgrid_tiles.append({'type': rng.choice(['decor', 'large_decor', 'spawners']), 'variant': rng.randrange(3), 'pos': [rng.uniform(-1000, 1000), rng.uniform(-1000, 1000)]})
+    tilemap.save(str(tmp_path / 'random.map'))
+    loaded = Tilemap(None)
+    loaded.load(str(tmp_path / 'random.map'))
+    assert loaded.grid == tilemap.grid
+    assert loaded.offgrid_tiles == tilemap.offgrid_tiles
+    assert min(loc[0] for loc in loaded.grid) < 0 and min(loc[1] for loc in loaded.grid) < 0
@@ -0,0 +1,45 @@
+import math
+import random
+import pygame
+import pytest
+from legacy import LegacyParticle
+
+# The particles are drawn on the same pixels every frame as the old particle loop drew them: updated, drawn, then the leaves sway,
+# and a particle is drawn on its last frame before it's removed
+@pytest.mark.parametrize('seed', range(3))
+def test_particles_draw_like_the_old_particle_loop(game, seed):
+    rng = random.Random(seed)
+    spawns = {}
+    for frame in range(300):
+        spawns[frame] = []
+        for i in range(rng.randint(0, 3)):
+            p_type = rng.choice(('leaf', 'particle'))
+            pos = (rng.uniform(20, 300), rng.uniform(20, 120))
+            angle = rng.random() * math.pi * 2
+            velocity = (-0.1, 0.3) if p_type == 'leaf' else (math.cos(angle) * rng.random(), math.sin(angle) * rng.random())
+            spawns[frame].append((p_type, pos, velocity, rng.randint(0, 400)))
+
+    surf = pygame.Surface((320, 240))
+    legacy = []
+    old_frames = []
+    for frame in range(700):
+        legacy += [LegacyParticle(game, *spawn) for spawn in spawns.get(frame, [])]
+        surf.fill((0, 0, 0))
+        for particle in legacy.copy():
+            kill = particle.update()
+            particle.render(surf)
+            if particle.type == 'leaf':
+                particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
+            if kill:
+                legacy.remove(particle)
+        old_frames.append(pygame.image.tobytes(surf, 'RGB'))
+
+    game.particles.clear()
+    for frame in range(700):
+        for spawn in spawns.get(frame, []):
+            game.particles.emit(*spawn)
+        surf.fill((0, 0, 0))
+        game.particles.update()
+        game.particles.render(surf)
+        assert pygame.image.tobytes(surf, 'RGB') == old_frames[frame], frame
+    assert not legacy and not len(game.particles)
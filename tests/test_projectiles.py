@@ -0,0 +1,64 @@
+import random
+import pygame
+import pytest
+from legacy import legacy_projectiles
+from mapgen import ground_heights
+from projectiles import ProjectilePool
+
+# Projectiles shot at random times around the ground of the level, some of them old enough to run out
+def random_shots(game, seed, frames):
+    rng = random.Random(seed)
+    spots = ground_heights(game.tilemap)[20:60]
+    shots = {}
+    for frame in range(frames):
+        shots[frame] = []
+        for i in range(rng.randint(0, 3)):
+            spot = rng.choice(spots)
+            shots[frame].append(((spot[0] + rng.uniform(-100, 100), spot[1] - rng.uniform(-8, 40)), rng.choice((-1.5, 1.5)), rng.choice((0, 0, rng.randint(300, 360)))))
+    return spots, shots
+
+# The projectiles are drawn on the same pixels every frame as the old projectile loop drew them (Including the frame they hit a wall,
+# the player or run out), and they hit the same things in the same order
+@pytest.mark.parametrize('seed', range(3))
+def test_projectiles_draw_and_hit_like_the_old_loop(game, seed):
+    spots, shots = random_shots(game, seed, 300)
+    player_rect = pygame.Rect(spots[20][0], spots[20][1] - 19, 8, 15)
+    offset = (spots[0][0], spots[20][1] - 160)
+    img = game.assets['projectiles']
+    surf = pygame.Surface((640, 240))
+
+    legacy = []
+    old_frames = []
+    old_hits = []
+    for frame in range(400):
+        legacy += [[list(pos), dx, age] for pos, dx, age in shots.get(frame, [])]
+        surf.fill((0, 0, 0))
+        old_hits.append(legacy_projectiles(legacy, game.tilemap, player_rect, frame % 100 < 70, surf, img, offset))
+        old_frames.append(pygame.image.tobytes(surf, 'RGB'))
+
+    pool = ProjectilePool()
+    for frame in range(400):
+        for pos, dx, age in shots.get(frame, []):
+            pool.spawn(pos, dx, age)
+        surf.fill((0, 0, 0))
+        assert pool.update(game.tilemap, player_rect, frame % 100 < 70) == old_hits[frame], frame
+        pool.render(surf, img, offset)
+        assert pygame.image.tobytes(surf, 'RGB') == old_frames[frame], frame
+    assert any(old_hits) and len(pool) == len(legacy)
+
+# Slots of removed projectiles are used again once they were drawn for the last time, and a full pool drops its oldest projectile
+def test_pool_reuses_slots_and_recycles_the_oldest(game):
+    pool = ProjectilePool(capacity=4)
+    far = pygame.Rect(-1000, -1000, 1, 1)
+    slots = [pool.spawn((8, -200), 1, age=360), pool.spawn((8, -200), 1), pool.spawn((8, -200), 1)]
+    pool.update(game.tilemap, far)
+    assert pool.live == slots[1:] and pool.shown == slots # The projectile that ran out is still drawn
+    assert pool.spawn((8, -200), 1) not in slots # Its slot isn't given out before the next update
+    pool.update(game.tilemap, far)
+    assert slots[0] in pool.free
+    assert pool.spawn((8, -200), 1) == slots[0]
+    assert len(pool) == 4
+    assert pool.spawn((8, -200), -1) == slots[1] # The oldest projectile's slot
+    assert len(pool) == 4 and pool.live[0] == slots[2] and pool.dx[slots[1]] == -1
+    pool.clear()
+    assert len(pool) == 0 and not pool.shown and sorted(pool.free) == list(range(4))
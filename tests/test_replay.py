@@ -0,0 +1,20 @@
+import argparse
+import pytest
+from replay import Replay, load_replay, seed_arg, SEEDS
+
+# Every seed a replay takes is saved and loaded back
+@pytest.mark.parametrize('seed', [0, 12345, SEEDS - 1])
+def test_replay_saves_its_seed(tmp_path, seed):
+    replay = Replay(seed, level=2)
+    replay.inputs = [0, 0, 5, 5, 5, 8]
+    replay.save(tmp_path / 'run.rpl')
+    loaded = load_replay(tmp_path / 'run.rpl')
+    assert (loaded.seed, loaded.level, loaded.inputs) == (seed, 2, replay.inputs)
+
+# A seed that doesn't fit in the replay header is refused before the run starts, not when the replay is saved at the end
+@pytest.mark.parametrize('seed', [-1, SEEDS, 2 ** 40])
+def test_seeds_that_cant_be_saved_are_refused(seed):
+    with pytest.raises(argparse.ArgumentTypeError):
+        seed_arg(str(seed))
+    with pytest.raises(ValueError):
+        Replay(seed)
@@ -0,0 +1,37 @@
+import math
+import random
+import pygame
+import pytest
+from legacy import LegacySpark
+from spark import SparkField
+
+# The sparks are drawn on the same pixels every frame as the old spark loop drew them, including the dot a spark leaves
+# on the frame it stops
+@pytest.mark.parametrize('seed', range(3))
+def test_sparks_draw_like_the_old_spark_loop(seed):
+    rng = random.Random(seed)
+    spawns = {frame: [((rng.uniform(20, 300), rng.uniform(20, 220)), rng.random() * math.pi * 2, 2 + rng.random()) for i in range(rng.randint(0, 4))] for frame in range(200)}
+    offset = (5, -3)
+
+    surf = pygame.Surface((320, 240))
+    legacy = []
+    old_frames = []
+    for frame in range(240):
+        legacy += [LegacySpark(*spawn) for spawn in spawns.get(frame, [])]
+        surf.fill((0, 0, 0))
+        for spark in legacy.copy():
+            kill = spark.update()
+            spark.render(surf, offset=offset)
+            if kill:
+                legacy.remove(spark)
+        old_frames.append(pygame.image.tobytes(surf, 'RGB'))
+
+    sparks = SparkField()
+    for frame in range(240):
+        for spawn in spawns.get(frame, []):
+            sparks.emit(*spawn)
+        surf.fill((0, 0, 0))
+        sparks.update()
+        sparks.render(surf, offset=offset)
+        assert pygame.image.tobytes(surf, 'RGB') == old_frames[frame], frame
+    assert not legacy and not len(sparks)
@@ -0,0 +1,98 @@
+import random
+import shutil
+import pygame
+import pytest
+from legacy import legacy_extract
+from map import Tilemap
+from mapgen import generate_map
+from pagedmap import PagedTilemap
+
+SPAWNERS = [('spawners', 0), ('spawners', 1)]
+
+# extract() finds the same tiles with the (type, variant) index as scanning every tile did
+@pytest.mark.parametrize('seed', range(5))
+def test_extract_matches_the_tile_scan(seed):
+    tilemap = generate_map(Tilemap(None), 5000, seed=seed)
+    rng = random.Random(seed)
+    for loc in rng.sample(list(tilemap.grid), 50):
+        tilemap.store_tile((loc[0], loc[1] - 1), {'type': 'spawners', 'variant': 1, 'pos': [loc[0], loc[1] - 1]})
+    key = lambda tile: (tile['pos'][0], tile['pos'][1], tile['variant'])
+    assert sorted(legacy_extract(tilemap, SPAWNERS), key=key) == sorted(tilemap.extract(SPAWNERS, keep=True), key=key)
+    assert tilemap.count_tiles(SPAWNERS[1]) == 50
+
+# The offgrid spatial hash finds the same decor as checking the rectangle of every offgrid tile did, in the same order
+@pytest.mark.parametrize('seed', range(5))
+def test_offgrid_index_matches_the_list_scan(game, seed):
+    rng = random.Random(seed)
+    tilemap = Tilemap(game)
+    width = 200 * tilemap.tile_size
+    for i in range(2000):
+        tilemap.offgrid_tiles.append({'type': rng.choice(['decor', 'large_decor']), 'variant': rng.randrange(3), 'pos': [rng.random() * width, rng.random() * width]})
+    for i in range(100):
+        rect = pygame.Rect(rng.randrange(width), rng.randrange(width), rng.randint(1, 256), rng.randint(1, 256))
+        assert tilemap.offgrid_in_rect(rect) == [tile for tile in tilemap.offgrid_tiles if tilemap.tile_rect(tile, ongrid=False).colliderect(rect)]
+        pos = (rng.random() * width, rng.random() * width)
+        assert tilemap.offgrid_at(pos) == [tile for tile in tilemap.offgrid_tiles if tilemap.tile_rect(tile, ongrid=False).collidepoint(pos)]
+
+# Erasing decor and placing new decor (Like the editor does) keeps the index in the order the tiles are drawn
+def test_offgrid_index_keeps_the_order_after_edits(game):
+    rng = random.Random(0)
+    tilemap = Tilemap(game)
+    width = 40 * tilemap.tile_size
+    for i in range(200):
+        tilemap.add_offgrid({'type': 'large_decor', 'variant': rng.randrange(3), 'pos': [rng.random() * width, rng.random() * width]})
+    view = pygame.Rect(0, 0, width, width)
+    tilemap.offgrid_in_rect(view)
+    for i in range(300):
+        if rng.random() < 0.5:
+            tilemap.remove_offgrid(rng.choice(tilemap.offgrid_tiles))
+        tilemap.add_offgrid({'type': rng.choice(['decor', 'large_decor']), 'variant': rng.randrange(3), 'pos': [rng.random() * width, rng.random() * width]})
+        assert [id(tile) for tile in tilemap.offgrid_in_rect(view)] == [id(tile) for tile in tilemap.offgrid_tiles]
+    assert len(tilemap.offgrid_index.order) == len(tilemap.offgrid_tiles)
+
+# A paged tilemap capped at a few chunks answers every query and draws every view like the whole map loaded at once,
+# while stream() drops and loads chunks as the camera sweeps the level, after the spawners were taken out and with an edited chunk
+@pytest.mark.parametrize('level', range(3))
+def test_paged_tilemap_matches_the_whole_map_while_streaming(game, tmp_path, level):
+    path = str(tmp_path / f'{level}.json')
+    shutil.copy(f'maps/{level}.json', path)
+    full = Tilemap(game)
+    full.load(path)
+    paged = PagedTilemap(game, max_chunks=4)
+    paged.load(path)
+
+    key = lambda tile: (tile['pos'][0], tile['pos'][1], tile['type'], tile['variant'])
+    assert sorted(paged.extract(SPAWNERS), key=key) == sorted(full.extract(SPAWNERS), key=key)
+    assert sorted(paged.extract([('large_decor', 2)], keep=True), key=key) == sorted(full.extract([('large_decor', 2)], keep=True), key=key)
+    edit = sorted(full.grid)[len(full.grid) // 2]
+    for tilemap in [full, paged]:
+        tilemap.set_tile(edit, {'type': 'stone', 'variant': 3, 'pos': list(edit)})
+        tilemap.remove_tile((edit[0] + 1, edit[1]))
+
+    size = full.tile_size
+    left = (min(loc[0] for loc in full.grid) - 4) * size
+    right = (max(loc[0] for loc in full.grid) + 4) * size
+    top = (min(loc[1] for loc in full.grid) - 4) * size
+    bottom = (max(loc[1] for loc in full.grid) + 4) * size
+    rng = random.Random(level)
+    surfs = [pygame.Surface((320, 240)), pygame.Surface((320, 240))]
+    dropped = 0
+    for step, x in enumerate(list(range(left, right, 23)) + list(range(right, left, -41))):
+        view = pygame.Rect(x, top + (bottom - top - 240) * (step % 7) // 6, 320, 240)
+        pages = set(paged.pages)
+        paged.stream(view, [(rng.uniform(left, right), rng.uniform(top, bottom))])
+        dropped += len(pages - set(paged.pages))
+        for i in range(20):
+            pos = (rng.uniform(left, right), rng.uniform(top, bottom))
+            assert paged.tiles_around(pos) == full.tiles_around(pos)
+            assert paged.solid_check(pos) == full.solid_check(pos)
+            assert paged.physics_rects_around(pos) == full.physics_rects_around(pos)
+        for surf, tilemap in zip(surfs, [full, paged]):
+            surf.fill((0, 0, 0))
+            tilemap.render(surf, offset=view.topleft)
+        assert pygame.image.tobytes(surfs[0], 'RGB') == pygame.image.tobytes(surfs[1], 'RGB'), view
+
+    assert dropped > len(paged.map_file.chunks) # Chunks were dropped and loaded again
+    assert paged.grid[edit] == full.grid[edit] and (edit[0] + 1, edit[1]) not in paged.grid
+    assert paged.extract(SPAWNERS, keep=True) == [] # The spawners taken out don't come back with their chunks
+    paged.close()
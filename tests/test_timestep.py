@@ -0,0 +1,44 @@
+import pytest
+from finaleprojecto import Game, NO_INPUT, FIXED_STEP, MAX_STEPS
+
+# Play some seconds of the first level at a display rate, with the player running right and jumping every second
+# Returns the player's position after every simulation step, the number of steps of every frame and what advance() returned
+# slow_frames are frames that take a quarter of a second
+def play(fps, seconds=3, slow_frames=()):
+    game = Game(headless=True, seed=0)
+    game.preload_levels = False
+    trace = []
+    update = game.update
+    game.update = lambda inputs: (update(inputs), trace.append(tuple(game.player.pos)))
+    steps = []
+    alphas = []
+    for frame in range(int(seconds * fps)):
+        before = len(trace)
+        alphas.append(game.advance(0.25 if frame in slow_frames else 1 / fps, dict(NO_INPUT, right=True, jump=frame % fps == 0)))
+        steps.append(len(trace) - before)
+    return trace, steps, alphas
+
+# The simulation runs the same steps, and the player takes the same path, at 30, 60 and 144 frames a second
+def test_player_takes_the_same_path_at_every_frame_rate():
+    traces = {fps: play(fps) for fps in [30, 60, 144]}
+    for fps, (trace, steps, alphas) in traces.items():
+        assert abs(len(trace) - 3 / FIXED_STEP) <= 1, fps
+        assert all(0 <= alpha < 1 for alpha in alphas), fps
+    assert len(set(traces[60][0])) > 100 # The player ran and jumped
+    shortest = min(len(trace) for trace, steps, alphas in traces.values())
+    assert traces[30][0][:shortest] == traces[60][0][:shortest] == traces[144][0][:shortest]
+    assert traces[60][1] == [1] * len(traces[60][1])
+    assert set(traces[30][1]) == {2} and set(traces[144][1]) == {0, 1}
+
+# A slow frame runs at most MAX_STEPS steps to catch up, the rest of its time is dropped, and the frames after it run as usual
+# (At 144 fps the leftover time after the slow frame differs, so the frames with a step can shift by one)
+@pytest.mark.parametrize('fps', [30, 60, 144])
+def test_slow_frame_catch_up_is_bounded(fps):
+    slow = fps + fps // 2
+    trace, steps, alphas = play(fps, slow_frames=[slow])
+    normal_trace, normal_steps, normal_alphas = play(fps)
+    assert steps[slow] == MAX_STEPS and max(steps) == MAX_STEPS
+    assert max(steps[slow + 1:]) == max(normal_steps) and abs(sum(steps[slow + 1:]) - sum(normal_steps[slow + 1:])) <= 1
+    assert all(0 <= alpha < 1 for alpha in alphas)
+    before = sum(steps[:slow])
+    assert trace[:before] == normal_trace[:before]
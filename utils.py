@@ -4,9 +4,20 @@ import os
 # Base path for images
 BASE_IMG_PATH = 'images/'
 
+FRAME_CACHE = {} # Loaded animation frames, so they are only built once
+
+# Copy an image into the pixel format that draws fastest on the display
+# (convert_alpha() needs a window made by pygame.display, the sdl2 presenter doesn't make one so a surface of the same format is made instead)
+def display_format(img):
+    if pygame.display.get_surface():
+        return img.convert_alpha()
+    surf = pygame.Surface(img.get_size(), pygame.SRCALPHA)
+    surf.blit(img, (0, 0), special_flags=pygame.BLEND_RGBA_MAX) # Copy the pixels as they are, without blending
+    return surf
+
 # Function to load a single image
 def load_image(path, colorkey=(255, 255, 255)):
-    img = pygame.image.load(BASE_IMG_PATH + path).convert_alpha()
+    img = display_format(pygame.image.load(BASE_IMG_PATH + path))
     img.set_colorkey(colorkey)  # Make transparent the background color (white) to remove the white border around the image.
     return img
 
@@ -17,28 +28,35 @@ def load_images(path, colorkey=(0, 0, 0)):
         images.append(load_image(path + '/' + img_name, colorkey))
     return images
 
-# To handle animations
+# Function to load the frames of an animation (Later calls get the same surfaces back)
+def load_frames(path, colorkey=(0, 0, 0)):
+    key = (path, colorkey)
+    if key not in FRAME_CACHE:
+        FRAME_CACHE[key] = load_images(path, colorkey)
+    return FRAME_CACHE[key]
+
+# To handle animations: an animation is a clip shared by every entity that plays it, each entity keeps its own frame counter
+# (The clip never changes, so set_action() doesn't need to copy it)
 class Animation:
+    __slots__ = ('images', 'flipped', 'loop', 'img_duration', 'length')
+
     def __init__(self, images, img_dur=5, loop=True):
         self.images = images
+        self.flipped = [pygame.transform.flip(img, True, False) for img in images] # Left-facing frames, made once with the clip
         self.loop = loop
         self.img_duration = img_dur
-        self.done = False
-        self.frame = 0
-    
-    #Create a copy of the animation
-    def copy(self):
-        return Animation(self.images, self.img_duration, self.loop)
-    
-    #Updates the animation frame
-    def update(self):
+        self.length = img_dur * len(images) # Number of updates the whole animation lasts
+
+    #Frame counter value after some more updates (A looping animation starts over, the others stop on their last frame)
+    def advance(self, frame, frames=1):
         if self.loop:
-            self.frame = (self.frame + 1) % (self.img_duration * len(self.images))
-        else:
-            self.frame = min(self.frame + 1, self.img_duration * len(self.images) - 1)
-            if self.frame >= self.img_duration * len(self.images) - 1:
-                self.done = True
-
-    #To get the current image of the animation
-    def img(self):
-        return self.images[int(self.frame / self.img_duration)]
+            return (frame + frames) % self.length
+        return min(frame + frames, self.length - 1)
+
+    #Check if an animation that doesn't loop has reached its last frame
+    def done(self, frame):
+        return frame >= self.length - 1
+
+    #To get the image of the animation at a frame counter value (The mirrored one when flip is True)
+    def img(self, frame, flip=False):
+        return (self.flipped if flip else self.images)[int(frame / self.img_duration)]